@@ -0,0 +1,128 @@
+"""
+Activity gate: decides per audio block whether there is anything to react to.
+
+A block counts as active when its RMS level reaches open_db, or, with the
+optional WebRTC VAD, when speech is detected in it. The gate opens on the
+first active block and closes only after the level has stayed below close_db
+(below open_db: hysteresis) for `hold` seconds, so pauses between beats or
+words do not flap it. Listeners get the current state when they subscribe
+and (active, t) on every change after that; the render
+loop uses it to drop to a low frame rate while it is closed and to wake up
+at once when it opens.
+
+webrtcvad (pip install webrtcvad) is only needed with vad_aggressiveness set;
+it takes 16 bit mono at 8/16/32/48 kHz in 10/20/30 ms frames, so blocks are
+resampled to 16 kHz and split into 30 ms frames.
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+Listener = Callable[[bool, float], None]
+
+VAD_RATE = 16000
+VAD_FRAME = VAD_RATE * 30 // 1000
+
+
+def rms_db(block: np.ndarray) -> float:
+    """RMS level of a float block in dBFS (-inf for silence)"""
+    if len(block) == 0:
+        return -math.inf
+    block = np.asarray(block, dtype=np.float32).reshape(-1)
+    ms = float(np.dot(block, block)) / len(block)
+    return 10 * math.log10(ms) if ms > 0 else -math.inf
+
+
+class ActivityGate:
+    def __init__(
+        self,
+        open_db: float = config.ACTIVITY_OPEN_DB,
+        close_db: float = config.ACTIVITY_CLOSE_DB,
+        hold: float = config.ACTIVITY_HOLD,
+        vad_aggressiveness: Optional[int] = None,
+        sample_rate: int = config.SAMPLE_RATE,
+    ):
+        """
+        Args:
+            open_db: RMS level (dBFS) that opens the gate
+            close_db: RMS level (dBFS) below which the gate starts closing, <= open_db
+            hold: seconds below close_db before the gate closes
+            vad_aggressiveness: 0..3 to also open on speech (webrtcvad), None: energy only
+            sample_rate: of the blocks passed to process()
+        """
+        if close_db > open_db:
+            raise ValueError(f"close_db ({close_db}) must not be above open_db ({open_db})")
+        self.open_db = open_db
+        self.close_db = close_db
+        self.hold = hold
+        self.sample_rate = sample_rate
+        self.vad = None
+        if vad_aggressiveness is not None:
+            import webrtcvad
+            self.vad = webrtcvad.Vad(vad_aggressiveness)
+        self.active = False
+        self.changed_at = 0.0
+        self.level_db = -math.inf
+        self._quiet_since: Optional[float] = None
+        self._listeners: List[Listener] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Listener):
+        """listener(active, t) is called at once with the current state, then on every change from the audio thread"""
+        with self._lock:
+            self._listeners.append(listener)
+            active, t = self.active, self.changed_at
+        # Подписчик не должен угадывать начальное состояние: гейт стартует закрытым
+        self._notify(listener, active, t)
+
+    def _speech(self, block: np.ndarray) -> bool:
+        n = int(len(block) * VAD_RATE / self.sample_rate)
+        if n < VAD_FRAME:
+            return False
+        resampled = np.interp(np.arange(n) * (self.sample_rate / VAD_RATE), np.arange(len(block)), block)
+        pcm = (np.clip(resampled, -1.0, 1.0) * 32767).astype(np.int16)
+        return any(self.vad.is_speech(pcm[i:i + VAD_FRAME].tobytes(), VAD_RATE)
+                   for i in range(0, n - VAD_FRAME + 1, VAD_FRAME))
+
+    def process(self, block: np.ndarray, t: Optional[float] = None) -> bool:
+        """Feed one mono float block (-1..1); returns whether the gate is open after it"""
+        t = time.monotonic() if t is None else t
+        self.level_db = rms_db(block)
+        loud = self.level_db >= self.open_db
+        if not loud and self.vad is not None and self.level_db >= self.close_db:
+            # Речь тише порога: VAD проверяем только над порогом закрытия, тишину не гоняем через него
+            loud = self._speech(np.asarray(block, dtype=np.float32).reshape(-1))
+        if loud or self.level_db >= self.close_db:
+            self._quiet_since = None
+        elif self._quiet_since is None:
+            self._quiet_since = t
+        if loud and not self.active:
+            self._set(True, t)
+        elif self.active and self._quiet_since is not None and t - self._quiet_since >= self.hold:
+            self._set(False, t)
+        return self.active
+
+    def _set(self, active: bool, t: float):
+        self.active = active
+        self.changed_at = t
+        logger.debug(f"Активность звука: {'есть' if active else 'нет'} ({self.level_db:.1f} dB)")
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            self._notify(listener, active, t)
+
+    @staticmethod
+    def _notify(listener: Listener, active: bool, t: float):
+        try:
+            listener(active, t)
+        except Exception as e:
+            logger.error(f"Ошибка в обработчике активности: {e}")
@@ -1,7 +1,11 @@
 import sounddevice as sd
 import numpy as np
+from contextlib import ExitStack
 from threading import Event
 import config
+from audio.capture import BlockCombiner
+from audio.features import FeatureExtractor
+from audio.quantiles import AdaptiveGain
 import logging
 import math
 logger = logging.getLogger(__name__)
@@ -9,15 +13,45 @@ logger = logging.getLogger(__name__)
 
 class AudioProcessor:
     """Need to get a range of audio """
-    def __init__(self, callback):
+    def __init__(self, callback, gate=None, on_features=None, devices=None):
         self.callback = callback
+        self.gate = gate  # ActivityGate, получает каждый блок
+        self.on_features = on_features  # получает Features всех каналов за блок
+        # (устройство, число каналов): несколько микрофонов вокруг куба, каналы идут подряд в этом порядке
+        self.devices = devices or config.AUDIO_DEVICES
+        self.channels = sum(channels for _, channels in self.devices)
+        self.block_size = int(config.SAMPLE_RATE * config.BUFFER_DURATION)
+        self.combiner = BlockCombiner([channels for _, channels in self.devices], self.block_size)
+        self.features = FeatureExtractor(self.channels, self.block_size, config.SAMPLE_RATE)
+        # Окно -40..0 dB подстраивается под зал: квантили уровня за последние ADAPTIVE_GAIN_HORIZON секунд
+        self.gain = None
+        self.channel_gains = []
+        if config.ADAPTIVE_GAIN:
+            window = int(config.ADAPTIVE_GAIN_HORIZON / config.BUFFER_DURATION)
+            low, high = config.ADAPTIVE_GAIN_QUANTILES
+            self.gain = AdaptiveGain(window, low, high, config.ADAPTIVE_GAIN_MIN_SPAN, floor=config.ADAPTIVE_GAIN_FLOOR)
+            self.channel_gains = [AdaptiveGain(window, low, high, config.ADAPTIVE_GAIN_MIN_SPAN,
+                                               floor=config.ADAPTIVE_GAIN_FLOOR)
+                                  for _ in range(self.channels)]
         self.current_amplitude = 0.0
         self.is_running = Event()
         self.is_running.set()
-        self.stream = None
+        self.streams = []
         self._callback_count = 0
         logger.info("Аудио процессор инициализирован")
 
+    def _device_callback(self, device):
+        """Callback одного из нескольких устройств: блок обрабатывается, когда пришли данные со всех"""
+        def callback(indata, frames, time, status):
+            if not self.is_running.is_set():
+                raise sd.CallbackStop
+            block = self.combiner.put(device, indata)
+            if status:
+                logger.warning(f"Статус аудио потока {self.devices[device][0]}: {status}")
+            if block is not None:
+                self._audio_callback(block, frames, time, None)
+        return callback
+
     def _audio_callback(self, indata, frames, time, status):
         try:
             if not self.is_running.is_set():
@@ -27,9 +61,24 @@ class AudioProcessor:
             if status:
                 logger.warning(f"Статус аудио потока: {status}")
 
+            if self.gate is not None:
+                self.gate.process(indata.mean(axis=1) if self.channels > 1 else indata[:, 0])
+
+            if self.on_features is not None:
+                # Один векторный проход по всем каналам блока
+                features = self.features.process(indata)
+                if self.channel_gains:
+                    features.levels = np.array([gain.update(db) for gain, db in
+                                                zip(self.channel_gains, features.rms_db.tolist())], dtype=np.float32)
+                self.on_features(features)
+
             if len(indata) > 0:
                 amplitude = np.mean(np.abs(indata))
-                if amplitude > 0:
+                if amplitude > 0 and self.gain is not None:
+                    level = self.gain.update(20 * math.log10(amplitude))
+                    # Закрытый гейт - тишина, амплитуда не дёргается и куб уходит в простой
+                    self.current_amplitude = 1 if self.gate is not None and not self.gate.active else level * 99 + 1
+                elif amplitude > 0:
                     amplitude_db = 20 * math.log10(amplitude)
                     min_db = -40
                     max_db = 0
@@ -45,6 +94,9 @@ class AudioProcessor:
             
             if self._callback_count % 100 == 0:
                 logger.info(f"Посчитанная амплитуда: {self.current_amplitude}")
+                if self.gain is not None:
+                    low, high = self.gain.range
+                    logger.info(f"Окно адаптивного усиления: {low:.1f}..{high:.1f} dB")
             self.callback(self.current_amplitude)
             
                 
@@ -55,17 +107,20 @@ class AudioProcessor:
     def start(self):
         try:
             logger.info(f"Запуск аудио потока (SR: {config.SAMPLE_RATE}, "
-                       f"Buffer: {config.BUFFER_DURATION} сек)")
+                       f"Buffer: {config.BUFFER_DURATION} сек, устройства: {self.devices})")
             
-            self.stream = sd.InputStream(
+            self.streams = [sd.InputStream(
                 samplerate=config.SAMPLE_RATE,
-                channels=1,
-                callback=self._audio_callback,
-                blocksize=int(config.SAMPLE_RATE * config.BUFFER_DURATION),
+                device=device,
+                channels=channels,
+                callback=self._audio_callback if len(self.devices) == 1 else self._device_callback(i),
+                blocksize=self.block_size,
                 dtype='float32'
-            )
+            ) for i, (device, channels) in enumerate(self.devices)]
             
-            with self.stream:
+            with ExitStack() as stack:
+                for stream in self.streams:
+                    stack.enter_context(stream)
                 logger.info("Аудио поток успешно запущен")
                 while self.is_running.is_set():
                     sd.sleep(1000)
@@ -84,9 +139,11 @@ class AudioProcessor:
             logger.info("Получен сигнал остановки аудио процессора")
             self.is_running.clear()
             
-            if self.stream and self.stream.active:
+            for stream in self.streams:
+                if not stream.active:
+                    continue
                 try:
-                    self.stream.abort()
+                    stream.abort()
                     logger.debug("Аудио поток принудительно остановлен")
                 except Exception as e:
                     logger.error(f"Ошибка при остановке потока: {str(e)}")
\ No newline at end of file
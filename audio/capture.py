@@ -0,0 +1,44 @@
+"""
+Joins blocks from several input devices into one (frames, channels) block.
+
+Each device has its own stream and callback; put() copies a device's block
+into its columns, and once every device has delivered since the last full
+block, the joined block is returned for one feature pass. A device that runs
+ahead overwrites its own columns, so the block always holds the latest data
+of every device. Device clocks are not synchronized; a block is at most one
+block period out of step between devices.
+"""
+
+import threading
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+class BlockCombiner:
+    def __init__(self, channels: Sequence[int], block_size: int):
+        """
+        Args:
+            channels: channels of each device, in column order
+            block_size: frames per block; shorter blocks are zero padded, longer ones cut
+        """
+        self.channels = list(channels)
+        self.block_size = block_size
+        starts = np.cumsum([0] + self.channels)
+        self._columns = [slice(start, start + n) for start, n in zip(starts, self.channels)]
+        self._block = np.zeros((block_size, sum(self.channels)), dtype=np.float32)
+        self._waiting = set(range(len(self.channels)))
+        self._lock = threading.Lock()
+
+    def put(self, device: int, data: np.ndarray) -> Optional[np.ndarray]:
+        """Block of device (frames, its channels); returns the joined block when it is complete"""
+        n = min(len(data), self.block_size)
+        with self._lock:
+            columns = self._block[:, self._columns[device]]
+            columns[:n] = np.asarray(data[:n]).reshape(n, -1)
+            columns[n:] = 0
+            self._waiting.discard(device)
+            if self._waiting:
+                return None
+            self._waiting = set(range(len(self.channels)))
+            return self._block.copy()
@@ -0,0 +1,102 @@
+"""
+Per-channel audio features of one (frames, channels) block in a single vectorized pass.
+
+All channels of a block (one multi-channel interface, or several devices
+joined by capture.BlockCombiner) go through one windowed rFFT along the
+frame axis; band levels are one matrix product of the band masks with the
+power spectrum, and onsets come from the positive spectral flux against its
+running mean, per channel. The cost grows with the number of channels inside
+NumPy, never with the number of Python calls.
+
+    rms     (C,)    RMS of the block, full scale = 1
+    rms_db  (C,)    the same in dBFS
+    bands   (C, B)  RMS per frequency band (Parseval, windowed)
+    flux    (C,)    positive spectral flux against the previous block
+    onsets  (C,)    bool, flux jumped above onset_ratio times its running mean
+    levels  (C,)    rms_db mapped to 0..1 over level_range (AudioProcessor replaces it with
+                    AdaptiveGain levels when ADAPTIVE_GAIN is on, see quantiles.py)
+"""
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+BANDS: Tuple[Tuple[float, float], ...] = ((20, 250), (250, 2000), (2000, 8000))  # low, mid, high, Hz
+MIN_DB = -120.0
+
+
+class Features:
+    __slots__ = ("rms", "rms_db", "bands", "flux", "onsets", "levels")
+
+    def __init__(self, rms, rms_db, bands, flux, onsets, levels):
+        self.rms = rms
+        self.rms_db = rms_db
+        self.bands = bands
+        self.flux = flux
+        self.onsets = onsets
+        self.levels = levels
+
+    def __repr__(self) -> str:
+        return f"Features(rms_db={np.round(self.rms_db, 1).tolist()}, onsets={self.onsets.tolist()})"
+
+
+class FeatureExtractor:
+    def __init__(self, channels: int, block_size: int, sample_rate: int, bands: Sequence[Tuple[float, float]] = BANDS,
+                 onset_ratio: float = 1.5, onset_decay: float = 0.9, onset_floor: float = 1e-3,
+                 level_range: Tuple[float, float] = (-40.0, 0.0)):
+        """
+        Args:
+            channels: channels per block
+            block_size: frames per block; blocks of another size rebuild the window
+            sample_rate: Hz
+            bands: (low, high) Hz per band
+            onset_ratio: flux over its running mean that counts as an onset
+            onset_decay: weight of the history in the running mean of the flux, per block
+            onset_floor: minimum flux of an onset, so noise in silence does not trigger
+            level_range: dBFS mapped to levels 0..1
+        """
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.band_edges = tuple(bands)
+        self.onset_ratio = onset_ratio
+        self.onset_decay = onset_decay
+        self.onset_floor = onset_floor
+        self.level_range = level_range
+        self._flux_mean = np.zeros(channels, dtype=np.float32)
+        self._setup(block_size)
+
+    def _setup(self, block_size: int):
+        self.block_size = block_size
+        self._window = np.hanning(block_size).astype(np.float32)
+        freqs = np.fft.rfftfreq(block_size, 1 / self.sample_rate)
+        self._band_masks = np.array([(freqs >= low) & (freqs < high) for low, high in self.band_edges],
+                                    dtype=np.float32)
+        # One sided power -> mean square of the windowed block (Parseval)
+        self._power_scale = np.float32(2 / (block_size * np.dot(self._window, self._window)))
+        # Magnitude of a full scale sine
+        self._mag_scale = np.float32(2 / self._window.sum())
+        self._previous = np.zeros((len(freqs), self.channels), dtype=np.float32)
+
+    def process(self, block: np.ndarray) -> Features:
+        """block: (frames, channels) float, or (frames,) for one channel"""
+        block = np.asarray(block, dtype=np.float32).reshape(len(block), -1)
+        if len(block) != self.block_size:
+            self._setup(len(block))
+        rms = np.sqrt(np.einsum("ij,ij->j", block, block) / len(block))
+        with np.errstate(divide="ignore"):
+            rms_db = np.maximum(20 * np.log10(rms), MIN_DB)
+
+        magnitude = np.abs(np.fft.rfft(block * self._window[:, None], axis=0)).astype(np.float32)
+        bands = np.sqrt((self._band_masks @ (magnitude * magnitude)) * self._power_scale).T
+
+        magnitude *= self._mag_scale
+        rise = magnitude - self._previous
+        np.maximum(rise, 0, out=rise)
+        flux = rise.sum(axis=0)
+        onsets = (flux > self.onset_ratio * self._flux_mean) & (flux > self.onset_floor)
+        self._flux_mean *= self.onset_decay
+        self._flux_mean += (1 - self.onset_decay) * flux
+        self._previous = magnitude
+        low, high = self.level_range
+        levels = np.clip((rms_db - low) / (high - low), 0.0, 1.0)
+        return Features(rms, rms_db, bands, flux, onsets, levels)
@@ -0,0 +1,162 @@
+"""
+Streaming quantiles and adaptive gain on fixed memory.
+
+P2Quantile is the P² estimator (Jain & Chlamtac, 1985): five markers whose
+heights follow the p-quantile of everything seen so far, updated in O(1)
+with a parabolic interpolation and no stored samples. To follow a level that
+changes over the night, WindowedQuantile runs two of them staggered by half
+a window and restarts each one after `window` samples; the one with more
+history answers, so the estimate covers the last window / 2 .. window
+samples. AdaptiveGain maps a value to 0..1 between a low and a high
+windowed quantile of its own history, e.g. a level in dB between the quiet
+and the loud moments of the last minute. Only true silence is gated: while
+even the high quantile stays below an absolute floor, the history is nothing
+but background noise and the last output is held instead of stretching the
+noise over the scale. Above the floor the learned range is used as is, so a
+quiet venue gets the whole scale too.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+
+class P2Quantile:
+    def __init__(self, p: float):
+        if not 0 < p < 1:
+            raise ValueError(f"Quantile must be in (0, 1), got {p}")
+        self.p = p
+        self.count = 0
+        self._q: List[float] = []  # marker heights
+        self._n = [0, 1, 2, 3, 4]  # marker positions
+        self._desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self._step = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def reset(self):
+        self.__init__(self.p)
+
+    def add(self, x: float):
+        self.count += 1
+        q = self._q
+        if self.count <= 5:
+            q.append(x)
+            q.sort()
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        n = self._n
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._step[i]
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self._q, self._n
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    @property
+    def value(self) -> Optional[float]:
+        """Current estimate, None before the first sample"""
+        if not self._q:
+            return None
+        if self.count < 5:
+            return self._q[min(len(self._q) - 1, int(self.p * len(self._q)))]
+        return self._q[2]
+
+
+class WindowedQuantile:
+    def __init__(self, p: float, window: int):
+        """
+        Args:
+            p: quantile in (0, 1)
+            window: samples after which an estimator restarts (the horizon)
+        """
+        self.p = p
+        self.window = max(10, int(window))
+        self._estimators = (P2Quantile(p), P2Quantile(p))
+        self._seen = 0
+
+    def add(self, x: float):
+        self._seen += 1
+        for estimator in self._estimators:
+            if estimator.count >= self.window:
+                estimator.reset()
+        self._estimators[0].add(x)
+        # The second one starts half a window later
+        if self._seen > self.window // 2:
+            self._estimators[1].add(x)
+
+    @property
+    def value(self) -> Optional[float]:
+        return max(self._estimators, key=lambda estimator: estimator.count).value
+
+
+class AdaptiveGain:
+    def __init__(self, window: int, low: float = 0.05, high: float = 0.95, min_span: float = 6.0,
+                 fallback: Tuple[float, float] = (-40.0, 0.0), warmup: int = 20, floor: Optional[float] = -65.0):
+        """
+        Args:
+            window: horizon in samples, e.g. seconds / block period
+            low, high: quantiles mapped to 0 and 1
+            min_span: smallest low..high range, so steady noise is not stretched to the full scale
+            fallback: fixed range used during warmup
+            warmup: samples before the quantiles are used
+            floor: silence threshold: while the high quantile is below it the output is held, None: never
+        """
+        self.low = WindowedQuantile(low, window)
+        self.high = WindowedQuantile(high, window)
+        self.min_span = min_span
+        self.fallback = fallback
+        self.warmup = warmup
+        self.floor = floor
+        self._count = 0
+        self._last = 0.0
+
+    @property
+    def range(self) -> Tuple[float, float]:
+        if self._count < self.warmup:
+            return self.fallback
+        low, high = self.low.value, self.high.value
+        if high - low < self.min_span:
+            middle = (low + high) / 2
+            low, high = middle - self.min_span / 2, middle + self.min_span / 2
+        return low, high
+
+    @property
+    def silent(self) -> bool:
+        """Even the loud end of the history is below the floor"""
+        if self.floor is None or self._count < self.warmup:
+            return False
+        return self.high.value < self.floor
+
+    def update(self, x: float) -> float:
+        """Add x to the history and return it mapped to 0..1 by the current range"""
+        if math.isfinite(x):
+            self._count += 1
+            self.low.add(x)
+            self.high.add(x)
+        if not math.isfinite(x):
+            return 0.0 if x < 0 else 1.0
+        if self.silent:
+            return self._last
+        low, high = self.range
+        self._last = min(1.0, max(0.0, (x - low) / (high - low)))
+        return self._last
@@ -1,5 +1,62 @@
+import os
+
 WLED_DISCOVERY_IP = "192.168.1.255"
-WLED_PORT = 21324
+WLED_PORT = 21324  # UDP notifier (sync) port
+WLED_INFO_PORT = 65506  # UDP sys-info (node announcement) port
+WLED_REGISTRY_PATH = os.getenv("WLED_REGISTRY_PATH", "data/wled_registry.json")
+WLED_BULK_WORKERS = 32  # shared thread pool for fan-out calls to many WLEDs
+WLED_BULK_TIMEOUT = 1.0  # default per-call deadline of bulk operations, seconds
+WLED_HEALTH_INTERVAL = 2.0  # seconds between health probe rounds
+WLED_HEALTH_PROBE_TIMEOUT = 0.5  # HTTP timeout of one health probe, seconds
+WLED_OUTPUT = os.getenv("WLED_OUTPUT", "sacn")  # realtime protocol to the strips: "sacn" or "ddp", see wled/output.py
+WLED_BATCH_SEND = os.getenv("WLED_BATCH_SEND", "0") == "1"  # one sendmmsg per frame for all strips, see wled/udp_batch.py
+E131_SYNC_UNIVERSE = 63999  # universe address of E1.31 sync packets
+E131_FRAME_SYNC = os.getenv("E131_FRAME_SYNC", "0") == "1"  # latch all strips with one sync packet per frame
+# Cube edges of strip segments: WLED name or IP -> [(vertex, vertex), ...], see render/layout.py.
+# Strips without an entry take the free edges in order.
+CUBE_LAYOUT = {}
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0"))  # >0: render in that many worker processes, see render/farm.py
+IDLE_MODE = os.getenv("IDLE_MODE", "preset")  # without audio: "preset" hands over to the device, "cache" streams a prerendered loop
+FRAME_CACHE_DIR = os.getenv("FRAME_CACHE_DIR", "data/frame_cache")
+FRAME_CACHE_MAX_FILES = 16  # idle loops kept on disk (one per color), least recently used deleted first
+FRAME_CACHE_MAX_OPEN = 4  # idle loops kept memory-mapped
+SHOW_CAPTURE_PATH = os.getenv("SHOW_CAPTURE_PATH")  # record every output frame, strftime pattern, e.g. data/shows/%Y%m%d-%H%M%S.show
+SHOW_PLAYBACK_PATH = os.getenv("SHOW_PLAYBACK_PATH")  # play a recorded show instead of rendering
+SHOW_PLAYBACK_SPEED = float(os.getenv("SHOW_PLAYBACK_SPEED", "1.0"))
+# Per strip output: "pixels" streams rendered frames, "parametric" runs an effect on the strip
+# driven by UDP notifier packets, see wled/parametric.py. WLED name or IP -> mode, others take WLED_STRIP_MODE.
+WLED_STRIP_MODE = os.getenv("WLED_STRIP_MODE", "pixels")
+WLED_STRIP_MODES = {}
+PARAMETRIC_FX = 2  # WLED effect index run in parametric mode (2: Breathe)
+PARAMETRIC_PALETTE = 0
+PARAMETRIC_PHASE_SHIFTS = {}  # WLED name or IP -> timebase shift, ms
+TIME_SYNC = os.getenv("TIME_SYNC", "0") == "1"  # model device clocks and correct pushed timebases, see wled/time_sync.py
+TIME_SYNC_INTERVAL = 5.0  # seconds between round trip probe rounds
+TIME_SYNC_TOLERANCE = 0.003  # allowed device clock error, seconds
+LATENCY_COMPENSATION = os.getenv("LATENCY_COMPENSATION", "0") == "1"  # delay frames to fast strips, see wled/latency.py
+LATENCY_MAX_DELAY = 0.25  # largest transmit delay given to one strip, seconds
+CONGESTION_CONTROL = os.getenv("CONGESTION_CONTROL", "0") == "1"  # AIMD per strip frame rate / grouping, see wled/congestion.py
+CONGESTION_MIN_FPS = 4.0
+CONGESTION_MAX_GROUPING = 4
+PALETTE = os.getenv("PALETTE", "inside")  # amplitude -> color palette, see PALETTES in wled/controller.py
+PALETTE_MODE = os.getenv("PALETTE_MODE", "linear")  # "linear", "smooth" or "step", see render/palette.py
+PALETTE_SIZE = 256  # LUT entries
+SCENE_FADE = float(os.getenv("SCENE_FADE", "1.5"))  # crossfade between scenes (live, idle loop, preset), seconds
+SCENE_CURVE = os.getenv("SCENE_CURVE", "smooth")  # "linear", "smooth" or "equal_power", see render/scenes.py
+# Power budget per power supply, see render/power.py. Strips are grouped by PSU_GROUPS (WLED name or IP -> PSU),
+# strips without an entry have a PSU of their own. PSU -> budget in PSU_BUDGETS, others take PSU_BUDGET_MA (0: no limit).
+PSU_GROUPS = {}
+PSU_BUDGETS = {}
+PSU_BUDGET_MA = float(os.getenv("PSU_BUDGET_MA", "0"))
+LED_CHANNEL_MA = (20.0, 20.0, 20.0)  # current of R, G, B at 255, mA
+LED_IDLE_MA = 1.0  # current of a dark LED, mA
+# Activity gate on the audio input, see audio/activity.py: while it is closed frames go out at ACTIVITY_IDLE_INTERVAL
+ACTIVITY_GATE = os.getenv("ACTIVITY_GATE", "0") == "1"
+ACTIVITY_OPEN_DB = float(os.getenv("ACTIVITY_OPEN_DB", "-45"))  # RMS dBFS that opens the gate
+ACTIVITY_CLOSE_DB = float(os.getenv("ACTIVITY_CLOSE_DB", "-50"))  # and below which it closes after ACTIVITY_HOLD
+ACTIVITY_HOLD = 0.3  # seconds
+ACTIVITY_VAD = os.getenv("ACTIVITY_VAD")  # webrtcvad aggressiveness 0..3, unset: energy only
+ACTIVITY_IDLE_INTERVAL = 0.5  # seconds between frames while the gate is closed (below WLED's realtime timeout)
 
 
 SAMPLE_RATE = 44100
@@ -7,6 +64,18 @@ BUFFER_DURATION = 0.1
 MIN_BRIGHTNESS = 50
 MAX_BRIGHTNESS = 255
 SMOOTHING_FACTOR = 0.5  # Коэффициент сглаживания амплитуды
+# Входы: (устройство sounddevice, имя или индекс, None - по умолчанию; число каналов). Каналы всех входов
+# идут подряд в этом порядке, признаки считаются одним проходом, см. audio/features.py
+AUDIO_DEVICES = [(None, 1)]
+# Канал -> точка (x, y, z) его микрофона в кубе; ленты ближе к микрофону следуют его уровню, {} - один уровень на весь куб
+AUDIO_CHANNEL_ZONES = {}
+# Адаптивное усиление: уровень в dB переводится в 1..100 между квантилями ADAPTIVE_GAIN_QUANTILES своей истории
+# за ADAPTIVE_GAIN_HORIZON секунд (P², фиксированная память), а не в окне -40..0 dB, см. audio/quantiles.py
+ADAPTIVE_GAIN = os.getenv("ADAPTIVE_GAIN", "0") == "1"
+ADAPTIVE_GAIN_HORIZON = float(os.getenv("ADAPTIVE_GAIN_HORIZON", "60"))
+ADAPTIVE_GAIN_QUANTILES = (0.05, 0.95)
+ADAPTIVE_GAIN_MIN_SPAN = 6.0  # dB, ровный шум не растягивается на всю шкалу
+ADAPTIVE_GAIN_FLOOR = -65.0  # dBFS, порог тишины: пока даже 95-й процентиль ниже, амплитуда не меняется
 
 
 MOTION_HOST = "0.0.0.0"
@@ -1,5 +1,6 @@
 from wled.controller import WLEDController
 from audio.audio_processor import AudioProcessor
+from audio.activity import ActivityGate
 from network.motion_server import MotionServer
 from time import sleep
 from threading import Thread
@@ -19,7 +20,14 @@ def main():
     
 
     wled_controller.sound_color_hue = 0
-    audio_processor = AudioProcessor(sound_callback)
+    gate = None
+    if config.ACTIVITY_GATE:
+        vad = int(config.ACTIVITY_VAD) if config.ACTIVITY_VAD else None
+        gate = ActivityGate(vad_aggressiveness=vad)
+        gate.subscribe(wled_controller.set_audio_activity)
+    # Признаки каналов нужны только зонам микрофонов
+    on_features = wled_controller.set_audio_features if config.AUDIO_CHANNEL_ZONES else None
+    audio_processor = AudioProcessor(sound_callback, gate=gate, on_features=on_features)
     
     motion_server = MotionServer(wled_controller, debug=True)
     
@@ -0,0 +1,382 @@
+"""
+MotionJournal: append-only, memory-mapped binary journal of MQTT motion traffic.
+
+Every motion, status, event and error message is stored as one fixed-size
+16-byte record (timestamp, kind, sensor id, count) in preallocated segment
+files. Writes are queued and applied by a background thread, so the MQTT
+network thread never touches the disk. Queries memory-map the segments and
+run vectorized NumPy code over them.
+
+Timestamps are kept non-decreasing across the journal (a record older than
+the last one written, e.g. after a clock step, is stored at the last time),
+so range queries binary-search every segment. Segments written before that
+rule are detected on open and scanned with a mask instead.
+
+Layout on disk:
+    <directory>/sensors.json          sensor name -> numeric id
+    <directory>/segment-000001.bin    RECORD_DTYPE records, zero-filled tail
+"""
+
+import json
+import logging
+import mmap
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Record kinds
+KIND_MOTION = 1
+KIND_STATUS = 2
+KIND_EVENT = 3
+KIND_ERROR = 4
+
+RECORD_DTYPE = np.dtype([
+    ("ts", "<f8"),       # unix time, seconds
+    ("count", "<u4"),    # sensor-side motion counter
+    ("sensor", "<u2"),   # id from sensors.json
+    ("kind", "u1"),      # KIND_* constant
+    ("_pad", "u1"),
+])
+
+DEFAULT_SENSOR = "default"
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".bin"
+
+
+class _Segment:
+    """One preallocated segment file mapped into memory"""
+
+    def __init__(self, path: str, capacity: int, writable: bool):
+        self.path = path
+        self.capacity = capacity
+        self.writable = writable
+        if writable and not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.truncate(capacity * RECORD_DTYPE.itemsize)
+        self._file = open(path, "r+b" if writable else "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self.capacity = size // RECORD_DTYPE.itemsize
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=access)
+        self.records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=self.capacity)
+        self.length = self._find_length()
+        ts = self.view()["ts"]
+        self.ordered = not np.any(ts[1:] < ts[:-1])
+
+    def _find_length(self) -> int:
+        """Records are written contiguously, so the zero-filled tail starts at the first ts == 0"""
+        empty = self.records["ts"] == 0
+        return int(np.argmax(empty)) if empty.any() else self.capacity
+
+    @property
+    def full(self) -> bool:
+        return self.length >= self.capacity
+
+    def append(self, batch: np.ndarray) -> int:
+        """Copy as much of batch as fits, return the number of records written"""
+        n = min(len(batch), self.capacity - self.length)
+        self.records[self.length:self.length + n] = batch[:n]
+        self.length += n
+        return n
+
+    def view(self) -> np.ndarray:
+        return self.records[:self.length]
+
+    @property
+    def last_ts(self) -> float:
+        return float(self.records["ts"][self.length - 1]) if self.length else 0.0
+
+    def flush(self):
+        if self.writable:
+            self._mmap.flush()
+
+    def close(self):
+        self.flush()
+        # Drop the array view before closing the mapping it points into
+        self.records = None
+        self._mmap.close()
+        self._file.close()
+
+
+class MotionJournal:
+    """
+    Append-only binary journal of motion traffic with rotation and analytics queries.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_records: int = 1 << 20,
+        max_segments: int = 64,
+        flush_interval: float = 1.0
+    ):
+        """
+        Initialize MotionJournal
+
+        Args:
+            directory: Directory holding the segment files (created if missing)
+            segment_records: Records per segment file (16 bytes each)
+            max_segments: Oldest segments beyond this count are deleted on rotation
+            flush_interval: Seconds between msync calls of the active segment
+        """
+        self.directory = directory
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+
+        os.makedirs(directory, exist_ok=True)
+        self._sensors_path = os.path.join(directory, "sensors.json")
+        self._sensors: Dict[str, int] = self._load_sensors()
+        self._sensors_lock = threading.Lock()  # between writers (writer thread, flush()); queries never take it
+
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._lock = threading.Lock()  # guards segments against concurrent queries
+        self._segments: List[_Segment] = []
+        self._open_segments()
+
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+
+    # Sensors
+    def _load_sensors(self) -> Dict[str, int]:
+        if os.path.exists(self._sensors_path):
+            with open(self._sensors_path) as f:
+                return json.load(f)
+        return {}
+
+    def _save_sensors(self):
+        tmp_path = self._sensors_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._sensors, f)
+        os.replace(tmp_path, self._sensors_path)
+
+    def sensor_id(self, name: Optional[str]) -> Optional[int]:
+        """Numeric id of a sensor, None if it has not been journaled yet"""
+        return self._sensors.get(name or DEFAULT_SENSOR)
+
+    def _register_sensors(self, names) -> List[int]:
+        """Ids of names, assigning new ones and persisting sensors.json (on the writer side)"""
+        with self._sensors_lock:
+            ids = []
+            new = False
+            for name in names:
+                sensor_id = self._sensors.get(name)
+                if sensor_id is None:
+                    # Readers only do dict lookups, a new key is published atomically
+                    sensor_id = self._sensors[name] = len(self._sensors)
+                    new = True
+                ids.append(sensor_id)
+            if new:
+                self._save_sensors()
+        return ids
+
+    def sensor_names(self) -> Dict[int, str]:
+        return {v: k for k, v in dict(self._sensors).items()}
+
+    # Segments
+    def _segment_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{index:06d}{SEGMENT_SUFFIX}")
+
+    def _segment_indices(self) -> List[int]:
+        indices = []
+        for fn in os.listdir(self.directory):
+            if fn.startswith(SEGMENT_PREFIX) and fn.endswith(SEGMENT_SUFFIX):
+                indices.append(int(fn[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(indices)
+
+    def _open_segments(self):
+        indices = self._segment_indices() or [1]
+        for index in indices[:-1]:
+            self._segments.append(_Segment(self._segment_path(index), self.segment_records, writable=False))
+        self._segments.append(_Segment(self._segment_path(indices[-1]), self.segment_records, writable=True))
+        self._index = indices[-1]
+        self._last_ts = max((segment.last_ts for segment in self._segments), default=0.0)
+
+    def _rotate(self):
+        """Seal the active segment, open the next one and apply retention"""
+        active = self._segments.pop()
+        active.close()
+        self._segments.append(_Segment(active.path, self.segment_records, writable=False))
+        self._index += 1
+        self._segments.append(_Segment(self._segment_path(self._index), self.segment_records, writable=True))
+        while len(self._segments) > self.max_segments:
+            oldest = self._segments.pop(0)
+            oldest.close()
+            os.remove(oldest.path)
+        logger.info(f"Motion journal rotated to segment {self._index}")
+
+    # Writing
+    def record(self, kind: int, sensor: Optional[str] = None, count: int = 0, ts: Optional[float] = None):
+        """Queue one record. Never blocks and never touches the disk on the caller's thread."""
+        self._queue.put((ts or time.time(), count, sensor or DEFAULT_SENSOR, kind))
+
+    def _drain(self, max_batch: int = 4096) -> int:
+        items = []
+        try:
+            while len(items) < max_batch:
+                items.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        if not items:
+            return 0
+        batch = np.zeros(len(items), dtype=RECORD_DTYPE)
+        ts, count, sensor, kind = zip(*items)
+        # Non-decreasing time keeps every segment sorted for the range queries
+        batch["ts"] = np.maximum.accumulate(np.maximum(ts, self._last_ts))
+        self._last_ts = float(batch["ts"][-1])
+        batch["count"] = np.clip(count, 0, np.iinfo(np.uint32).max)
+        batch["sensor"] = self._register_sensors(sensor)
+        batch["kind"] = kind
+        with self._lock:
+            while len(batch):
+                n = self._segments[-1].append(batch)
+                batch = batch[n:]
+                if self._segments[-1].full:
+                    self._rotate()
+        self.written += len(items)
+        return len(items)
+
+    def _writer_loop(self):
+        last_flush = time.time()
+        while self._running:
+            if not self._drain():
+                time.sleep(0.01)
+            if time.time() - last_flush > self.flush_interval:
+                with self._lock:
+                    self._segments[-1].flush()
+                last_flush = time.time()
+        while self._drain():
+            pass
+
+    def start(self):
+        """Start the background writer thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True, name="MotionJournalWriter")
+        self._thread.start()
+
+    def flush(self):
+        """Apply all queued records and msync the active segment (called on the caller's thread)"""
+        while self._drain():
+            pass
+        with self._lock:
+            self._segments[-1].flush()
+
+    def close(self):
+        """Stop the writer, flush queued records and unmap all segments"""
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+
+    # Queries
+    def _select(self, start: float, end: float, kind: Optional[int], fields: Tuple[str, ...]) -> List[np.ndarray]:
+        """Gather only the requested columns of records with start <= ts < end"""
+        parts: Dict[str, List[np.ndarray]] = {field: [] for field in fields}
+        with self._lock:
+            for segment in self._segments:
+                view = segment.view()
+                if not len(view):
+                    continue
+                if segment.ordered:
+                    if view["ts"][-1] < start or view["ts"][0] >= end:
+                        continue
+                    lo, hi = np.searchsorted(view["ts"], [start, end], side="left")
+                    view = view[lo:hi]
+                    mask = view["kind"] == kind if kind is not None else slice(None)
+                else:
+                    mask = (view["ts"] >= start) & (view["ts"] < end)
+                    if kind is not None:
+                        mask &= view["kind"] == kind
+                for field in fields:
+                    parts[field].append(view[field][mask])
+        return [
+            np.concatenate(parts[field]) if parts[field] else np.zeros(0, dtype=RECORD_DTYPE[field])
+            for field in fields
+        ]
+
+    def records(self, start: float = 0, end: float = float("inf"), kind: Optional[int] = None) -> np.ndarray:
+        """Return a copy of all records with start <= ts < end, optionally of a single kind"""
+        columns = self._select(start, end, kind, RECORD_DTYPE.names)
+        result = np.zeros(len(columns[0]), dtype=RECORD_DTYPE)
+        for field, column in zip(RECORD_DTYPE.names, columns):
+            result[field] = column
+        return result
+
+    def rate_histogram(
+        self, start: float, end: float, bin_seconds: float, kind: int = KIND_MOTION
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Count records per sensor per time bin
+
+        Returns:
+            (bin_edges, {sensor_name: counts}) where counts[i] covers bin_edges[i]..bin_edges[i+1]
+        """
+        n_bins = max(1, int(np.ceil((end - start) / bin_seconds)))
+        edges = start + bin_seconds * np.arange(n_bins + 1)
+        ts, sensors = self._select(start, end, kind, ("ts", "sensor"))
+        names = self.sensor_names()
+        n_sensors = max(max(names.keys(), default=-1), int(sensors.max(initial=0))) + 1
+        # ts >= start, so truncation is floor division; rounding can put ts just below end into bin n_bins
+        bins = np.minimum(((ts - start) * (1.0 / bin_seconds)).astype(np.int64), n_bins - 1)
+        flat = np.bincount(sensors.astype(np.int64) * n_bins + bins, minlength=n_sensors * n_bins)
+        per_sensor = flat.reshape(n_sensors, n_bins)
+        return edges, {names.get(i, str(i)): per_sensor[i] for i in range(n_sensors) if per_sensor[i].any()}
+
+    def occupancy(
+        self, start: float, end: float, bin_seconds: float, timeout: float, sensor: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fraction of every time bin during which motion was active, given a motion timeout.
+        Each motion record keeps the area occupied for `timeout` seconds, the same rule
+        MotionServer uses to keep the motion action alive.
+
+        Returns:
+            (bin_edges, occupancy) with occupancy values in [0, 1]
+        """
+        n_bins = max(1, int(np.ceil((end - start) / bin_seconds)))
+        edges = start + bin_seconds * np.arange(n_bins + 1)
+        ts, sensors = self._select(start - timeout, end, KIND_MOTION, ("ts", "sensor"))
+        if sensor is not None:
+            sensor_id = self.sensor_id(sensor)
+            ts = ts[sensors == sensor_id] if sensor_id is not None else ts[:0]
+        if np.any(ts[1:] < ts[:-1]):
+            ts = np.sort(ts)
+        if not len(ts):
+            return edges, np.zeros(n_bins)
+
+        # Merge overlapping [t, t + timeout) intervals into disjoint runs
+        run_starts = np.flatnonzero(np.diff(ts, prepend=-np.inf) > timeout)
+        starts = ts[run_starts]
+        ends = np.append(ts[run_starts[1:] - 1], ts[-1]) + timeout
+        lengths = ends - starts
+        covered_before = np.concatenate(([0.0], np.cumsum(lengths)))
+
+        # Covered time up to every edge, then difference per bin
+        k = np.searchsorted(starts, edges, side="right")
+        partial = np.where(k > 0, np.minimum(edges - starts[np.maximum(k - 1, 0)], lengths[np.maximum(k - 1, 0)]), 0.0)
+        covered = covered_before[np.maximum(k - 1, 0)] + np.maximum(partial, 0.0)
+        covered = np.where(k > 0, covered, 0.0)
+        return edges, np.clip(np.diff(covered) / bin_seconds, 0.0, 1.0)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'segments': len(self._segments),
+                'records': sum(s.length for s in self._segments),
+                'written': self.written,
+                'pending': self._queue.qsize(),
+            }
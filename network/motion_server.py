@@ -16,6 +16,8 @@ from typing import Optional, Callable, Any, Dict
 import paho.mqtt.client as mqtt
 from dotenv import load_dotenv
 
+from network.motion_journal import MotionJournal, KIND_MOTION, KIND_STATUS, KIND_EVENT, KIND_ERROR
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -28,7 +30,8 @@ class MotionServer:
     def __init__(
         self, 
         wled_controller=None,
-        debug: bool = False
+        debug: bool = False,
+        journal: Optional[MotionJournal] = None
     ):
         """
         Initialize MotionServer
@@ -36,6 +39,7 @@ class MotionServer:
         Args:
             wled_controller: WLED controller object with methods like turn_on(), turn_off()
             debug: Enable debug logging
+            journal: MotionJournal to record motion traffic into (optional)
             
         Environment variables:
             MQTT_HOST: MQTT broker hostname/IP (default: "192.168.50.9")
@@ -43,6 +47,7 @@ class MotionServer:
             MQTT_USERNAME: MQTT username (optional)
             MQTT_PASSWORD: MQTT password (optional)
             MOTION_TIMEOUT: Seconds to keep action active after motion detection (default: 30)
+            MOTION_JOURNAL_DIR: Directory for the motion journal, used if no journal is passed (optional)
         """
         self.wled_controller = wled_controller
         
@@ -53,6 +58,10 @@ class MotionServer:
         self.mqtt_password = os.getenv("MQTT_PASSWORD", None)
         self.motion_timeout = int(os.getenv("MOTION_TIMEOUT", "10"))
 
+        journal_dir = os.getenv("MOTION_JOURNAL_DIR")
+        if journal is None and journal_dir:
+            journal = MotionJournal(journal_dir)
+        self.journal = journal
         
         # Setup logging
         log_level = logging.DEBUG if debug else logging.INFO
@@ -144,6 +153,7 @@ class MotionServer:
             count = data.get('count', 0)
             
             if motion:
+                self._journal_record(KIND_MOTION, data, count)
                 with self._lock:
                     self._last_motion_time = time.time()
                     self._motion_count = count
@@ -172,6 +182,7 @@ class MotionServer:
         try:
             data = json.loads(payload)
             self.logger.debug(f"Status update: {data}")
+            self._journal_record(KIND_STATUS, data, data.get('motion_count', 0))
             
             # Call custom callback if set
             if self.on_status_update:
@@ -185,10 +196,24 @@ class MotionServer:
     def _handle_motion_event(self, payload: str):
         """Handle motion event message"""
         self.logger.info(f"Motion event: {payload}")
+        self._journal_record(KIND_EVENT)
         
     def _handle_error(self, payload: str):
         """Handle error message"""
         self.logger.error(f"ESP32 Error: {payload}")
+        self._journal_record(KIND_ERROR)
+
+    def _journal_record(self, kind: int, data: Optional[Dict[str, Any]] = None, count: int = 0):
+        """Queue a record in the motion journal, if one is configured"""
+        if self.journal is None:
+            return
+        sensor = None
+        if data:
+            sensor = data.get('sensor') or data.get('device')
+        try:
+            self.journal.record(kind, sensor=sensor, count=int(count or 0))
+        except Exception as e:
+            self.logger.error(f"Error recording to motion journal: {e}")
         
     def _trigger_motion_action(self):
         """Trigger action when motion is detected"""
@@ -236,6 +261,8 @@ class MotionServer:
         """Start the motion server (blocking call for thread)"""
         self._running = True
         self.logger.info("Starting MotionServer...")
+        if self.journal:
+            self.journal.start()
         
         try:
             # Connect to MQTT broker
@@ -285,6 +312,13 @@ class MotionServer:
             self.client.disconnect()
         except Exception as e:
             self.logger.error(f"Error disconnecting MQTT: {e}")
+
+        # Flush and close the journal
+        if self.journal:
+            try:
+                self.journal.close()
+            except Exception as e:
+                self.logger.error(f"Error closing motion journal: {e}")
             
     def get_status(self) -> Dict[str, Any]:
         """Get current server status"""
@@ -295,7 +329,8 @@ class MotionServer:
                 'motion_active': self._motion_active,
                 'last_motion_time': self._last_motion_time,
                 'motion_count': self._motion_count,
-                'motion_timeout': self.motion_timeout
+                'motion_timeout': self.motion_timeout,
+                'journal': self.journal.stats() if self.journal else None
             }
             
     def set_motion_timeout(self, timeout: int):
@@ -0,0 +1,106 @@
+"""
+Spatial effects for CubeLayout.render.
+
+An effect is effect(positions, t, out, **params): positions is the (N, 3)
+float32 array of LED coordinates in the unit cube, t the time in seconds,
+and out a preallocated (N, 3) float32 array that receives RGB in 0..255.
+Everything is plain NumPy over the whole cube, one call per frame.
+"""
+
+import math
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from render.layout import azimuths
+
+CENTER = (0.5, 0.5, 0.5)
+AMPLITUDE_WAVE_PERIOD = math.pi  # seconds, amplitude_wave repeats exactly after this
+
+_nearest: Optional[Tuple[np.ndarray, bytes, np.ndarray]] = None  # (positions, zones, nearest zone per LED)
+
+
+def _paint(out: np.ndarray, value: np.ndarray, color: Sequence[float]) -> np.ndarray:
+    np.multiply(value[:, None], np.asarray(color, dtype=np.float32)[None, :], out=out)
+    return out
+
+
+def solid(positions: np.ndarray, t: float, out: np.ndarray, color: Sequence[float] = (255, 255, 255)) -> np.ndarray:
+    out[:] = np.asarray(color, dtype=np.float32)
+    return out
+
+
+def amplitude_wave(positions: np.ndarray, t: float, out: np.ndarray, color: Sequence[float],
+                   amplitude: float = 0.7, frequency: float = 2.0) -> np.ndarray:
+    """
+    The audio animation in space: a standing sine along the height of the cube,
+    modulated by a wave that runs around the vertical axis.
+    """
+    z = positions[:, 2]
+    angle = azimuths(positions)
+    value = (amplitude * np.sin(2 * math.pi * frequency * z) + 1) / 2
+    value *= np.sin(t * 2 + angle * 2) * 0.3 + 0.7
+    return _paint(out, value, color)
+
+
+def zoned_wave(positions: np.ndarray, t: float, out: np.ndarray, color: Sequence[float], levels: Sequence[float],
+               zones: Sequence[float], amplitude: float = 0.7, frequency: float = 2.0) -> np.ndarray:
+    """
+    amplitude_wave with every LED scaled by the level (0..1) of its nearest
+    zone. zones are the zone centers, flat (3 * Z) as they arrive from
+    RenderFarm parameters, e.g. where each microphone stands in the cube.
+    """
+    amplitude_wave(positions, t, out, color, amplitude, frequency)
+    gain = np.asarray(levels, dtype=np.float32)[nearest_zone(positions, zones)]
+    out *= gain[:, None]
+    return out
+
+
+def nearest_zone(positions: np.ndarray, zones: Sequence[float]) -> np.ndarray:
+    """
+    Index of the nearest zone center for every LED. The layout and the zones
+    do not change between frames, so the result is kept for the last
+    positions array (per process: the cube, or the shard of a farm worker).
+    """
+    global _nearest
+    key = np.asarray(zones, dtype=np.float32).tobytes()
+    cached = _nearest
+    if cached is not None and cached[0] is positions and cached[1] == key:
+        return cached[2]
+    centers = np.frombuffer(key, dtype=np.float32).reshape(-1, 3)
+    distance = ((positions[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    nearest = np.argmin(distance, axis=1)
+    _nearest = (positions, key, nearest)
+    return nearest
+
+
+def plane_wave(positions: np.ndarray, t: float, out: np.ndarray, color: Sequence[float],
+               direction: Sequence[float] = (0, 0, 1), wavelength: float = 0.5, speed: float = 0.5) -> np.ndarray:
+    """Bands travelling through the cube along direction"""
+    d = np.asarray(direction, dtype=np.float32)
+    d /= np.linalg.norm(d)
+    phase = (positions @ d - speed * t) * (2 * math.pi / wavelength)
+    value = (np.sin(phase) + 1) / 2
+    return _paint(out, value, color)
+
+
+def radial_pulse(positions: np.ndarray, t: float, out: np.ndarray, color: Sequence[float],
+                 center: Sequence[float] = CENTER, speed: float = 0.5, width: float = 0.15) -> np.ndarray:
+    """A spherical shell expanding from center, restarting every sqrt(3) / speed seconds"""
+    r = np.linalg.norm(positions - np.asarray(center, dtype=np.float32), axis=1)
+    front = (speed * t) % math.sqrt(3)
+    value = np.exp(-((r - front) / width) ** 2)
+    return _paint(out, value, color)
+
+
+def palette_wave(positions: np.ndarray, t: float, out: np.ndarray, lut: np.ndarray, level: float = 0.5,
+                 spread: float = 0.25, frequency: float = 1.0) -> np.ndarray:
+    """
+    Every LED takes its color from a palette LUT (render.palette) at the audio
+    level, shifted by a wave running up the cube. lut may be flat (3 * size),
+    as it arrives from RenderFarm parameters.
+    """
+    lut = np.asarray(lut, dtype=np.float32).reshape(-1, 3)
+    phase = np.sin(2 * math.pi * frequency * positions[:, 2] - 2 * t)
+    index = np.clip(level + spread * phase, 0.0, 1.0) * (len(lut) - 1) + 0.5
+    return np.take(lut, index.astype(np.intp), axis=0, out=out)
@@ -0,0 +1,242 @@
+"""
+Multiprocess render farm.
+
+The cube is split into shards (groups of whole strips) and every shard is
+rendered by its own worker process, so rendering is not bound to the GIL of
+the process that also runs audio, MQTT and output.
+
+All data lives in one multiprocessing.shared_memory block (FrameRing):
+
+    header    int64 (2,)                        stop flag, reserved
+    control   int64 (slots, 1 + n_shards)       frame seq, then the seq each shard finished
+    features  float64 (slots, 1 + n_features)   t, then the effect parameters of that frame
+    frames    uint8 (slots, 3N)                 the frame, laid out like CubeLayout.frame
+
+The coordinator writes t and the features of frame seq into slot seq % slots
+and wakes every worker. A frame is complete when every shard has stamped it
+with seq, so all shards always show the same frame. Each slot has its own
+completion semaphore, drained when the frame is collected, so waiting for one
+frame is never woken by another. The output reads the
+slot in place (no copy) and can submit the next frames while sending.
+"""
+
+import logging
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from render.layout import CubeLayout, Effect
+
+logger = logging.getLogger(__name__)
+
+ParamSpec = Sequence[Tuple[str, int]]
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class FrameRing:
+    """Views over the shared memory block; create in the coordinator, attach by name in workers"""
+
+    def __init__(self, n_channels: int, n_shards: int, n_features: int, slots: int = 4, name: Optional[str] = None):
+        self.n_channels = n_channels
+        self.n_shards = n_shards
+        self.n_features = n_features
+        self.slots = slots
+        sizes = [2 * 8, slots * (1 + n_shards) * 8, slots * (1 + n_features) * 8, slots * n_channels]
+        offsets = np.cumsum([0] + [_align(s) for s in sizes])
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=max(int(offsets[-1]), 1))
+        buf = self.shm.buf
+        self.header = np.ndarray((2,), np.int64, buf, offsets[0])
+        self.control = np.ndarray((slots, 1 + n_shards), np.int64, buf, offsets[1])
+        self.features = np.ndarray((slots, 1 + n_features), np.float64, buf, offsets[2])
+        self.frames = np.ndarray((slots, n_channels), np.uint8, buf, offsets[3])
+        if self.owner:
+            self.header[:] = 0
+            self.control[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def geometry(self) -> Tuple[int, int, int, int]:
+        return self.n_channels, self.n_shards, self.n_features, self.slots
+
+    def close(self):
+        # Views must go before the buffer can be released
+        self.header = self.control = self.features = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class Shard:
+    """Strips rendered by one worker: their positions and where each lands in the frame"""
+
+    def __init__(self, keys: List[Hashable], positions: np.ndarray, chunks: List[Tuple[int, int, int]]):
+        self.keys = keys
+        self.positions = positions
+        self.chunks = chunks  # (channel offset in frame, first row in positions, n_leds)
+
+    @property
+    def n_leds(self) -> int:
+        return len(self.positions)
+
+
+def shard_strips(layout: CubeLayout, n_shards: int, group: Callable[[Hashable], Hashable] = lambda key: key) -> List[Shard]:
+    """
+    Split the layout into at most n_shards shards of whole strip groups, balanced by LED count.
+    Strips with the same group(key) always end up in the same shard.
+    """
+    groups: Dict[Hashable, List] = {}
+    for key, strip in layout.strips.items():
+        groups.setdefault(group(key), []).append(strip)
+    buckets: List[List] = [[] for _ in range(max(1, min(n_shards, len(groups))))]
+    loads = [0] * len(buckets)
+    for strips in sorted(groups.values(), key=lambda s: -sum(strip.n_leds for strip in s)):
+        i = loads.index(min(loads))
+        buckets[i].extend(strips)
+        loads[i] += sum(strip.n_leds for strip in strips)
+
+    shards = []
+    for strips in buckets:
+        chunks, rows = [], []
+        for strip in strips:
+            chunks.append((strip.channel_offset, sum(len(r) for r in rows), strip.n_leds))
+            rows.append(layout.positions[strip.led_offset:strip.led_offset + strip.n_leds])
+        positions = np.concatenate(rows) if rows else np.zeros((0, 3), np.float32)
+        shards.append(Shard([strip.key for strip in strips], positions, chunks))
+    return shards
+
+
+def _unpack(vector: np.ndarray, params: ParamSpec) -> dict:
+    kwargs, i = {}, 0
+    for name, size in params:
+        kwargs[name] = float(vector[i]) if size == 1 else vector[i:i + size]
+        i += size
+    return kwargs
+
+
+def _worker_main(ring_name: str, geometry, index: int, positions: np.ndarray, chunks, effect: Effect,
+                 params: ParamSpec, go, done):
+    ring = FrameRing(*geometry, name=ring_name)
+    rgb = np.zeros((len(positions), 3), dtype=np.float32)
+    seq = 0
+    try:
+        while True:
+            go.acquire()
+            if ring.header[0]:
+                break
+            seq += 1
+            slot = seq % ring.slots
+            effect(positions, float(ring.features[slot, 0]), out=rgb, **_unpack(ring.features[slot, 1:], params))
+            np.clip(rgb, 0, 255, out=rgb)
+            frame = ring.frames[slot]
+            for channel_offset, row, n in chunks:
+                np.copyto(frame[channel_offset:channel_offset + 3 * n].reshape(n, 3), rgb[row:row + n], casting="unsafe")
+            ring.control[slot, 1 + index] = seq
+            done[slot].release()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+class RenderFarm:
+    """
+    Renders a CubeLayout with one worker process per shard.
+
+    params describes the effect parameters that are broadcast every frame, e.g.
+    [("color", 3), ("amplitude", 1)]; values of size 1 reach the effect as float,
+    larger ones as float64 arrays.
+    """
+
+    def __init__(self, layout: CubeLayout, effect: Effect, params: ParamSpec, workers: int = 2,
+                 group: Callable[[Hashable], Hashable] = lambda key: key, slots: int = 4):
+        """
+        Args:
+            layout: the cube; strip slices of the returned frames match layout.strip_data
+            effect: module-level effect function (it is pickled by reference)
+            params: (name, size) of every broadcast parameter
+            workers: maximum number of worker processes
+            group: strips with the same group(key) are rendered by the same worker
+            slots: frames the ring holds, i.e. how many may be in flight
+        """
+        self.layout = layout
+        self.effect = effect
+        self.params = list(params)
+        self.shards = shard_strips(layout, workers, group)
+        self.ring = FrameRing(3 * len(layout), len(self.shards), sum(size for _, size in self.params), slots)
+        self._ctx = multiprocessing.get_context("spawn")  # forking a process with sACN/MQTT threads is unsafe
+        self._go = [self._ctx.Semaphore(0) for _ in self.shards]
+        self._done = [self._ctx.Semaphore(0) for _ in range(slots)]
+        self._processes: List = []
+        self._seq = 0
+        self._collected = 0
+
+    def start(self):
+        for index, (shard, go) in enumerate(zip(self.shards, self._go)):
+            process = self._ctx.Process(
+                target=_worker_main, daemon=True, name=f"render-{index}",
+                args=(self.ring.name, self.ring.geometry(), index, shard.positions, shard.chunks,
+                      self.effect, self.params, go, self._done))
+            process.start()
+            self._processes.append(process)
+        logger.info(f"Render farm: {len(self.shards)} workers, {[shard.n_leds for shard in self.shards]} LEDs")
+
+    def submit(self, t: float, **params) -> int:
+        """Queue frame t for all shards and return its seq"""
+        if self._seq - self._collected >= self.ring.slots - 1:
+            raise RuntimeError(f"{self.ring.slots - 1} frames already in flight, collect() first")
+        self._seq += 1
+        slot = self._seq % self.ring.slots
+        vector = self.ring.features[slot]
+        vector[0] = t
+        i = 1
+        for name, size in self.params:
+            vector[i:i + size] = params[name]
+            i += size
+        self.ring.control[slot, 0] = self._seq
+        for go in self._go:
+            go.release()
+        return self._seq
+
+    def collect(self, seq: int, timeout: float = 1.0) -> np.ndarray:
+        """Wait until every shard finished frame seq and return it (a view into shared memory)"""
+        slot = seq % self.ring.slots
+        done = self._done[slot]
+        deadline = time.monotonic() + timeout
+        while not np.all(self.ring.control[slot, 1:] >= seq):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not done.acquire(timeout=remaining):
+                dead = [p.name for p in self._processes if not p.is_alive()]
+                raise TimeoutError(f"Frame {seq} not rendered within {timeout}s" + (f", dead workers: {dead}" if dead else ""))
+        # The slot is not reused before this collect, so what is left belongs to this frame (or an abandoned one)
+        while done.acquire(False):
+            pass
+        self._collected = max(self._collected, seq)
+        return self.ring.frames[slot]
+
+    def render(self, t: float, timeout: float = 1.0, **params) -> np.ndarray:
+        return self.collect(self.submit(t, **params), timeout)
+
+    def strip_bytes(self, key, frame: np.ndarray) -> bytes:
+        return self.layout.strip_bytes(key, frame)
+
+    def stop(self):
+        if self.ring.header is None:
+            return
+        self.ring.header[0] = 1
+        for go in self._go:
+            go.release()
+        for process in self._processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self.ring.close()
@@ -0,0 +1,148 @@
+"""
+Prerendered, loopable frame sequences for idle mode.
+
+A sequence is one period of an effect rendered through a CubeLayout at a
+fixed frame rate and stored as an (n_frames, 3N) uint8 .npy file. Files are
+keyed by effect, parameters, frame rate and the layout itself, rendered once
+and afterwards only memory-mapped: serving a frame is a row lookup into the
+page cache, with no rendering at all.
+
+Every color of the idle scene is a new key, so the cache is bounded: at most
+max_files sequences stay on disk and max_open of them mapped, the least
+recently used ones are dropped first.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+import config
+from render.layout import CubeLayout, Effect
+
+logger = logging.getLogger(__name__)
+
+
+def layout_signature(layout: CubeLayout) -> str:
+    digest = hashlib.sha1(layout.positions.tobytes())
+    digest.update(np.array([(s.n_leds, s.channel_offset) for s in layout.strips.values()], dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def _plain(value):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [round(float(v), 3) for v in value]
+    return round(float(value), 3) if isinstance(value, (int, float)) else value
+
+
+class FrameLoop:
+    """A cached sequence played in a loop; frame(t) is a view into the memory map"""
+
+    def __init__(self, frames: np.ndarray, fps: float, key: str = ""):
+        self.frames = frames
+        self.fps = fps
+        self.key = key
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def frame(self, t: float) -> np.ndarray:
+        return self.frames[int(t * self.fps) % len(self.frames)]
+
+
+class FrameCache:
+    def __init__(self, directory: str = config.FRAME_CACHE_DIR, max_files: int = config.FRAME_CACHE_MAX_FILES,
+                 max_open: int = config.FRAME_CACHE_MAX_OPEN):
+        """
+        Args:
+            directory: where the .npy sequences are kept
+            max_files: sequences kept on disk, least recently used deleted first
+            max_open: sequences kept memory-mapped
+        """
+        self.directory = directory
+        self.max_files = max_files
+        self.max_open = max_open
+        self._open: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()  # loops may be rendered on a background thread
+
+    @staticmethod
+    def key(layout: CubeLayout, effect: Effect, fps: float, n_frames: int, params: dict) -> str:
+        description = {
+            "effect": f"{effect.__module__}.{effect.__qualname__}",
+            "params": {name: _plain(value) for name, value in sorted(params.items())},
+            "fps": fps,
+            "n_frames": n_frames,
+            "layout": layout_signature(layout),
+        }
+        return hashlib.sha1(json.dumps(description, sort_keys=True).encode()).hexdigest()[:20]
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            frames = self._open.get(key)
+            if frames is None:
+                if not os.path.exists(self.path(key)):
+                    return None
+                frames = self._open[key] = np.load(self.path(key), mmap_mode="r")
+                while len(self._open) > self.max_open:
+                    # A FrameLoop still playing the map keeps it alive
+                    self._open.popitem(last=False)
+            self._open.move_to_end(key)
+            # The modification time orders files for eviction
+            os.utime(self.path(key))
+        return frames
+
+    def loop(self, layout: CubeLayout, effect: Effect, period: float, fps: float, **params) -> FrameLoop:
+        """
+        One period of effect as a FrameLoop, rendered on first use.
+        period should be a period of the effect in seconds so the loop has no seam;
+        it is rounded to whole frames.
+        """
+        n_frames = max(1, round(period * fps))
+        key = self.key(layout, effect, fps, n_frames, params)
+        frames = self.get(key)
+        if frames is None:
+            frames = self._render(key, layout, effect, fps, n_frames, params)
+        return FrameLoop(frames, fps, key)
+
+    def _render(self, key: str, layout: CubeLayout, effect: Effect, fps: float, n_frames: int, params: dict) -> np.ndarray:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.path(key) + ".tmp.npy"
+        frames = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint8, shape=(n_frames, len(layout.frame)))
+        for i in range(n_frames):
+            frames[i] = layout.render(effect, i / fps, **params)
+        frames.flush()
+        del frames
+        os.replace(tmp, self.path(key))
+        logger.info(f"Rendered {n_frames} frames of {effect.__name__} into {self.path(key)}")
+        frames = self.get(key)
+        self._evict()
+        return frames
+
+    def _evict(self):
+        """Delete the least recently used files beyond max_files"""
+        names = [name for name in os.listdir(self.directory) if name.endswith(".npy") and ".tmp" not in name]
+        if len(names) <= self.max_files:
+            return
+        paths = sorted((os.path.join(self.directory, name) for name in names), key=os.path.getmtime)
+        with self._lock:
+            for path in paths[:len(paths) - self.max_files]:
+                self._open.pop(os.path.basename(path)[:-len(".npy")], None)
+                os.remove(path)
+                logger.info(f"Frame cache full, removed {path}")
+
+    def clear(self):
+        """Forget open maps and delete all cached files"""
+        with self._lock:
+            self._open.clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".npy"):
+                    os.remove(os.path.join(self.directory, name))
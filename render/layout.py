@@ -0,0 +1,182 @@
+"""
+3D pixel layout of the LED cube.
+
+Every segment of a strip (an entry of cfg["hw"]["led"]["ins"]) is placed on
+one cube edge, so each LED gets an (x, y, z) position in the unit cube. All
+strips share one global position array: effects are evaluated once for the
+whole cube as vectorized functions of position and time, and the frame is
+gathered into one uint8 output buffer through a precomputed index map. Each
+strip's DMX data is a contiguous slice of that buffer, laid out the way
+WledDMX splits it into universes.
+"""
+
+import logging
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Vertex index = x + 2*y + 4*z
+CUBE_VERTICES = np.array([[x, y, z] for z in (0, 1) for y in (0, 1) for x in (0, 1)], dtype=np.float32)
+
+# Bottom ring, top ring, then the four pillars (bottom -> top)
+CUBE_EDGES: Tuple[Tuple[int, int], ...] = (
+    (0, 1), (1, 3), (3, 2), (2, 0),
+    (4, 5), (5, 7), (7, 6), (6, 4),
+    (0, 4), (1, 5), (3, 7), (2, 6),
+)
+
+Edge = Tuple[int, int]
+Effect = Callable[..., np.ndarray]
+
+_azimuths: Optional[Tuple[np.ndarray, np.ndarray]] = None  # (positions, angle per LED) of the last layout
+
+
+def azimuths(positions: np.ndarray) -> np.ndarray:
+    """
+    Angle of every LED around the vertical axis through the cube center. It
+    only depends on the layout, so it is computed once per positions array:
+    by CubeLayout when it is built, by a farm worker on its first frame.
+    """
+    global _azimuths
+    cached = _azimuths
+    if cached is not None and cached[0] is positions:
+        return cached[1]
+    angles = np.arctan2(positions[:, 1] - 0.5, positions[:, 0] - 0.5)
+    _azimuths = (positions, angles)
+    return angles
+
+
+def edge_positions(n: int, edge: Edge) -> np.ndarray:
+    """Centers of n LEDs evenly spread along a cube edge, from edge[0] to edge[1]"""
+    a, b = CUBE_VERTICES[edge[0]], CUBE_VERTICES[edge[1]]
+    k = (np.arange(n, dtype=np.float32) + 0.5) / max(n, 1)
+    return a + (b - a) * k[:, None]
+
+
+def strip_segments(cfg: dict) -> List[Tuple[int, int, bool]]:
+    """(start, length, reversed) of every LED output in a WLED cfg.json"""
+    segments = []
+    start = 0
+    for ins in cfg["hw"]["led"]["ins"]:
+        start = ins.get("start", start)
+        segments.append((start, ins["len"], bool(ins.get("rev", False))))
+        start += ins["len"]
+    return segments
+
+
+class StripMap:
+    """Where one strip lives in the global arrays"""
+
+    __slots__ = ("key", "n_leds", "led_offset", "channel_offset")
+
+    def __init__(self, key: Hashable, n_leds: int, led_offset: int, channel_offset: int):
+        self.key = key
+        self.n_leds = n_leds
+        self.led_offset = led_offset  # first row of the strip in CubeLayout.positions
+        self.channel_offset = channel_offset  # first byte of the strip in CubeLayout.frame
+
+    def __repr__(self) -> str:
+        return f"StripMap({self.key!r}, n_leds={self.n_leds}, leds@{self.led_offset})"
+
+
+class CubeLayout:
+    """
+    Global LED positions and the index map from position order to output order.
+
+    positions  float32 (N, 3), one row per LED, grouped by strip
+    frame      uint8 (3N,), concatenated per-strip DMX data (RGB per LED, strip order)
+    """
+
+    def __init__(self):
+        self.strips: Dict[Hashable, StripMap] = {}
+        self._positions: List[np.ndarray] = []
+        self._local: List[np.ndarray] = []
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __contains__(self, key) -> bool:
+        return key in self.strips
+
+    def add_strip(self, key: Hashable, segments: Sequence[Tuple[int, int, bool]], edges: Sequence[Edge]):
+        """
+        Args:
+            key: anything hashable identifying the strip (usually the Wled object)
+            segments: (start, length, reversed) per LED output, see strip_segments()
+            edges: one cube edge per segment
+        """
+        if len(edges) < len(segments):
+            raise ValueError(f"{key}: {len(segments)} segments but only {len(edges)} edges")
+        n_leds = max(start + length for start, length, _ in segments)
+        positions = np.zeros((n_leds, 3), dtype=np.float32)
+        for (start, length, rev), edge in zip(segments, edges):
+            positions[start:start + length] = edge_positions(length, edge[::-1] if rev else edge)
+        led_offset = sum(strip.n_leds for strip in self.strips.values())
+        self.strips[key] = StripMap(key, n_leds, led_offset, 3 * led_offset)
+        self._positions.append(positions)
+        self._local.append(np.arange(n_leds))
+        self._build()
+        return self.strips[key]
+
+    def _build(self):
+        if not self._positions:
+            self.positions = np.zeros((0, 3), dtype=np.float32)
+            self._gather = np.zeros(0, dtype=np.intp)
+        else:
+            self.positions = np.concatenate(self._positions)
+            # Output LED i of a strip is rendered from global row led_offset + local[i]. Strips are
+            # stored in strip order, so today this is an identity map per strip, but any reordering
+            # (skipped LEDs, a strip spanning edges out of order) only changes _gather.
+            self._gather = np.concatenate([strip.led_offset + local
+                                           for strip, local in zip(self.strips.values(), self._local)])
+        azimuths(self.positions)
+        n = len(self.positions)
+        self._rgb = np.zeros((n, 3), dtype=np.float32)
+        self.frame = np.zeros(3 * n, dtype=np.uint8)
+        self._out = self.frame.reshape(n, 3)
+        self._staging = np.zeros((n, 3), dtype=np.float32)
+
+    @classmethod
+    def from_wleds(cls, wleds: Iterable, placement: Optional[Dict[str, Sequence[Edge]]] = None) -> "CubeLayout":
+        """
+        Build a layout from devices with a cached cfg.
+
+        placement maps a device name (or IP) to the cube edges of its segments. Devices
+        without an entry take the next free edges of CUBE_EDGES, in order.
+        """
+        layout = cls()
+        placement = placement or {}
+        free_edges = list(CUBE_EDGES)
+        for wled in wleds:
+            if wled.cfg is None:
+                logger.warning(f"No cfg for {wled}, left out of the layout")
+                continue
+            segments = strip_segments(wled.cfg)
+            edges = placement.get(wled.name) or placement.get(wled.ip)
+            if edges is None:
+                edges = [free_edges.pop(0) if free_edges else CUBE_EDGES[len(layout.strips) % len(CUBE_EDGES)]
+                         for _ in segments]
+            layout.add_strip(wled, segments, edges)
+        return layout
+
+    # Rendering
+    def render(self, effect: Effect, t: float, **params) -> np.ndarray:
+        """Evaluate effect(positions, t, out, **params) for all LEDs and scatter it into frame"""
+        effect(self.positions, t, out=self._rgb, **params)
+        np.clip(self._rgb, 0, 255, out=self._rgb)
+        np.take(self._rgb, self._gather, axis=0, out=self._staging)
+        np.copyto(self._out, self._staging, casting="unsafe")
+        return self.frame
+
+    def strip_data(self, key, frame: Optional[np.ndarray] = None) -> np.ndarray:
+        """View of one strip's DMX data in frame (default: the last render)"""
+        strip = self.strips[key]
+        frame = self.frame if frame is None else frame
+        return frame[strip.channel_offset:strip.channel_offset + 3 * strip.n_leds]
+
+    def strip_bytes(self, key, frame: Optional[np.ndarray] = None) -> bytes:
+        """One strip's DMX data as bytes, ready for WledDMX.set_data"""
+        return self.strip_data(key, frame).tobytes()
@@ -0,0 +1,90 @@
+"""
+Palettes compiled into lookup tables.
+
+A palette is a list of stops (position in 0..1, RGB) and an interpolation
+mode. It is compiled once into an (size, 3) LUT; mapping a value in 0..1 to a
+color is then one index, for a single amplitude as well as for every LED of
+the cube at once. Palette objects are immutable, so swapping a palette is one
+reference assignment and never touches the renderer.
+
+    linear  straight RGB interpolation between stops
+    smooth  smoothstep easing between stops, no visible kinks at the stops
+    step    every stop holds its color until the next one
+"""
+
+from typing import Iterable, Sequence, Tuple, Union
+
+import numpy as np
+
+Stop = Tuple[float, Sequence[float]]
+MODES = ("linear", "smooth", "step")
+
+
+def compile_lut(stops: Sequence[Stop], mode: str = "linear", size: int = 256) -> np.ndarray:
+    """(size, 3) float32 LUT of the palette; positions outside the stops take the end colors"""
+    if mode not in MODES:
+        raise ValueError(f"Unknown palette mode {mode!r}, expected one of {MODES}")
+    if not stops:
+        raise ValueError("A palette needs at least one stop")
+    stops = sorted(stops, key=lambda stop: stop[0])
+    positions = np.array([p for p, _ in stops], dtype=np.float64)
+    colors = np.array([c for _, c in stops], dtype=np.float64)
+    if len(stops) == 1:
+        return np.repeat(colors, size, axis=0).astype(np.float32)
+    x = np.linspace(0.0, 1.0, size)
+    # Segment of every LUT entry and the position inside it
+    right = np.clip(np.searchsorted(positions, x, side="right"), 1, len(positions) - 1)
+    left = right - 1
+    width = positions[right] - positions[left]
+    u = np.clip((x - positions[left]) / np.where(width > 0, width, 1.0), 0.0, 1.0)
+    if mode == "smooth":
+        u = u * u * (3 - 2 * u)
+    elif mode == "step":
+        u = (u >= 1.0).astype(np.float64)
+    lut = colors[left] + (colors[right] - colors[left]) * u[:, None]
+    return lut.astype(np.float32)
+
+
+class Palette:
+    def __init__(self, stops: Sequence[Stop], mode: str = "linear", size: int = 256, name: str = ""):
+        """
+        Args:
+            stops: (position in 0..1, RGB 0..255)
+            mode: interpolation between stops, see MODES
+            size: LUT entries, e.g. 256 or 1024
+            name: for logs
+        """
+        self.stops = [(float(p), tuple(c)) for p, c in stops]
+        self.mode = mode
+        self.name = name
+        self.lut = compile_lut(self.stops, mode, size)
+        self.lut.flags.writeable = False
+        self.lut_u8 = np.rint(self.lut).astype(np.uint8)
+        self.lut_u8.flags.writeable = False
+
+    @classmethod
+    def from_colors(cls, colors: Sequence[Sequence[float]], positions: Iterable[float] = None, **kwargs) -> "Palette":
+        """Stops at positions (default: evenly spaced) with the given colors"""
+        positions = list(positions) if positions is not None else np.linspace(0, 1, len(colors))
+        return cls(list(zip(positions, colors)), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.lut)
+
+    def index(self, values: Union[float, np.ndarray]) -> Union[int, np.ndarray]:
+        """LUT index of values in 0..1 (clamped)"""
+        n = len(self.lut) - 1
+        if np.isscalar(values):
+            return int(min(1.0, max(0.0, values)) * n + 0.5)
+        return (np.clip(values, 0.0, 1.0) * n + 0.5).astype(np.intp)
+
+    def color(self, value: float) -> np.ndarray:
+        """RGB (uint8) of one value in 0..1"""
+        return self.lut_u8[self.index(value)]
+
+    def colors(self, values: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """(N, 3) float32 RGB of N values in 0..1, e.g. one per LED"""
+        return np.take(self.lut, self.index(values), axis=0, out=out)
+
+    def __repr__(self) -> str:
+        return f"Palette({self.name!r}, {len(self.stops)} stops, {self.mode}, {len(self.lut)} entries)"
@@ -0,0 +1,145 @@
+"""
+Power budget limiter: keeps every frame within the current its power supplies can deliver.
+
+Strips are grouped by the power supply (PSU) that feeds them. The current of
+a frame is estimated per LED as idle + sum(channel / 255 * channel_ma), summed
+per strip with one cumulative sum over the frame and per PSU with a bincount.
+When a PSU is over its budget, the channel values of its strips are scaled by
+exactly the factor that brings the estimate down to the budget (the idle
+current does not scale); the others are passed through untouched, as is the
+whole frame while nothing is over budget. Scaling rounds down, so the sent
+frame never draws more than the estimate.
+
+The estimate is the usual WS281x one (WLED's ABL uses the same model): about
+20 mA per channel at full brightness and ~1 mA per LED for the driver chip.
+"""
+
+import logging
+import math
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def strip_psu(name: Optional[str], ip: Optional[str], groups: Dict[str, str]) -> str:
+    """PSU of a strip: its entry in groups by name or IP, else a PSU of its own"""
+    return groups.get(name) or groups.get(ip) or name or ip
+
+
+class PowerLimiter:
+    def __init__(
+        self,
+        strips: Sequence[Tuple[str, int, int]],
+        frame_size: int,
+        budgets: Dict[str, float],
+        channel_ma: Sequence[float] = config.LED_CHANNEL_MA,
+        idle_ma: float = config.LED_IDLE_MA,
+    ):
+        """
+        Args:
+            strips: (PSU, first byte in the frame, number of LEDs) per strip
+            frame_size: bytes per frame (RGB per LED)
+            budgets: PSU -> current budget, mA; PSUs without a budget (or 0) are not limited
+            channel_ma: current of each channel at 255, mA
+            idle_ma: current of one dark LED, mA
+        """
+        self.psus = list(dict.fromkeys(psu for psu, _, _ in strips))
+        index = {psu: i for i, psu in enumerate(self.psus)}
+        self.budgets = np.array([budgets.get(psu) or math.inf for psu in self.psus], dtype=np.float64)
+        self._strip_psu = np.array([index[psu] for psu, _, _ in strips], dtype=np.intp)
+        self._offsets = [offset for _, offset, _ in strips]
+        self._sizes = [3 * n_leds for _, _, n_leds in strips]
+        self._starts = np.array([offset // 3 for offset in self._offsets], dtype=np.intp)
+        self._ends = self._starts + np.array([n for _, _, n in strips], dtype=np.intp)
+        idle = np.bincount(self._strip_psu, weights=(self._ends - self._starts) * idle_ma, minlength=len(self.psus))
+        self.idle_ma = idle
+        self._coef = np.asarray(channel_ma, dtype=np.float32) / 255
+        n = frame_size // 3
+        self.frame_size = frame_size
+        self.out = np.zeros(frame_size, dtype=np.uint8)
+        self._per_led = np.zeros(n, dtype=np.float32)
+        self._cumulative = np.zeros(n + 1, dtype=np.float64)
+
+        # Metrics: last frame and counters per PSU
+        self.frames = 0
+        self.limited_frames = np.zeros(len(self.psus), dtype=np.int64)
+        self.estimated_ma = idle.copy()  # before limiting
+        self.output_ma = idle.copy()  # after limiting
+        self.scale = np.ones(len(self.psus), dtype=np.float64)
+        self.min_scale = np.ones(len(self.psus), dtype=np.float64)
+        self._limiting = np.zeros(len(self.psus), dtype=bool)
+
+    @classmethod
+    def from_layout(cls, layout, groups: Dict[str, str] = None, budgets: Dict[str, float] = None,
+                    default_budget: float = 0.0, **kwargs) -> "PowerLimiter":
+        """Limiter of a CubeLayout, strips keyed by Wled objects"""
+        strips = [(strip_psu(getattr(key, "name", None), getattr(key, "ip", None) or str(key), groups or {}),
+                   strip.channel_offset, strip.n_leds) for key, strip in layout.strips.items()]
+        return cls(strips, len(layout.frame), _budgets(strips, budgets, default_budget), **kwargs)
+
+    @classmethod
+    def from_show(cls, show, groups: Dict[str, str] = None, budgets: Dict[str, float] = None,
+                  default_budget: float = 0.0, **kwargs) -> "PowerLimiter":
+        """Limiter of a recorded ShowFile"""
+        strips = [(strip_psu(strip.get("name"), key, groups or {}), strip["offset"], strip["n_leds"])
+                  for key, strip in show.strips.items()]
+        return cls(strips, show.frame_size, _budgets(strips, budgets, default_budget), **kwargs)
+
+    def estimate(self, frame: np.ndarray) -> np.ndarray:
+        """Estimated current per strip of frame, mA"""
+        np.matmul(frame.reshape(-1, 3), self._coef, out=self._per_led)
+        np.cumsum(self._per_led, dtype=np.float64, out=self._cumulative[1:])
+        return self._cumulative[self._ends] - self._cumulative[self._starts]
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """frame itself if every PSU is within budget, else the scaled down copy (self.out)"""
+        dynamic = np.bincount(self._strip_psu, weights=self.estimate(frame), minlength=len(self.psus))
+        self.frames += 1
+        self.estimated_ma = self.idle_ma + dynamic
+        over = self.estimated_ma > self.budgets
+        self.scale.fill(1.0)
+        if over.any():
+            allowed = np.maximum(self.budgets[over] - self.idle_ma[over], 0.0)
+            self.scale[over] = allowed / dynamic[over]
+            np.minimum(self.min_scale, self.scale, out=self.min_scale)
+            self.limited_frames[over] += 1
+        self.output_ma = self.idle_ma + dynamic * self.scale
+        if not np.array_equal(over, self._limiting):
+            self._log_changes(over)
+        if not over.any():
+            return frame
+        np.copyto(self.out, frame)
+        for i, psu in enumerate(self._strip_psu):
+            if over[psu]:
+                strip = self.out[self._offsets[i]:self._offsets[i] + self._sizes[i]]
+                np.multiply(strip, self.scale[psu], out=strip, casting="unsafe")
+        return self.out
+
+    def _log_changes(self, over: np.ndarray):
+        for i in np.flatnonzero(over != self._limiting):
+            if over[i]:
+                logger.info(f"PSU {self.psus[i]}: limiting, {self.estimated_ma[i]:.0f} mA over the "
+                            f"{self.budgets[i]:.0f} mA budget, scale {self.scale[i]:.2f}")
+            else:
+                logger.info(f"PSU {self.psus[i]}: back within budget after {self.limited_frames[i]} limited frames")
+        self._limiting = over
+
+    def status(self) -> Dict[str, dict]:
+        return {psu: {
+            'budget_ma': None if math.isinf(self.budgets[i]) else round(float(self.budgets[i])),
+            'estimated_ma': round(float(self.estimated_ma[i])),
+            'output_ma': round(float(self.output_ma[i])),
+            'scale': round(float(self.scale[i]), 3),
+            'min_scale': round(float(self.min_scale[i]), 3),
+            'limited_frames': int(self.limited_frames[i]),
+            'limited_ratio': round(int(self.limited_frames[i]) / self.frames, 3) if self.frames else 0.0,
+        } for i, psu in enumerate(self.psus)}
+
+
+def _budgets(strips, budgets: Optional[Dict[str, float]], default_budget: float) -> Dict[str, float]:
+    budgets = budgets or {}
+    return {psu: budgets.get(psu, default_budget) for psu, _, _ in strips}
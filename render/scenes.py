@@ -0,0 +1,130 @@
+"""
+Scene mixer: crossfades between render sources into one output frame.
+
+A scene is any callable source(t) -> frame (uint8, 3N, the CubeLayout frame
+format). Every scene is a layer with a weight that moves from its current
+value to a target over a crossfade; switch() only retargets the weights and
+returns at once, and the fade is evaluated on the frame times passed to
+render(), so it is frame accurate and independent of when switch() ran.
+Switching in the middle of a fade starts from the current weights, so any
+number of scenes can be fading at once.
+
+Blending runs in preallocated float32 buffers with in-place np.multiply and
+np.add; while a single scene is fully up its frame is passed through as is.
+"""
+
+import math
+import threading
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+Source = Callable[[float], np.ndarray]
+
+
+def _smooth(x: float) -> float:
+    return x * x * (3 - 2 * x)
+
+
+CURVES: Dict[str, Callable[[float], float]] = {
+    "linear": lambda x: x,
+    "smooth": _smooth,
+    "equal_power": lambda x: math.sin(x * math.pi / 2),
+}
+
+
+class _Layer:
+    __slots__ = ("source", "start", "target", "t0", "duration", "curve")
+
+    def __init__(self, source: Source):
+        self.source = source
+        self.start = 0.0
+        self.target = 0.0
+        self.t0 = 0.0
+        self.duration = 0.0
+        self.curve = CURVES["linear"]
+
+    def weight(self, t: float) -> float:
+        if self.duration <= 0 or t >= self.t0 + self.duration:
+            return self.target
+        if t <= self.t0:
+            return self.start
+        x = (t - self.t0) / self.duration
+        if self.target < self.start:
+            # Fading out mirrors the curve, so an equal power fade stays equal power
+            return self.target + (self.start - self.target) * self.curve(1 - x)
+        return self.start + (self.target - self.start) * self.curve(x)
+
+
+class SceneMixer:
+    def __init__(self, frame_size: int = 0, duration: float = 1.0, curve: str = "smooth"):
+        """
+        Args:
+            frame_size: bytes per frame, buffers are (re)allocated when it changes
+            duration: default crossfade, seconds
+            curve: default crossfade curve, see CURVES
+        """
+        self.duration = duration
+        self.curve = curve
+        self.current: Optional[str] = None
+        self._layers: Dict[str, _Layer] = {}
+        self._lock = threading.Lock()
+        self._allocate(frame_size)
+
+    def resize(self, frame_size: int):
+        if frame_size != self.frame_size:
+            self._allocate(frame_size)
+
+    def _allocate(self, frame_size: int):
+        self.frame_size = frame_size
+        self.out = np.zeros(frame_size, dtype=np.uint8)
+        self._acc = np.zeros(frame_size, dtype=np.float32)
+        self._tmp = np.zeros(frame_size, dtype=np.float32)
+
+    def add(self, name: str, source: Source):
+        """Register a scene; it starts with weight 0"""
+        with self._lock:
+            self._layers[name] = _Layer(source)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._layers
+
+    def switch(self, name: Optional[str], t: float, duration: Optional[float] = None, curve: Optional[str] = None):
+        """Crossfade to scene name (None: fade to black), starting at frame time t. Returns immediately."""
+        duration = self.duration if duration is None else duration
+        curve_fn = CURVES[curve or self.curve]
+        with self._lock:
+            if name is not None and name not in self._layers:
+                raise KeyError(f"Unknown scene {name!r}")
+            for layer_name, layer in self._layers.items():
+                target = 1.0 if layer_name == name else 0.0
+                start = layer.weight(t)
+                if start == target and layer.target == target:
+                    continue
+                layer.start, layer.target, layer.t0, layer.duration, layer.curve = start, target, t, duration, curve_fn
+            self.current = name
+
+    def weights(self, t: float) -> Dict[str, float]:
+        return {name: layer.weight(t) for name, layer in self._layers.items()}
+
+    def settled(self, t: float) -> bool:
+        """True once every fade has finished at frame time t"""
+        return all(t >= layer.t0 + layer.duration for layer in self._layers.values())
+
+    def render(self, t: float) -> np.ndarray:
+        """The blended frame at time t"""
+        with self._lock:
+            active = [(layer, w) for layer, w in ((layer, layer.weight(t)) for layer in self._layers.values()) if w > 0]
+        if len(active) == 1 and active[0][1] >= 1.0:
+            return active[0][0].source(t)
+        self._acc.fill(0.0)
+        for layer, w in active:
+            frame = layer.source(t)
+            if len(frame) != self.frame_size:
+                self._allocate(len(frame))
+                return self.render(t)  # only when the layout changed
+            np.multiply(frame, np.float32(w), out=self._tmp)
+            np.add(self._acc, self._tmp, out=self._acc)
+        np.minimum(self._acc, 255.0, out=self._acc)
+        np.copyto(self.out, self._acc, casting="unsafe")
+        return self.out
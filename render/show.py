@@ -0,0 +1,288 @@
+"""
+Recorded shows: capture of output frames and playback from a memory-mapped file.
+
+File layout (little endian):
+
+    header   b"WCSHOW01", uint32 length, JSON metadata (strips, frame size, chunk size)
+    chunks   b"CHNK", uint32 n_frames, uint32 compressed size, uint32 reserved,
+             float64[n_frames] timestamps, zlib(delta frames)
+    index    INDEX_DTYPE[n_chunks]
+    footer   uint64 index offset, uint32 n_chunks, b"WCSHOWIX"
+
+Inside a chunk the first frame is stored as is and every following frame as
+its byte-wise difference (mod 256) to the previous one, so a static or slowly
+changing cube compresses to almost nothing; decoding a chunk is one cumsum.
+The index gives the time span and offset of every chunk for seeking; a file
+without index (capture killed) is recovered by scanning the chunks. A show
+without frames cannot be played: the recorder removes it on close and
+ShowFile refuses to open one.
+"""
+
+import bisect
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WCSHOW01"
+INDEX_MAGIC = b"WCSHOWIX"
+CHUNK_HEAD = struct.Struct("<4sIII")
+FOOTER = struct.Struct("<QI8s")
+INDEX_DTYPE = np.dtype([("t_first", "<f8"), ("t_last", "<f8"), ("offset", "<u8"), ("n_frames", "<u4"), ("size", "<u4")])
+
+
+def delta_encode(frames: np.ndarray) -> np.ndarray:
+    deltas = frames.copy()
+    np.subtract(frames[1:], frames[:-1], out=deltas[1:])
+    return deltas
+
+
+def delta_decode(deltas: np.ndarray) -> np.ndarray:
+    return np.cumsum(deltas, axis=0, dtype=np.uint8)
+
+
+def _strip_key(key) -> str:
+    return getattr(key, "ip", None) or str(key)
+
+
+def free_path(path: str) -> str:
+    """path, or path with a .1, .2, ... suffix before the extension if it exists already"""
+    root, ext = os.path.splitext(path)
+    n = 0
+    while os.path.exists(path):
+        n += 1
+        path = f"{root}.{n}{ext}"
+    return path
+
+
+class ShowRecorder:
+    """
+    Appends output frames to a show file. write() only copies the frame into the
+    current chunk; full chunks are encoded and written by a background thread.
+    """
+
+    def __init__(self, path: str, strips: List[dict], frame_size: int, chunk_frames: int = 64, level: int = 6):
+        """
+        Args:
+            path: file to create
+            strips: [{"key", "name", "offset", "n_leds"}] where each strip sits in a frame
+            frame_size: bytes per frame
+            chunk_frames: frames per compressed chunk (seek granularity)
+            level: zlib compression level
+        """
+        self.path = path
+        self.strips = strips
+        self.frame_size = frame_size
+        self.chunk_frames = chunk_frames
+        self.level = level
+        self.frames_written = 0
+        self._index: List[Tuple] = []
+        self._new_chunk()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "wb")
+        meta = json.dumps({"strips": strips, "frame_size": frame_size, "chunk_frames": chunk_frames}).encode()
+        self._file.write(MAGIC + struct.pack("<I", len(meta)) + meta)
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ShowRecorder")
+        self._thread.start()
+
+    @staticmethod
+    def layout_strips(layout) -> List[dict]:
+        return [{"key": _strip_key(key), "name": getattr(key, "name", None), "offset": strip.channel_offset,
+                 "n_leds": strip.n_leds} for key, strip in layout.strips.items()]
+
+    @classmethod
+    def from_layout(cls, path: str, layout, **kwargs) -> "ShowRecorder":
+        return cls(path, cls.layout_strips(layout), len(layout.frame), **kwargs)
+
+    def _new_chunk(self):
+        self._frames = np.empty((self.chunk_frames, self.frame_size), dtype=np.uint8)
+        self._times = np.empty(self.chunk_frames, dtype=np.float64)
+        self._n = 0
+
+    def write(self, frame: np.ndarray, t: float):
+        self._frames[self._n] = frame
+        self._times[self._n] = t
+        self._n += 1
+        self.frames_written += 1
+        if self._n == self.chunk_frames:
+            self._queue.put((self._frames, self._times))
+            self._new_chunk()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            frames, times = item
+            try:
+                self._write_chunk(frames, times)
+            except Exception as e:
+                logger.error(f"Error writing show chunk to {self.path}: {e}")
+
+    def _write_chunk(self, frames: np.ndarray, times: np.ndarray):
+        payload = zlib.compress(delta_encode(frames), self.level)
+        offset = self._file.tell()
+        self._file.write(CHUNK_HEAD.pack(b"CHNK", len(frames), len(payload), 0))
+        self._file.write(times.astype("<f8").tobytes())
+        self._file.write(payload)
+        self._index.append((times[0], times[-1], offset, len(frames), len(payload)))
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self._n:
+            self._queue.put((self._frames[:self._n], self._times[:self._n]))
+            self._new_chunk()
+        self._queue.put(None)
+        self._thread.join()
+        index_offset = self._file.tell()
+        self._file.write(np.array(self._index, dtype=INDEX_DTYPE).tobytes())
+        self._file.write(FOOTER.pack(index_offset, len(self._index), INDEX_MAGIC))
+        self._file.close()
+        if not self.frames_written:
+            os.remove(self.path)
+            logger.info(f"Show {self.path} has no frames, removed")
+            return
+        logger.info(f"Show saved: {self.path}, {self.frames_written} frames in {len(self._index)} chunks")
+
+
+class ShowFile:
+    """Read-only, memory-mapped show; decodes one chunk at a time"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self.data[:8]) != MAGIC:
+            raise ValueError(f"{path} is not a show file")
+        meta_len = struct.unpack_from("<I", self.data, 8)[0]
+        self.meta = json.loads(bytes(self.data[12:12 + meta_len]))
+        self.frame_size = self.meta["frame_size"]
+        self.strips: Dict[str, dict] = {strip["key"]: strip for strip in self.meta["strips"]}
+        self._chunks_start = 12 + meta_len
+        self.index = self._read_index()
+        if not len(self.index):
+            raise ValueError(f"{path} has no frames")
+        self._t_first = self.index["t_first"].tolist()
+        self._cached: Optional[Tuple[int, np.ndarray, np.ndarray]] = None
+
+    def _read_index(self) -> np.ndarray:
+        if len(self.data) >= self._chunks_start + FOOTER.size:
+            index_offset, n_chunks, magic = FOOTER.unpack_from(self.data, len(self.data) - FOOTER.size)
+            if magic == INDEX_MAGIC:
+                return np.frombuffer(self.data, INDEX_DTYPE, n_chunks, index_offset).copy()
+        logger.warning(f"{self.path} has no index, scanning chunks")
+        return self._scan()
+
+    def _scan(self) -> np.ndarray:
+        entries = []
+        offset = self._chunks_start
+        while offset + CHUNK_HEAD.size <= len(self.data):
+            tag, n_frames, size, _ = CHUNK_HEAD.unpack_from(self.data, offset)
+            end = offset + CHUNK_HEAD.size + 8 * n_frames + size
+            if tag != b"CHNK" or end > len(self.data):
+                break
+            times = np.frombuffer(self.data, "<f8", n_frames, offset + CHUNK_HEAD.size)
+            entries.append((times[0], times[-1], offset, n_frames, size))
+            offset = end
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def __len__(self) -> int:
+        return int(self.index["n_frames"].sum())
+
+    @property
+    def start_time(self) -> float:
+        return float(self.index["t_first"][0])
+
+    @property
+    def end_time(self) -> float:
+        return float(self.index["t_last"][-1])
+
+    @property
+    def duration(self) -> float:
+        return self.end_time - self.start_time
+
+    def chunk(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, frames) of chunk i"""
+        if self._cached is not None and self._cached[0] == i:
+            return self._cached[1], self._cached[2]
+        entry = self.index[i]
+        offset = int(entry["offset"]) + CHUNK_HEAD.size
+        n = int(entry["n_frames"])
+        times = np.frombuffer(self.data, "<f8", n, offset)
+        raw = zlib.decompress(self.data[offset + 8 * n:offset + 8 * n + int(entry["size"])])
+        frames = delta_decode(np.frombuffer(raw, np.uint8).reshape(n, self.frame_size))
+        self._cached = (i, times, frames)
+        return times, frames
+
+    def frame_at(self, t: float) -> np.ndarray:
+        """The frame that was on the strips at absolute time t (clamped to the show)"""
+        i = max(0, bisect.bisect_right(self._t_first, t) - 1)
+        times, frames = self.chunk(i)
+        j = max(0, int(np.searchsorted(times, t, side="right")) - 1)
+        return frames[j]
+
+    def frames(self):
+        """Iterate (t, frame) over the whole show"""
+        for i in range(len(self.index)):
+            times, frames = self.chunk(i)
+            yield from zip(times.tolist(), frames)
+
+    # Strip lookup, compatible with CubeLayout for WLEDController._send_frame
+    def __contains__(self, key) -> bool:
+        return _strip_key(key) in self.strips
+
+    def strip_data(self, key, frame: np.ndarray) -> np.ndarray:
+        strip = self.strips[_strip_key(key)]
+        return frame[strip["offset"]:strip["offset"] + 3 * strip["n_leds"]]
+
+    def strip_bytes(self, key, frame: np.ndarray) -> bytes:
+        return self.strip_data(key, frame).tobytes()
+
+    def close(self):
+        # The map is released once no decoded chunk refers to it any more
+        self._cached = None
+        self.data = None
+
+
+class ShowPlayer:
+    """Maps wall clock time to show time at a given speed"""
+
+    def __init__(self, show: ShowFile, speed: float = 1.0, loop: bool = True):
+        self.show = show
+        self.speed = speed
+        self.loop = loop
+        self._origin: Optional[float] = None
+        self._position = 0.0  # show time (from the show start) at _origin
+
+    def start(self, now: float, position: float = 0.0):
+        self._origin = now
+        self._position = position
+
+    def seek(self, position: float, now: float):
+        """Jump to position seconds from the show start"""
+        self.start(now, position)
+
+    def position(self, now: float) -> float:
+        if self._origin is None:
+            self.start(now)
+        return self._position + (now - self._origin) * self.speed
+
+    def frame(self, now: float) -> Optional[np.ndarray]:
+        """Current frame, or None once a non-looping show has ended"""
+        position = self.position(now)
+        duration = self.show.duration
+        if position > duration:
+            if not self.loop:
+                return None
+            position = position % duration if duration > 0 else 0.0
+        return self.show.frame_at(self.show.start_time + position)
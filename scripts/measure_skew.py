@@ -0,0 +1,170 @@
+"""
+Inter-strip skew of sACN output, measured with a local receiver.
+
+Several fake strips send to 127.0.0.1 and a raw UDP receiver records when
+every strip would show each frame:
+
+    threaded  every strip's sACNsender thread sends on its own tick (current output);
+              a strip shows frame n when the last universe carrying n arrives
+    synced    FrameSync sends all universes, then one E1.31 sync packet;
+              strips show frame n when the sync packet with sequence n arrives
+
+Usage:
+    python scripts/measure_skew.py [--strips 8] [--leds 280] [--frames 200] [--fps 16]
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wled.frame_sync import FrameSync, parse_e131, E131_DATA, E131_DATA_OFFSET  # noqa: E402
+from wled.wled_common_client import Wled, WledDMX  # noqa: E402
+
+E131_PORT = 5568
+
+
+class Receiver:
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind(("127.0.0.1", E131_PORT))
+        self.sock.settimeout(0.2)
+        self.packets = []  # (arrival, source port, parsed, frame id)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self._running:
+            try:
+                data, addr = self.sock.recvfrom(1500)
+            except socket.timeout:
+                continue
+            now = time.perf_counter()
+            info = parse_e131(data)
+            if info is None:
+                continue
+            frame = None
+            if info["kind"] == E131_DATA:
+                frame = data[E131_DATA_OFFSET] << 8 | data[E131_DATA_OFFSET + 1]
+            self.packets.append((now, addr[1], info, frame))
+
+    def stop(self):
+        self._running = False
+        self._thread.join()
+        self.sock.close()
+
+
+def make_strips(n_strips, n_leds):
+    strips = []
+    for i in range(n_strips):
+        wled = Wled("127.0.0.1")
+        wled.name = f"strip-{i}"
+        wled.cfg = {"hw": {"led": {"ins": [{"start": 0, "len": n_leds}]}}}
+        wled.dmx.start()
+        strips.append(wled)
+    return strips
+
+
+def frame_data(n_leds, frame):
+    data = np.zeros((n_leds, 3), dtype=np.uint8)
+    # Every universe starts with the frame number, so each packet identifies its frame
+    data[::WledDMX.LEDS_PER_UNIVERSE, 0] = frame >> 8
+    data[::WledDMX.LEDS_PER_UNIVERSE, 1] = frame & 0xFF
+    return data.tobytes()
+
+
+def skew_stats(latches):
+    """latches: {frame: {strip port: time}} -> skew percentiles over frames seen by every strip"""
+    n_strips = max(len(v) for v in latches.values())
+    skews = np.array([max(v.values()) - min(v.values()) for v in latches.values() if len(v) == n_strips]) * 1000
+    if not len(skews):
+        return {}
+    return {"frames": int(len(skews)), "p50_ms": float(np.percentile(skews, 50)),
+            "p99_ms": float(np.percentile(skews, 99)), "max_ms": float(skews.max())}
+
+
+def run_threaded(strips, n_leds, frames, fps):
+    receiver = Receiver()
+    for frame in range(1, frames + 1):
+        for wled in strips:
+            wled.dmx.set_data(frame_data(n_leds, frame))
+        time.sleep(1 / fps)
+    time.sleep(0.5)
+    receiver.stop()
+
+    n_universes = strips[0].dmx.n_universes
+    arrivals = defaultdict(lambda: defaultdict(list))
+    for now, port, info, frame in receiver.packets:
+        if info["kind"] == E131_DATA:
+            arrivals[frame][port].append(now)
+    latches = {frame: {port: max(times) for port, times in ports.items() if len(times) >= n_universes}
+               for frame, ports in arrivals.items()}
+    return skew_stats({f: v for f, v in latches.items() if v})
+
+
+def run_synced(strips, n_leds, frames, fps):
+    sync = FrameSync(unicast=True)
+    receiver = Receiver()
+    send_times = []
+    for frame in range(1, frames + 1):
+        sync.seq = frame - 1  # sync sequence == frame number (mod 256)
+        sync.send_frame({wled.dmx: frame_data(n_leds, frame) for wled in strips})
+        send_times.append(sync.last_send_time)
+        time.sleep(1 / fps)
+    time.sleep(0.5)
+    receiver.stop()
+    FrameSync.release(wled.dmx for wled in strips)
+
+    ports = {port for _, port, info, _ in receiver.packets if info["kind"] == E131_DATA}
+    syncs = defaultdict(list)
+    for now, port, info, frame in receiver.packets:
+        if info["kind"] != E131_DATA:
+            syncs[info["sequence"]].append(now)
+    # Every strip latches at the first sync packet of its frame
+    latches = {seq: {port: min(times) for port in ports} for seq, times in syncs.items()}
+    result = skew_stats(latches)
+    # Without sync support the receivers would tear across this window
+    data = defaultdict(list)
+    for now, port, info, frame in receiver.packets:
+        if info["kind"] == E131_DATA:
+            data[frame].append(now)
+    result["data_window_ms_p50"] = float(np.percentile([max(t) - min(t) for t in data.values()], 50) * 1000)
+    result["send_ms_p50"] = float(np.percentile(send_times, 50) * 1000)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure inter-strip skew of sACN output")
+    parser.add_argument("--strips", type=int, default=8)
+    parser.add_argument("--leds", type=int, default=280)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--fps", type=float, default=16)
+    args = parser.parse_args()
+
+    WledDMX._port_counter = 6000  # keep sender ports away from the receiver's
+    strips = make_strips(args.strips, args.leds)
+    try:
+        result = {
+            "strips": args.strips,
+            "universes_per_strip": strips[0].dmx.n_universes,
+            "threaded": run_threaded(strips, args.leds, args.frames, args.fps),
+            "synced": run_synced(strips, args.leds, args.frames, args.fps),
+        }
+    finally:
+        for wled in strips:
+            wled.dmx.stop()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio.activity import ActivityGate, rms_db  # noqa: E402
+
+BLOCK = 0.1
+RATE = 44100
+
+
+def tone(db, seconds=BLOCK):
+    t = np.arange(int(RATE * seconds)) / RATE
+    # RMS of a sine is amplitude / sqrt(2)
+    return (np.sqrt(2) * 10 ** (db / 20) * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def test_rms_db():
+    assert rms_db(tone(-20)) == pytest.approx(-20, abs=0.05)
+    assert rms_db(np.zeros(100, dtype=np.float32)) == -np.inf
+
+
+def test_gate_opens_at_once_and_closes_after_hold():
+    gate = ActivityGate(open_db=-40, close_db=-50, hold=0.25, sample_rate=RATE)
+    events = []
+    gate.subscribe(lambda active, t: events.append((active, round(t, 2))))
+
+    levels = [-60, -30, -45, -45, -60, -55, -30, -60, -60, -60, -60, -60]
+    states = [gate.process(tone(db), t=i * BLOCK) for i, db in enumerate(levels)]
+    # -45 dB is between the thresholds: stays open; one loud block inside the hold restarts it
+    assert states == [False, True, True, True, True, True, True, True, True, True, False, False]
+    # The closed initial state is published on subscribe
+    assert events == [(False, 0.0), (True, 0.1), (False, 1.0)]
+    # Below open_db a closed gate stays closed
+    assert not gate.process(tone(-45), t=2.0)
+
+    with pytest.raises(ValueError):
+        ActivityGate(open_db=-50, close_db=-40)
+
+
+def test_subscriber_gets_the_current_state():
+    # The controller starts at full rate (active); it must learn at once that the gate is closed
+    gate = ActivityGate(open_db=-40, close_db=-50, hold=0.25, sample_rate=RATE)
+    state = {"active": True}
+    gate.subscribe(lambda active, t: state.update(active=active))
+    assert state["active"] is False
+
+    gate.process(tone(-30), t=1.0)
+    late = []
+    gate.subscribe(lambda active, t: late.append((active, t)))
+    assert late == [(True, 1.0)]
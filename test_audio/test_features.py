@@ -0,0 +1,50 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio.capture import BlockCombiner  # noqa: E402
+from audio.features import FeatureExtractor  # noqa: E402
+
+RATE = 44100
+BLOCK = 4410
+
+
+def sine(freq, db, n=BLOCK):
+    t = np.arange(n) / RATE
+    return (np.sqrt(2) * 10 ** (db / 20) * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def test_features_per_channel_in_one_pass():
+    extractor = FeatureExtractor(channels=3, block_size=BLOCK, sample_rate=RATE)
+    block = np.stack([sine(100, -20), sine(1000, -30), np.zeros(BLOCK, dtype=np.float32)], axis=1)
+    features = extractor.process(block)
+
+    assert features.rms_db[:2] == pytest.approx([-20, -30], abs=0.1)
+    assert features.rms_db[2] == -120.0
+    assert features.bands.shape == (3, 3)
+    # Each tone lands in its band (low, mid) with its full level
+    assert 20 * np.log10(features.bands[0, 0]) == pytest.approx(-20, abs=0.2)
+    assert 20 * np.log10(features.bands[1, 1]) == pytest.approx(-30, abs=0.2)
+    assert features.bands[0, 1:].max() < 1e-3 and features.bands[2].max() == 0
+    # First block: everything is new
+    assert features.onsets.tolist() == [True, True, False]
+
+    # Steady tones: no onsets; a burst on the silent channel is one
+    steady = extractor.process(block)
+    assert not steady.onsets.any()
+    block[:, 2] = sine(3000, -10)
+    assert extractor.process(block).onsets.tolist() == [False, False, True]
+
+
+def test_block_combiner_joins_devices():
+    combiner = BlockCombiner([1, 2], block_size=4)
+    assert combiner.put(0, np.ones((4, 1))) is None
+    assert combiner.put(0, np.full((4, 1), 2.0)) is None  # ran ahead: latest block wins
+    block = combiner.put(1, np.full((3, 2), 3.0))  # short block is zero padded
+    assert block.shape == (4, 3)
+    assert np.all(block[:, 0] == 2) and np.all(block[:3, 1:] == 3) and np.all(block[3, 1:] == 0)
+    assert combiner.put(1, np.zeros((4, 2))) is None
@@ -0,0 +1,81 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio.quantiles import AdaptiveGain, P2Quantile, WindowedQuantile  # noqa: E402
+
+
+def test_p2_tracks_quantiles_without_history():
+    rng = np.random.default_rng(0)
+    data = rng.normal(-30, 6, 20000)
+    for p in (0.05, 0.5, 0.95):
+        estimator = P2Quantile(p)
+        for x in data:
+            estimator.add(x)
+        assert estimator.value == pytest.approx(np.quantile(data, p), abs=0.3)
+    # Memory is the five markers
+    assert len(estimator._q) == 5 and estimator.count == 20000
+
+    small = P2Quantile(0.5)
+    assert small.value is None
+    for x in (3.0, 1.0, 2.0):
+        small.add(x)
+    assert small.value == 2.0
+    with pytest.raises(ValueError):
+        P2Quantile(1.0)
+
+
+def test_windowed_quantile_forgets_old_levels():
+    rng = np.random.default_rng(1)
+    quantile = WindowedQuantile(0.5, window=600)
+    for x in rng.normal(-50, 3, 2000):
+        quantile.add(x)
+    assert quantile.value == pytest.approx(-50, abs=1)
+    # A louder room: within one window the median follows
+    for x in rng.normal(-15, 3, 600):
+        quantile.add(x)
+    assert quantile.value == pytest.approx(-15, abs=1)
+
+
+def test_adaptive_gain_uses_the_room_range():
+    rng = np.random.default_rng(2)
+    gain = AdaptiveGain(window=600, low=0.05, high=0.95, warmup=20)
+    # Fixed -40..0 dB window during warmup
+    assert gain.update(-20.0) == pytest.approx(0.5)
+    # A loud venue between -12 and -2 dB: levels spread over 0..1 instead of sitting at the top
+    levels = [gain.update(x) for x in rng.uniform(-12, -2, 1000)]
+    low, high = gain.range
+    assert low == pytest.approx(-11.5, abs=0.5) and high == pytest.approx(-2.5, abs=0.5)
+    assert 0.3 < np.mean(levels[-500:]) < 0.7
+    assert gain.update(-1.0) == 1.0 and gain.update(-30.0) == 0.0
+    assert gain.update(-np.inf) == 0.0
+
+    # Steady noise is not stretched to the full scale
+    quiet = AdaptiveGain(window=600, min_span=6.0, warmup=5, floor=None)
+    for _ in range(100):
+        quiet.update(-60.0)
+    assert quiet.range == (-63.0, -57.0)
+
+
+def test_adaptive_gain_keeps_silence_at_the_bottom():
+    rng = np.random.default_rng(3)
+    gain = AdaptiveGain(window=600, low=0.05, high=0.95, min_span=6.0, floor=-65.0)
+    # Noise of an empty room around -80 dBFS: below the floor, so the amplitude stays at 1
+    amplitudes = [gain.update(x) * 99 + 1 for x in rng.normal(-80, 1.5, 1100)]
+    assert set(amplitudes) == {1.0} and gain.silent
+    # Quiet music above the floor still gets the range of the room
+    levels = [gain.update(x) for x in rng.uniform(-30, -20, 1200)]
+    assert not gain.silent and 0.3 < np.mean(levels[-500:]) < 0.7
+
+
+def test_adaptive_gain_spreads_a_quiet_venue_over_the_scale():
+    rng = np.random.default_rng(4)
+    gain = AdaptiveGain(window=600, low=0.05, high=0.95, min_span=6.0, floor=-65.0)
+    # Between -60 and -45 dBFS: above the silence floor, the learned range maps it to 1..100
+    amplitudes = np.array([gain.update(x) * 99 + 1 for x in rng.uniform(-60, -45, 1500)])[-500:]
+    assert amplitudes.min() == 1.0 and amplitudes.max() == 100.0
+    assert np.histogram(amplitudes, bins=4, range=(1, 100))[0].min() > 50
@@ -0,0 +1,141 @@
+"""
+MotionServer throughput / latency / timer benchmark (no MQTT broker needed).
+
+Usage:
+    python test_motion/bench_motion.py [--sensors 50] [--rate 10] [--duration 5] [--output bench.json]
+
+Prints one JSON document with:
+    throughput      messages/sec through _on_message, back to back (with and without journal)
+    burst           handler latency percentiles while n sensors fire at rate Hz in real time
+    motion_action   motion -> turn_motion_wled latency over several idle/active cycles
+    timer           end-of-motion timer error against last_motion + motion_timeout
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import harness  # noqa: E402
+from network.motion_journal import MotionJournal  # noqa: E402
+
+
+def _percentiles(values_s):
+    values_ms = np.asarray(values_s) * 1000
+    if not len(values_ms):
+        return {}
+    return {
+        "p50_ms": float(np.percentile(values_ms, 50)),
+        "p99_ms": float(np.percentile(values_ms, 99)),
+        "max_ms": float(values_ms.max()),
+    }
+
+
+def bench_throughput(n_messages, with_journal):
+    # The journal preallocates 16 MB segments, the directory goes away with the run
+    with tempfile.TemporaryDirectory(prefix="motion_journal_") as directory:
+        journal = MotionJournal(directory) if with_journal else None
+        if journal:
+            journal.start()
+        server = harness.make_server(motion_timeout=60, journal=journal)
+        stream = harness.synthetic_stream(n_sensors=50, rate_hz=1000, duration=n_messages / 50000, status_every=10)
+        messages = list(stream)
+        start = time.perf_counter()
+        delivered = harness.drive(server, messages, realtime=False)
+        elapsed = time.perf_counter() - start
+        result = {"messages": delivered, "seconds": elapsed, "messages_per_sec": delivered / elapsed}
+        if journal:
+            journal.flush()
+            result["journal_records"] = journal.stats()["records"]
+        harness.shutdown(server, journal)
+    return result
+
+
+def bench_burst(n_sensors, rate_hz, duration):
+    server = harness.make_server(motion_timeout=60)
+    handler_times = []
+    original = server._on_message
+
+    def timed(client, userdata, msg):
+        t = time.perf_counter()
+        original(client, userdata, msg)
+        handler_times.append(time.perf_counter() - t)
+
+    server._on_message = timed
+    start = time.perf_counter()
+    delivered = harness.drive(server, harness.synthetic_stream(n_sensors, rate_hz, duration))
+    elapsed = time.perf_counter() - start
+    harness.shutdown(server)
+    return {
+        "sensors": n_sensors,
+        "rate_hz": rate_hz,
+        "messages": delivered,
+        "target_messages_per_sec": n_sensors * rate_hz,
+        "achieved_messages_per_sec": delivered / elapsed,
+        "handler": _percentiles(handler_times),
+    }
+
+
+def bench_motion_action_and_timer(cycles, motion_timeout, n_sensors, rate_hz, burst_seconds):
+    controller = harness.RecordingController()
+    server = harness.make_server(motion_timeout=motion_timeout, controller=controller)
+    ended = harness.ended_at(server)
+    action_latency, timer_error = [], []
+    for cycle in range(cycles):
+        messages = list(harness.synthetic_stream(n_sensors, rate_hz, burst_seconds))
+        harness.drive(server, messages)
+        first, last = messages[0][1], messages[-1][1]
+        ons = controller.times("on")
+        if len(ons) == cycle + 1:
+            action_latency.append(ons[-1] - first.delivered_at)
+        if harness.wait_for(lambda: len(ended) == cycle + 1, timeout=motion_timeout + 1):
+            timer_error.append(ended[-1] - (last.delivered_at + motion_timeout))
+    harness.shutdown(server)
+    return {
+        "motion_action": {"cycles": cycles, "triggered": len(controller.times("on")), **_percentiles(action_latency)},
+        "timer": {
+            "cycles": cycles,
+            "ended": len(ended),
+            "motion_timeout_s": motion_timeout,
+            "mean_error_ms": float(np.mean(timer_error) * 1000) if timer_error else None,
+            **_percentiles(np.abs(timer_error)),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broker-free MotionServer benchmark")
+    parser.add_argument("--sensors", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=10.0, help="Messages per second per sensor")
+    parser.add_argument("--duration", type=float, default=5.0, help="Burst duration in seconds")
+    parser.add_argument("--messages", type=int, default=100000, help="Messages for the throughput test")
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--motion-timeout", type=float, default=0.3)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    result = {
+        "throughput": {
+            "plain": bench_throughput(args.messages, with_journal=False),
+            "journal": bench_throughput(args.messages, with_journal=True),
+        },
+        "burst": bench_burst(args.sensors, args.rate, args.duration),
+        **bench_motion_action_and_timer(args.cycles, args.motion_timeout, args.sensors, args.rate, burst_seconds=0.5),
+    }
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
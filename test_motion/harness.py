@@ -0,0 +1,134 @@
+"""
+Broker-free harness for MotionServer.
+
+Drives MotionServer._on_message directly with synthetic MQTT message streams,
+so the motion logic can be tested and benchmarked without Mosquitto or the
+ESP32 PIR board. Payloads match embedded_code/pir_mqtt/src/main.cpp, plus a
+"sensor" field to tell simulated sensors apart.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from network.motion_server import MotionServer  # noqa: E402
+
+
+class FakeMessage:
+    """Minimal stand-in for paho.mqtt.client.MQTTMessage"""
+
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+        # Stamped right before delivery, used for latency measurements
+        self.delivered_at = 0.0
+
+
+class RecordingController:
+    """WLED controller stand-in that records when actions were triggered"""
+
+    def __init__(self):
+        self.actions: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def turn_motion_wled(self, timeout):
+        with self._lock:
+            self.actions.append(("on", time.perf_counter()))
+
+    def turn_off(self):
+        with self._lock:
+            self.actions.append(("off", time.perf_counter()))
+
+    def times(self, action: str) -> List[float]:
+        with self._lock:
+            return [t for a, t in self.actions if a == action]
+
+
+def make_server(motion_timeout: float = 0.2, controller=None, journal=None) -> MotionServer:
+    """Create a MotionServer that is never connected to a broker"""
+    server = MotionServer(wled_controller=controller or RecordingController(), journal=journal)
+    server.motion_timeout = motion_timeout
+    return server
+
+
+def motion_message(sensor: str, count: int, topic: str = "motion/detected") -> FakeMessage:
+    now_ms = int(time.time() * 1000)
+    payload = {
+        "motion": True,
+        "timestamp": now_ms,
+        "count": count,
+        "uptime": now_ms // 1000,
+        "sensor": sensor,
+    }
+    return FakeMessage(topic, json.dumps(payload).encode("utf-8"))
+
+
+def status_message(sensor: str, count: int) -> FakeMessage:
+    payload = {"status": "online", "uptime": 0, "motion_count": count, "sensor": sensor}
+    return FakeMessage("motion/status", json.dumps(payload).encode("utf-8"))
+
+
+def synthetic_stream(
+    n_sensors: int, rate_hz: float, duration: float, status_every: int = 0
+) -> Iterator[Tuple[float, FakeMessage]]:
+    """
+    Yield (offset_seconds, message) for n_sensors each firing at rate_hz,
+    interleaved in time order. Sensors are phase-shifted evenly inside a period.
+    """
+    period = 1.0 / rate_hz
+    counts: Dict[int, int] = {}
+    n_ticks = int(duration * rate_hz)
+    for tick in range(n_ticks):
+        for sensor in range(n_sensors):
+            offset = tick * period + sensor * period / n_sensors
+            counts[sensor] = counts.get(sensor, 0) + 1
+            yield offset, motion_message(f"pir-{sensor}", counts[sensor])
+            if status_every and counts[sensor] % status_every == 0:
+                yield offset, status_message(f"pir-{sensor}", counts[sensor])
+
+
+def drive(server: MotionServer, stream, realtime: bool = True) -> int:
+    """
+    Deliver messages to server._on_message. With realtime=True messages are paced
+    by their offsets, otherwise they are delivered back to back.
+    """
+    start = time.perf_counter()
+    delivered = 0
+    for offset, msg in stream:
+        if realtime:
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        msg.delivered_at = time.perf_counter()
+        server._on_message(None, None, msg)
+        delivered += 1
+    return delivered
+
+
+def wait_for(predicate, timeout: float = 2.0, interval: float = 0.005) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if predicate():
+            return True
+        time.sleep(interval)
+    return predicate()
+
+
+def shutdown(server: MotionServer, journal=None):
+    """Cancel pending timers without touching the (never connected) MQTT client"""
+    if server._motion_timer:
+        server._motion_timer.cancel()
+    if journal is not None:
+        journal.close()
+
+
+def ended_at(server: MotionServer) -> List[float]:
+    """Attach an on_motion_ended hook and return the list it appends perf_counter times to"""
+    times: List[float] = []
+    server.on_motion_ended = lambda: times.append(time.perf_counter())
+    return times
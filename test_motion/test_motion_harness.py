@@ -0,0 +1,130 @@
+import time
+
+import numpy as np
+
+import harness
+from network.motion_journal import MotionJournal, KIND_MOTION, KIND_STATUS, RECORD_DTYPE
+
+
+def test_motion_triggers_action_once_and_times_out():
+    controller = harness.RecordingController()
+    server = harness.make_server(motion_timeout=0.2, controller=controller)
+    ended = harness.ended_at(server)
+
+    messages = list(harness.synthetic_stream(n_sensors=5, rate_hz=20, duration=0.3))
+    harness.drive(server, messages)
+
+    assert len(controller.times("on")) == 1
+    assert server.is_motion_active()
+    assert harness.wait_for(lambda: ended, timeout=1.0)
+    assert not server.is_motion_active()
+    assert controller.times("off")
+
+    # The timer is re-armed by every message, so it fires motion_timeout after the last one
+    error = ended[0] - (messages[-1][1].delivered_at + 0.2)
+    assert -0.01 < error < 0.1
+    harness.shutdown(server)
+
+
+def test_burst_fifty_sensors_keeps_single_action():
+    controller = harness.RecordingController()
+    server = harness.make_server(motion_timeout=5, controller=controller)
+    delivered = harness.drive(server, harness.synthetic_stream(n_sensors=50, rate_hz=10, duration=0.5))
+
+    assert delivered == 250
+    assert len(controller.times("on")) == 1
+    assert server.get_status()['motion_count'] > 0
+    harness.shutdown(server)
+
+
+def test_invalid_payload_is_ignored():
+    controller = harness.RecordingController()
+    server = harness.make_server(controller=controller)
+    server._on_message(None, None, harness.FakeMessage("motion/detected", b"not json"))
+    server._on_message(None, None, harness.FakeMessage("motion/unknown", b"{}"))
+
+    assert not controller.actions
+    assert not server.is_motion_active()
+    harness.shutdown(server)
+
+
+def test_journal_records_motion_and_status(tmp_path):
+    journal = MotionJournal(str(tmp_path), segment_records=64)
+    journal.start()
+    server = harness.make_server(motion_timeout=5, journal=journal)
+    start = time.time()
+    harness.drive(server, harness.synthetic_stream(n_sensors=4, rate_hz=100, duration=0.5, status_every=10),
+                  realtime=False)
+    journal.flush()
+
+    motion = journal.records(kind=KIND_MOTION)
+    assert len(motion) == 200
+    assert len(journal.records(kind=KIND_STATUS)) == 20
+    assert journal.stats()['segments'] > 1
+
+    edges, histogram = journal.rate_histogram(start - 1, time.time() + 1, bin_seconds=60)
+    assert sorted(histogram) == ["pir-0", "pir-1", "pir-2", "pir-3"]
+    assert all(counts.sum() == 50 for counts in histogram.values())
+    harness.shutdown(server, journal)
+
+
+def test_journal_occupancy(tmp_path):
+    journal = MotionJournal(str(tmp_path))
+    t0 = 1_700_000_000.0
+    for offset in (0, 1, 2, 10):
+        journal.record(KIND_MOTION, sensor="pir-0", ts=t0 + offset)
+    journal.flush()
+
+    edges, occupancy = journal.occupancy(t0, t0 + 20, bin_seconds=5, timeout=2)
+    # Active 0..4 and 10..12
+    assert list(occupancy) == [0.8, 0.0, 0.4, 0.0]
+    journal.close()
+
+
+def test_journal_assigns_sensor_ids_on_the_writer_side(tmp_path):
+    journal = MotionJournal(str(tmp_path), segment_records=64)
+    # A query holds the segment lock: recording a new sensor must not wait for it or write sensors.json
+    with journal._lock:
+        journal.record(KIND_MOTION, sensor="new-sensor", ts=1000.0)
+    assert journal.sensor_id("new-sensor") is None and not (tmp_path / "sensors.json").exists()
+    journal.flush()
+    assert journal.sensor_id("new-sensor") == 0 and (tmp_path / "sensors.json").exists()
+    assert journal.sensor_names() == {0: "new-sensor"}
+    journal.close()
+
+
+def test_journal_keeps_time_ordered_for_range_queries(tmp_path):
+    journal = MotionJournal(str(tmp_path), segment_records=4)
+    t0 = 1_700_000_000.0
+    # The clock stepped back after the third record
+    for offset in (0, 1, 2, -5, 3, 4):
+        journal.record(KIND_MOTION, sensor="pir-0", ts=t0 + offset)
+    journal.flush()
+    ts = journal.records()["ts"]
+    assert list(ts - t0) == [0, 1, 2, 2, 3, 4]
+    assert len(journal.records(t0 + 2, t0 + 3)) == 2
+    journal.close()
+
+
+def test_journal_scans_unordered_legacy_segments(tmp_path):
+    t0 = 1_700_000_000.0
+    legacy = np.zeros(4, dtype=RECORD_DTYPE)
+    legacy["ts"][:3] = [t0 + 5, t0 + 1, t0 + 6]
+    legacy["kind"] = KIND_MOTION
+    legacy.tofile(str(tmp_path / "segment-000001.bin"))
+    journal = MotionJournal(str(tmp_path), segment_records=4)
+    assert not journal._segments[0].ordered
+    assert list(journal.records(t0 + 1, t0 + 2)["ts"] - t0) == [1]
+    journal.close()
+
+
+def test_rate_histogram_keeps_the_last_bin(tmp_path):
+    journal = MotionJournal(str(tmp_path))
+    start, bin_seconds = 0.7, 1.1
+    end = start + 2 * bin_seconds
+    # (ts - start) / bin_seconds rounds up to 2.0 here
+    journal.record(KIND_MOTION, ts=np.nextafter(end, 0))
+    journal.flush()
+    edges, histogram = journal.rate_histogram(start, end, bin_seconds)
+    assert len(edges) == 3 and list(histogram["default"]) == [0, 1]
+    journal.close()
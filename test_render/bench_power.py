@@ -0,0 +1,76 @@
+"""
+Power limiter benchmark: per-frame cost of PowerLimiter.apply.
+
+Usage:
+    python test_render/bench_power.py [--leds 10000 50000] [--strips 100] [--psus 10] [--frames 500] [--output bench.json]
+
+Prints one JSON document with per-frame latency percentiles for a frame
+within budget (estimate only) and one over budget on every PSU (estimate and
+scaling), for each LED count.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.power import PowerLimiter  # noqa: E402
+
+
+def _stats(durations):
+    us = np.asarray(durations) * 1e6
+    return {
+        "p50_us": round(float(np.percentile(us, 50)), 1),
+        "p99_us": round(float(np.percentile(us, 99)), 1),
+        "max_us": round(float(us.max()), 1),
+    }
+
+
+def run(n_leds, args):
+    per_strip = n_leds // args.strips
+    strips = [(f"psu-{i % args.psus}", 3 * i * per_strip, per_strip) for i in range(args.strips)]
+    frame_size = 3 * per_strip * args.strips
+    # Budget: half of full white per PSU
+    budget = per_strip * args.strips / args.psus * 61 / 2
+    limiter = PowerLimiter(strips, frame_size, {f"psu-{i}": budget for i in range(args.psus)})
+    rng = np.random.default_rng(0)
+    frames = {
+        "within_budget": rng.integers(0, 64, frame_size, dtype=np.uint8),
+        "over_budget": rng.integers(192, 256, frame_size, dtype=np.uint8),
+    }
+    result = {}
+    for name, frame in frames.items():
+        durations = []
+        for _ in range(args.frames):
+            start = time.perf_counter()
+            limiter.apply(frame)
+            durations.append(time.perf_counter() - start)
+        result[name] = _stats(durations)
+    result["status"] = limiter.status()["psu-0"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Power limiter per-frame cost")
+    parser.add_argument("--leds", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--strips", type=int, default=100)
+    parser.add_argument("--psus", type=int, default=10)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    result = {str(n): run(n, args) for n in args.leds}
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Frame rendering benchmark: in-process CubeLayout.render vs RenderFarm.
+
+Usage:
+    python test_render/bench_render.py [--leds 50000] [--strips 100] [--workers 1 2 4] [--frames 200] [--output bench.json]
+
+Prints one JSON document with frames/sec and per-frame latency percentiles for
+each configuration. Farm frames are pipelined (one frame in flight while the
+previous one is read), as the controller would run them.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render import effects  # noqa: E402
+from render.farm import RenderFarm  # noqa: E402
+from render.layout import CubeLayout, CUBE_EDGES  # noqa: E402
+
+PARAMS = {"color": [200, 120, 40], "amplitude": 0.7}
+
+
+def build_layout(n_leds, n_strips):
+    layout = CubeLayout()
+    per_strip = n_leds // n_strips
+    for i in range(n_strips):
+        layout.add_strip(f"strip-{i}", [(0, per_strip, False)], [CUBE_EDGES[i % len(CUBE_EDGES)]])
+    return layout
+
+
+def _stats(durations, total):
+    ms = np.asarray(durations) * 1000
+    return {
+        "fps": len(durations) / total,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def bench_in_process(layout, frames):
+    durations = []
+    start = time.perf_counter()
+    for i in range(frames):
+        t0 = time.perf_counter()
+        layout.render(effects.amplitude_wave, i / 60, **PARAMS)
+        durations.append(time.perf_counter() - t0)
+    return _stats(durations, time.perf_counter() - start)
+
+
+def bench_farm(layout, frames, workers):
+    farm = RenderFarm(layout, effects.amplitude_wave, [("color", 3), ("amplitude", 1)], workers=workers)
+    farm.start()
+    try:
+        farm.render(0.0, timeout=30, **PARAMS)  # wait for the workers to come up
+        durations = []
+        start = time.perf_counter()
+        pending = farm.submit(0.0, **PARAMS)
+        for i in range(1, frames + 1):
+            t0 = time.perf_counter()
+            nxt = farm.submit(i / 60, **PARAMS)
+            farm.collect(pending)
+            pending = nxt
+            durations.append(time.perf_counter() - t0)
+        farm.collect(pending)
+        return dict(_stats(durations, time.perf_counter() - start), workers=len(farm.shards))
+    finally:
+        farm.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render farm benchmark")
+    parser.add_argument("--leds", type=int, default=50000)
+    parser.add_argument("--strips", type=int, default=100)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    layout = build_layout(args.leds, args.strips)
+    result = {
+        "leds": len(layout),
+        "cpus": os.cpu_count(),
+        "in_process": bench_in_process(layout, args.frames),
+        "farm": [bench_farm(layout, args.frames, workers) for workers in args.workers],
+    }
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""Wled stand-ins with a hardware LED config, for building layouts without devices"""
+
+from wled.wled_common_client import Wled
+
+
+def make_wled(ip, name, *segments):
+    w = Wled(ip)
+    w.name = name
+    w.cfg = {"hw": {"led": {"ins": [{"start": s, "len": n, "rev": rev} for s, n, rev in segments]}}}
+    return w
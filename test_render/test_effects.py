@@ -0,0 +1,38 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render import effects  # noqa: E402
+from render.layout import CubeLayout, azimuths  # noqa: E402
+from strips import make_wled  # noqa: E402
+
+
+def test_zoned_wave_follows_the_nearest_zone():
+    layout = CubeLayout.from_wleds([make_wled("10.0.0.1", "a", (0, 10, False))], placement={"a": [(0, 4)]})
+    color = [200, 100, 50]
+    full = layout.render(effects.amplitude_wave, 1.0, color=color).copy()
+    # Zone at the bottom of the pillar at full level, the top one silent
+    zoned = layout.render(effects.zoned_wave, 1.0, color=color, levels=[1.0, 0.0], zones=[0, 0, 0, 0, 0, 1])
+    assert np.array_equal(zoned[:15], full[:15]) and np.all(zoned[15:] == 0)
+    # The nearest zone per LED is computed once per layout and zones
+    nearest = effects.nearest_zone(layout.positions, [0, 0, 0, 0, 0, 1])
+    assert effects.nearest_zone(layout.positions, np.array([0, 0, 0, 0, 0, 1.0])) is nearest
+    assert effects.nearest_zone(layout.positions, [0, 0, 1, 0, 0, 0]) is not nearest
+
+
+def test_amplitude_wave_uses_the_layout_azimuths():
+    layout = CubeLayout.from_wleds([make_wled("10.0.0.1", "a", (0, 30, False))])
+    angles = azimuths(layout.positions)
+    assert azimuths(layout.positions) is angles  # computed when the layout was built
+    layout.render(effects.amplitude_wave, 0.3, color=[255, 40, 0], amplitude=0.7)
+
+    # Same colors as evaluating the angle per frame
+    positions = layout.positions
+    angle = np.arctan2(positions[:, 1] - 0.5, positions[:, 0] - 0.5)
+    value = (0.7 * np.sin(2 * np.pi * 2.0 * positions[:, 2]) + 1) / 2 * (np.sin(0.6 + angle * 2) * 0.3 + 0.7)
+    expected = np.zeros((len(positions), 3), dtype=np.float32)
+    effects._paint(expected, value, [255, 40, 0])
+    assert np.allclose(layout._rgb, expected, atol=1e-3)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render import effects  # noqa: E402
+from render.farm import RenderFarm  # noqa: E402
+from render.layout import CubeLayout  # noqa: E402
+from strips import make_wled  # noqa: E402
+
+
+def test_render_farm_matches_in_process_render():
+    wleds = [make_wled(f"10.0.0.{i}", f"s{i}", (0, 50 + i, False)) for i in range(5)]
+    layout = CubeLayout.from_wleds(wleds)
+    expected = layout.render(effects.amplitude_wave, 3.0, color=[200, 100, 50], amplitude=0.7).copy()
+
+    farm = RenderFarm(layout, effects.amplitude_wave, [("color", 3), ("amplitude", 1)], workers=2)
+    assert len(farm.shards) == 2 and sorted(len(s.keys) for s in farm.shards) == [2, 3]
+    farm.start()
+    try:
+        first = farm.submit(3.0, color=[200, 100, 50], amplitude=0.7)
+        second = farm.submit(4.0, color=[0, 0, 0], amplitude=0.7)
+        frame = farm.collect(first, timeout=30)
+        assert np.array_equal(frame, expected)
+        assert farm.strip_bytes(wleds[3], frame) == layout.strip_bytes(wleds[3])
+        assert not farm.collect(second, timeout=5).any()
+        # Collected frames leave no completion permits behind
+        assert not any(done.acquire(False) for done in farm._done)
+    finally:
+        farm.stop()
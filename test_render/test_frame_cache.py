@@ -0,0 +1,43 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render import effects  # noqa: E402
+from render.frame_cache import FrameCache  # noqa: E402
+from render.layout import CubeLayout  # noqa: E402
+from strips import make_wled  # noqa: E402
+
+
+def test_frame_cache_renders_once_and_loops(tmp_path):
+    layout = CubeLayout.from_wleds([make_wled("10.0.0.1", "a", (0, 30, False)), make_wled("10.0.0.2", "b", (0, 20, True))])
+    cache = FrameCache(str(tmp_path))
+    loop = cache.loop(layout, effects.amplitude_wave, effects.AMPLITUDE_WAVE_PERIOD, 10, color=[255, 40, 0], amplitude=0.7)
+    assert len(loop) == 31 and isinstance(loop.frames, np.memmap)
+    assert np.array_equal(loop.frame(0.5), layout.render(effects.amplitude_wave, 0.5, color=[255, 40, 0], amplitude=0.7))
+    assert np.array_equal(loop.frame(3.1 + 0.5), loop.frame(0.5))
+
+    # Same key from a fresh cache: served from the file, different params: a new file
+    again = FrameCache(str(tmp_path)).loop(layout, effects.amplitude_wave, effects.AMPLITUDE_WAVE_PERIOD, 10,
+                                           color=[255, 40, 0], amplitude=0.7)
+    assert again.key == loop.key and len(os.listdir(tmp_path)) == 1
+    cache.loop(layout, effects.amplitude_wave, effects.AMPLITUDE_WAVE_PERIOD, 10, color=[0, 0, 255], amplitude=0.7)
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_frame_cache_evicts_least_recently_used(tmp_path):
+    layout = CubeLayout.from_wleds([make_wled("10.0.0.1", "a", (0, 10, False))])
+    cache = FrameCache(str(tmp_path), max_files=2, max_open=1)
+
+    def loop(red):
+        return cache.loop(layout, effects.amplitude_wave, effects.AMPLITUDE_WAVE_PERIOD, 5, color=[red, 0, 0], amplitude=0.7)
+
+    first, second = loop(10), loop(20)
+    assert len(cache._open) == 1 and second.key in cache._open
+    assert loop(10).key == first.key  # touching the first makes the second the oldest
+    third = loop(30)
+    assert sorted(os.listdir(tmp_path)) == sorted([f"{first.key}.npy", f"{third.key}.npy"])
+    # A loop already handed out keeps playing from its map after eviction
+    assert np.array_equal(second.frame(0.2), layout.render(effects.amplitude_wave, 0.2, color=[20, 0, 0], amplitude=0.7))
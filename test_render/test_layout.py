@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render import effects  # noqa: E402
+from render.layout import CubeLayout, CUBE_EDGES, strip_segments  # noqa: E402
+from strips import make_wled  # noqa: E402
+
+
+def test_segments_are_placed_on_edges():
+    a = make_wled("10.0.0.1", "a", (0, 10, False), (10, 10, True))
+    b = make_wled("10.0.0.2", "b", (0, 4, False))
+    layout = CubeLayout.from_wleds([a, b], placement={"b": [(0, 4)]})
+
+    assert strip_segments(a.cfg) == [(0, 10, False), (10, 10, True)]
+    assert len(layout) == 24 and layout.strips[b].led_offset == 20
+    # First segment runs along x on the bottom, the reversed one goes from vertex 3 back to 1
+    assert np.allclose(layout.positions[0], [0.05, 0, 0]) and np.allclose(layout.positions[9], [0.95, 0, 0])
+    assert np.allclose(layout.positions[10], [1, 0.95, 0]) and np.allclose(layout.positions[19], [1, 0.05, 0])
+    # b is a pillar
+    assert np.allclose(layout.positions[20:, :2], 0) and np.all(np.diff(layout.positions[20:, 2]) > 0)
+    assert CUBE_EDGES[0] == (0, 1)
+
+
+def test_render_scatters_into_strip_buffers():
+    a = make_wled("10.0.0.1", "a", (0, 6, False))
+    b = make_wled("10.0.0.2", "b", (0, 3, False))
+    layout = CubeLayout.from_wleds([a, b])
+
+    def by_index(positions, t, out):
+        out[:] = np.arange(len(positions))[:, None] * [1, 10, 20]
+        return out
+
+    frame = layout.render(by_index, 0.0)
+    assert frame.dtype == np.uint8 and len(frame) == 27
+    assert list(layout.strip_data(b)) == [6, 60, 120, 7, 70, 140, 8, 80, 160]
+    assert layout.strip_bytes(a)[-3:] == bytes([5, 50, 100])
+
+    layout.render(effects.amplitude_wave, 1.0, color=[255, 0, 400])
+    rgb = layout.frame.reshape(-1, 3).astype(int)
+    assert rgb[:, 1].max() == 0 and rgb[:, 0].min() > 0 and np.all(rgb[:, 2] >= rgb[:, 0])
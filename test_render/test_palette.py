@@ -0,0 +1,39 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render import effects  # noqa: E402
+from render.layout import CubeLayout  # noqa: E402
+from render.palette import Palette  # noqa: E402
+from strips import make_wled  # noqa: E402
+
+
+def test_palette_lut_modes_and_lookup():
+    stops = [(0.25, (0, 0, 0)), (0.75, (200, 100, 0))]
+    linear = Palette(stops, size=1024)
+    assert linear.lut.shape == (1024, 3)
+    assert list(linear.color(0.0)) == [0, 0, 0] and list(linear.color(1.0)) == [200, 100, 0]
+    assert list(linear.color(0.5)) == [100, 50, 0] and list(linear.color(-3)) == [0, 0, 0]
+    assert Palette(stops, mode="smooth").color(0.3)[0] < linear.color(0.3)[0]
+    assert list(Palette(stops, mode="step").color(0.7)) == [0, 0, 0]
+
+    # Per LED: one take over the LUT, also as the palette_wave effect through a layout
+    values = np.linspace(0, 1, 7)
+    assert np.array_equal(linear.colors(values), linear.lut[linear.index(values)])
+    layout = CubeLayout.from_wleds([make_wled("10.0.0.1", "a", (0, 30, False))])
+    frame = layout.render(effects.palette_wave, 0.0, lut=linear.lut.ravel(), level=0.5, spread=0.0)
+    assert np.all(frame.reshape(-1, 3) == linear.color(0.5))
+
+
+def test_amplitude_palette_stays_within_its_colors():
+    from wled.controller import WLEDController, INSIDE_COLORS, MAX_AMP
+    palette = WLEDController.make_palette("inside")
+    assert list(palette.color(10 / MAX_AMP)) == INSIDE_COLORS[0]
+    assert np.allclose(palette.color(50 / MAX_AMP), INSIDE_COLORS[2], atol=3)  # 256 entry LUT resolution
+    # The old bands extrapolated far outside the colors, e.g. at amplitude 100
+    for amplitude in range(0, 101):
+        color = palette.color(amplitude / MAX_AMP)
+        assert all(min(c[i] for c in INSIDE_COLORS) <= color[i] <= max(c[i] for c in INSIDE_COLORS) for i in range(3))
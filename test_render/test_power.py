@@ -0,0 +1,35 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.layout import CubeLayout  # noqa: E402
+from render.power import PowerLimiter  # noqa: E402
+from strips import make_wled  # noqa: E402
+
+
+def test_power_limiter_scales_only_psus_over_budget():
+    a = make_wled("10.0.0.1", "a", (0, 100, False))
+    b = make_wled("10.0.0.2", "b", (0, 100, False))
+    c = make_wled("10.0.0.3", "c", (0, 50, False))
+    layout = CubeLayout.from_wleds([a, b, c])
+    # a and b share one supply, c has its own without a budget
+    limiter = PowerLimiter.from_layout(layout, groups={"a": "psu1", "10.0.0.2": "psu1"}, budgets={"psu1": 2000},
+                                       channel_ma=(20, 20, 20), idle_ma=1.0)
+    assert limiter.psus == ["psu1", "c"]
+
+    dim = np.full(len(layout.frame), 10, dtype=np.uint8)
+    assert limiter.apply(dim) is dim  # 200 * (1 + 60 * 10 / 255) = 671 mA
+    assert np.allclose(limiter.estimated_ma, [200 + 200 * 600 / 255, 50 + 50 * 600 / 255])
+
+    white = np.full(len(layout.frame), 255, dtype=np.uint8)
+    out = limiter.apply(white)
+    # 200 LEDs at 61 mA = 12200 mA -> (2000 - 200) / 12000 of the color
+    assert out is not white and np.all(white == 255)
+    assert np.all(out[:600] == int(255 * 1800 / 12000)) and np.all(out[600:] == 255)
+    assert limiter.estimate(out)[:2].sum() + 200 <= 2000
+    status = limiter.status()
+    assert status["psu1"]["limited_frames"] == 1 and status["psu1"]["scale"] == 0.15
+    assert status["psu1"]["output_ma"] == 2000 and status["c"]["budget_ma"] is None
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.scenes import SceneMixer  # noqa: E402
+
+
+def test_scene_mixer_crossfades_in_place():
+    white = np.full(6, 200, dtype=np.uint8)
+    red = np.array([100, 0, 0] * 2, dtype=np.uint8)
+    mixer = SceneMixer(frame_size=6, duration=1.0, curve="linear")
+    mixer.add("white", lambda t: white)
+    mixer.add("red", lambda t: red)
+    out = mixer.out
+
+    mixer.switch("white", 10.0, duration=0)
+    assert mixer.render(10.0) is white  # a single full scene is passed through
+
+    # Frame accurate: the fade follows the frame times, not when switch() was called
+    mixer.switch("red", 11.0)
+    assert np.array_equal(mixer.render(11.0), white)
+    assert list(mixer.render(11.25)[:3]) == [175, 150, 150] and mixer.out is out
+    assert not mixer.settled(11.5) and mixer.settled(12.0) and mixer.render(12.0) is red
+
+    # Switching mid-fade starts from the current weights; None fades everything to black
+    mixer.switch("white", 13.0)
+    mixer.switch(None, 13.5, duration=0.5)
+    assert mixer.weights(13.5) == {"white": 0.5, "red": 0.5}
+    assert list(mixer.render(13.75)[:3]) == [75, 50, 50]
+    assert not mixer.render(14.0).any() and mixer.out is out
+
+    equal_power = SceneMixer(frame_size=6, curve="equal_power")
+    equal_power.add("a", lambda t: white)
+    equal_power.add("b", lambda t: white)
+    equal_power.switch("a", 0.0, duration=0)
+    equal_power.switch("b", 1.0)
+    assert sum(w * w for w in equal_power.weights(1.5).values()) == pytest.approx(1.0)
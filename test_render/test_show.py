@@ -0,0 +1,63 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render import effects  # noqa: E402
+from render.layout import CubeLayout  # noqa: E402
+from render.show import ShowFile, ShowPlayer, ShowRecorder, free_path  # noqa: E402
+from strips import make_wled  # noqa: E402
+
+
+def test_show_capture_and_playback(tmp_path):
+    a, b = make_wled("10.0.0.1", "a", (0, 30, False)), make_wled("10.0.0.2", "b", (0, 20, True))
+    layout = CubeLayout.from_wleds([a, b])
+    times = 1000 + np.arange(150) * 0.05
+    frames = [layout.render(effects.plane_wave, t, color=[255, 40, 0]).copy() for t in times]
+    path = str(tmp_path / "show.show")
+    recorder = ShowRecorder.from_layout(path, layout, chunk_frames=32)
+    for t, frame in zip(times, frames):
+        recorder.write(frame, t)
+    recorder.close()
+
+    show = ShowFile(path)
+    assert len(show) == 150 and len(show.index) == 5
+    assert all(np.array_equal(f, frames[i]) and t == times[i] for i, (t, f) in enumerate(show.frames()))
+    assert np.array_equal(show.frame_at(times[70] + 0.01), frames[70])
+    assert a in show and show.strip_bytes(b, frames[3]) == layout.strip_bytes(b, frames[3])
+
+    # Double speed from position 1 s: after 0.5 s of wall clock the show is at 2 s
+    player = ShowPlayer(show, speed=2.0)
+    player.seek(1.0, now=50.0)
+    assert np.array_equal(player.frame(50.5), frames[40])
+    show.close()
+
+    # A capture killed before close has no index: the complete chunks are recovered by scanning
+    cut = int(show.index["offset"][-1]) + 100  # inside the last chunk
+    with open(path, "r+b") as f:
+        f.truncate(cut)
+    recovered = ShowFile(path)
+    assert len(recovered) == 128 and np.array_equal(recovered.frame_at(times[127]), frames[127])
+    recovered.close()
+
+
+def test_empty_shows_are_removed_and_refused(tmp_path):
+    layout = CubeLayout.from_wleds([make_wled("10.0.0.1", "a", (0, 30, False))])
+    path = str(tmp_path / "show.show")
+    ShowRecorder.from_layout(path, layout).close()
+    assert not os.path.exists(path)
+
+    # Killed before the first chunk: header only
+    recorder = ShowRecorder.from_layout(path, layout)
+    recorder._file.flush()
+    try:
+        ShowFile(path)
+        assert False, "a show without frames must be refused"
+    except ValueError as e:
+        assert "no frames" in str(e)
+    recorder.write(layout.frame, 1.0)
+    recorder.close()
+    assert len(ShowFile(path)) == 1
+    assert free_path(path) == str(tmp_path / "show.1.show")
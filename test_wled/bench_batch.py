@@ -0,0 +1,119 @@
+"""
+Batched UDP benchmark: syscalls and send time per frame for 10, 50 and 200 sACN universes.
+
+Usage:
+    python test_wled/bench_batch.py [--universes 10 50 200] [--frames 300] [--output bench.json]
+
+Compares, for the same universes to a local sink:
+    sacn_lib   the sacn library sending each universe itself (one sendto per universe)
+    sendto     UdpBatch with the sendto fallback loop over prebuilt packets
+    sendmmsg   UdpBatch flushing the whole frame with sendmmsg
+Per-frame time includes patching payloads and sequence numbers.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wled.output import SacnOutput, E131_PORT  # noqa: E402
+from wled.udp_batch import UdpBatch, have_sendmmsg  # noqa: E402
+from wled.wled_common_client import Wled, WledDMX  # noqa: E402
+
+LEDS_PER_STRIP = 5 * WledDMX.LEDS_PER_UNIVERSE  # 5 universes per strip
+
+
+def make_strips(n_universes, batch):
+    strips = []
+    for i in range(0, n_universes, 5):
+        wled = Wled("127.0.0.1")
+        wled.cfg = {"hw": {"led": {"ins": [{"start": 0, "len": min(5, n_universes - i) * WledDMX.LEDS_PER_UNIVERSE}]}}}
+        wled.dmx = WledDMX(wled, bind_port=0, backend="sacn")
+        wled.dmx.backend = SacnOutput(wled.dmx, batch=batch)
+        wled.dmx.start()
+        if batch is None:
+            wled.dmx.sender.manual_flush = True
+        strips.append(wled)
+    return strips
+
+
+def _stats(durations, syscalls, frames):
+    us = np.asarray(durations) * 1e6
+    return {"syscalls_per_frame": syscalls / frames, "p50_us": float(np.percentile(us, 50)),
+            "p99_us": float(np.percentile(us, 99)), "mean_us": float(us.mean())}
+
+
+def bench_library(n_universes, frames, frame_data):
+    strips = make_strips(n_universes, None)
+    durations = []
+    try:
+        for _ in range(frames):
+            start = time.perf_counter()
+            now = time.time()
+            for wled in strips:
+                wled.dmx.set_data(frame_data[:3 * wled.dmx.n_leds])
+                handler = wled.dmx.sender._sender_handler
+                for output in wled.dmx.get_senders():
+                    handler.send_out(output, now)
+            durations.append(time.perf_counter() - start)
+    finally:
+        for wled in strips:
+            wled.dmx.stop()
+    return _stats(durations, n_universes * frames, frames)
+
+
+def bench_batch(n_universes, frames, frame_data, use_sendmmsg):
+    batch = UdpBatch(use_sendmmsg=use_sendmmsg)
+    strips = make_strips(n_universes, batch)
+    durations = []
+    try:
+        for _ in range(frames):
+            start = time.perf_counter()
+            for wled in strips:
+                wled.dmx.set_data(frame_data[:3 * wled.dmx.n_leds])
+            batch.flush()
+            durations.append(time.perf_counter() - start)
+    finally:
+        for wled in strips:
+            wled.dmx.stop()
+        batch.close()
+    return _stats(durations, batch.syscalls, frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched UDP transmit benchmark")
+    parser.add_argument("--universes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sink.bind(("127.0.0.1", E131_PORT))
+    frame_data = np.random.default_rng(0).integers(0, 256, 3 * LEDS_PER_STRIP, dtype=np.uint8).tobytes()
+    result = {"sendmmsg_available": have_sendmmsg()}
+    try:
+        for n in args.universes:
+            result[str(n)] = {
+                "sacn_lib": bench_library(n, args.frames, frame_data),
+                "sendto": bench_batch(n, args.frames, frame_data, use_sendmmsg=False),
+            }
+            if have_sendmmsg():
+                result[str(n)]["sendmmsg"] = bench_batch(n, args.frames, frame_data, use_sendmmsg=True)
+    finally:
+        sink.close()
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
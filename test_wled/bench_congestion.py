@@ -0,0 +1,153 @@
+"""
+Congestion control benchmark over the lossy network emulator.
+
+Usage:
+    python test_wled/bench_congestion.py [--strips 4] [--leds 1200] [--bandwidth-mbps 4] [--loss 0.01]
+                                         [--duration 10] [--output bench.json]
+
+Streams DDP frames of several strips through one emulated Wi-Fi hop
+(test_wled/net_emulator.py) that is too slow for all of them at full rate,
+once at a fixed frame rate and once under CongestionController, with probes
+through the same hop as feedback. Prints one JSON document with delivered
+frames/sec, link loss, probe round trips and the final per-strip settings.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from net_emulator import LossyLink, Prober  # noqa: E402
+from wled.congestion import CongestionController  # noqa: E402
+from wled.output import DdpOutput  # noqa: E402
+from wled.wled_common_client import Wled, WledDMX  # noqa: E402
+
+
+def start_strip(wled, port, grouping=1):
+    wled.dmx.stop()
+    wled.dmx.grouping = grouping
+    wled.dmx.backend = DdpOutput(wled.dmx, port=port)
+    wled.dmx.start()
+
+
+def make_strips(n, n_leds, port):
+    strips = []
+    for i in range(n):
+        wled = Wled("127.0.0.1")
+        wled.name = f"strip-{i}"
+        wled.cfg = {"hw": {"led": {"ins": [{"start": 0, "len": n_leds}]}}}
+        wled.dmx = WledDMX(wled, bind_port=0, backend="ddp")
+        start_strip(wled, port)
+        strips.append(wled)
+    return strips
+
+
+def probe_loop(strips, link_address, controller, interval, rtts, stop):
+    probers = [Prober(link_address) for _ in strips]
+    try:
+        while not stop.is_set():
+            for wled, prober in zip(strips, probers):
+                ok, rtt = prober.probe()
+                rtts.append(rtt)
+                if controller is not None:
+                    controller.on_probe(wled, ok, rtt)
+            stop.wait(interval)
+    finally:
+        for prober in probers:
+            prober.close()
+
+
+def run(policy, args):
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    link = LossyLink(sink.getsockname(), bandwidth=args.bandwidth_mbps * 1e6, loss=args.loss, delay=args.delay_ms / 1000,
+                     jitter=args.jitter_ms / 1000, max_queue_delay=args.queue_ms / 1000, seed=0)
+    link.start()
+    port = link.address[1]
+    strips = make_strips(args.strips, args.leds, port)
+    controller = (CongestionController(max_fps=args.fps, hold=0.5, grouping_hold=2.0)
+                  if policy == "aimd" else None)
+    rtts, stop = [], threading.Event()
+    prober = threading.Thread(target=probe_loop, args=(strips, link.address, controller, args.probe_interval, rtts, stop),
+                              daemon=True)
+    prober.start()
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (args.leds, 3), dtype=np.uint8)
+    moving = args.leds // 4  # a quarter of the strip animates, the rest is static
+    sent = 0
+    started = time.monotonic()
+    try:
+        tick = started
+        while time.monotonic() - started < args.duration:
+            frame[:moving] = np.roll(frame[:moving], 1, axis=0)
+            now = time.monotonic()
+            for wled in strips:
+                grouping = 1
+                if controller is not None:
+                    if not controller.due(wled, now):
+                        continue
+                    control = controller.control(wled)
+                    if control.grouping != wled.dmx.grouping:
+                        start_strip(wled, port, control.grouping)
+                    wled.dmx.backend.delta = control.delta
+                    grouping = control.grouping
+                wled.dmx.set_data(frame[::grouping].tobytes())
+                sent += 1
+            tick += 1 / args.fps
+            time.sleep(max(0.0, tick - time.monotonic()))
+        elapsed = time.monotonic() - started
+    finally:
+        stop.set()
+        prober.join()
+        for wled in strips:
+            wled.dmx.stop()
+        time.sleep(args.queue_ms / 1000 + args.delay_ms / 1000 + 0.05)
+        link.stop()
+        sink.close()
+
+    answered = np.array([r for r in rtts if r is not None]) * 1000
+    return {
+        "sent_fps_per_strip": round(sent / elapsed / args.strips, 2),
+        "delivered_fps_per_strip": round(sum(link.stats.frames_delivered.values()) / elapsed / args.strips, 2),
+        "link": link.stats.as_dict(),
+        "probe_loss": round(1 - len(answered) / len(rtts), 3) if rtts else None,
+        "probe_rtt_p50_ms": round(float(np.percentile(answered, 50)), 1) if len(answered) else None,
+        "probe_rtt_p95_ms": round(float(np.percentile(answered, 95)), 1) if len(answered) else None,
+        "strips": controller.status() if controller is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Congestion control over an emulated lossy link")
+    parser.add_argument("--strips", type=int, default=4)
+    parser.add_argument("--leds", type=int, default=1200)
+    parser.add_argument("--fps", type=float, default=1 / 0.06)
+    parser.add_argument("--bandwidth-mbps", type=float, default=4.0)
+    parser.add_argument("--loss", type=float, default=0.01)
+    parser.add_argument("--delay-ms", type=float, default=3.0)
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    parser.add_argument("--queue-ms", type=float, default=80.0)
+    parser.add_argument("--probe-interval", type=float, default=0.1)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--policies", nargs="+", default=["fixed", "aimd"])
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    result = {policy: run(policy, args) for policy in args.policies}
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
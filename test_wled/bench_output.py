@@ -0,0 +1,98 @@
+"""
+Output backend benchmark: sACN vs DDP for one frame of a strip.
+
+Usage:
+    python test_wled/bench_output.py [--leds 280 1000 5000] [--frames 500] [--output bench.json]
+
+For every strip size and backend, sends frames back to back to a local sink and
+prints one JSON document with packets per frame, packets/sec, frames/sec and CPU
+time per frame. sACN universes are flushed on the caller's thread (manual flush)
+so that both backends are measured doing the same work.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wled.output import DdpOutput  # noqa: E402
+from wled.wled_common_client import Wled, WledDMX  # noqa: E402
+
+
+def make_strip(n_leds, backend, sink_port):
+    wled = Wled("127.0.0.1")
+    wled.cfg = {"hw": {"led": {"ins": [{"start": 0, "len": n_leds}]}}}
+    wled.dmx = WledDMX(wled, bind_port=0, backend=backend)
+    if backend == "ddp":
+        wled.dmx.backend = DdpOutput(wled.dmx, port=sink_port)
+    wled.dmx.start()
+    if backend == "sacn":
+        wled.dmx.sender.manual_flush = True
+    return wled
+
+
+def send_frame(dmx, data):
+    dmx.set_data(data)
+    if dmx.backend_name == "sacn":
+        handler = dmx.sender._sender_handler
+        now = time.time()
+        for output in dmx.get_senders():
+            handler.send_out(output, now)
+
+
+def bench(n_leds, backend, frames, sink_port):
+    wled = make_strip(n_leds, backend, sink_port)
+    data = np.random.default_rng(0).integers(0, 256, 3 * n_leds, dtype=np.uint8).tobytes()
+    try:
+        send_frame(wled.dmx, data)
+        cpu, wall = time.process_time(), time.perf_counter()
+        for _ in range(frames):
+            send_frame(wled.dmx, data)
+        cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+        n_packets = wled.dmx.backend.n_packets
+        return {
+            "packets_per_frame": n_packets,
+            "packets_per_sec": n_packets * frames / wall,
+            "frames_per_sec": frames / wall,
+            "cpu_us_per_frame": cpu / frames * 1e6,
+        }
+    finally:
+        wled.dmx.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sACN vs DDP output benchmark")
+    parser.add_argument("--leds", type=int, nargs="+", default=[280, 1000, 5000])
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    # Packets to 127.0.0.1 need a bound port; nobody reads it, the kernel drops what overflows
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    sacn_sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sacn_sink.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sacn_sink.bind(("127.0.0.1", 5568))
+    try:
+        result = {
+            str(n_leds): {backend: bench(n_leds, backend, args.frames, sink.getsockname()[1]) for backend in ("sacn", "ddp")}
+            for n_leds in args.leds
+        }
+    finally:
+        sink.close()
+        sacn_sink.close()
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
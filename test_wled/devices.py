@@ -0,0 +1,11 @@
+"""Wled stand-ins for tests: a name, and how slow or broken the device is for slow_call-style helpers"""
+
+from wled.wled_common_client import Wled
+
+
+def make_wled(ip, name, delay=0.0, fail=False):
+    w = Wled(ip)
+    w.name = name
+    w.delay = delay
+    w.fail = fail
+    return w
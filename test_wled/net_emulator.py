@@ -0,0 +1,165 @@
+"""
+Lossy local network emulator: a UDP relay with a bandwidth limit, a bounded
+queue, propagation delay, jitter and random loss, like a congested Wi-Fi hop.
+
+    link = LossyLink(target=("127.0.0.1", 4048), bandwidth=2e6, loss=0.02, delay=0.005)
+    link.start()
+    ... send to link.address instead of the target ...
+    link.stop(); print(link.stats)
+
+Packets are serialized at `bandwidth` bits/s; a packet that would wait longer
+than `max_queue_delay` in the queue is dropped (tail drop), so overload shows
+up as growing latency first and as loss after that. DDP packets are forwarded
+to the target; anything else is a probe, which the far end answers directly
+back to its sender (see Prober), so probes share the queue with the frames.
+"""
+
+import heapq
+import random
+import selectors
+import socket
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from wled.output import DDP_HEADER, DDP_PUSH, DDP_VERSION_1
+
+
+class LinkStats:
+    def __init__(self):
+        self.received = 0
+        self.delivered = 0
+        self.lost = 0  # random loss
+        self.dropped = 0  # queue overflow
+        self.bytes_delivered = 0
+        self.frames_delivered: Dict[Tuple[str, int], int] = {}  # DDP push packets per sender
+
+    @property
+    def loss_rate(self) -> float:
+        return (self.lost + self.dropped) / self.received if self.received else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'received': self.received,
+            'delivered': self.delivered,
+            'lost': self.lost,
+            'dropped': self.dropped,
+            'loss_rate': round(self.loss_rate, 4),
+            'bytes_delivered': self.bytes_delivered,
+        }
+
+
+class LossyLink:
+    def __init__(self, target: Tuple[str, int], bandwidth: float = 10e6, loss: float = 0.0, delay: float = 0.0,
+                 jitter: float = 0.0, max_queue_delay: float = 0.1, seed: Optional[int] = None):
+        """
+        Args:
+            target: where packets are forwarded to
+            bandwidth: link rate, bits per second
+            loss: probability a packet is lost on the air
+            delay, jitter: propagation delay and its uniform random spread, seconds
+            max_queue_delay: longest queueing delay before packets are tail dropped, seconds
+            seed: random seed for reproducible runs
+        """
+        self.target = target
+        self.bandwidth = bandwidth
+        self.loss = loss
+        self.delay = delay
+        self.jitter = jitter
+        self.max_queue_delay = max_queue_delay
+        self.random = random.Random(seed)
+        self.stats = LinkStats()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.setblocking(False)
+        self.out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._link_free = 0.0
+        self._pending = []  # heap of (deliver at, seq, data, sender)
+        self._seq = 0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.sock.getsockname()
+
+    def _enqueue(self, data: bytes, sender, now: float):
+        self.stats.received += 1
+        departure = max(now, self._link_free) + len(data) * 8 / self.bandwidth
+        if departure - now > self.max_queue_delay:
+            self.stats.dropped += 1
+            return
+        self._link_free = departure
+        if self.random.random() < self.loss:
+            self.stats.lost += 1
+            return
+        arrival = departure + self.delay + self.random.uniform(0, self.jitter)
+        heapq.heappush(self._pending, (arrival, self._seq, data, sender))
+        self._seq += 1
+
+    def _deliver(self, now: float):
+        while self._pending and self._pending[0][0] <= now:
+            _, _, data, sender = heapq.heappop(self._pending)
+            if len(data) < DDP_HEADER.size or data[0] & 0xC0 != DDP_VERSION_1:
+                self.sock.sendto(data, sender)  # probe answer
+                continue
+            self.out.sendto(data, self.target)
+            self.stats.delivered += 1
+            self.stats.bytes_delivered += len(data)
+            if data[0] & DDP_PUSH:
+                self.stats.frames_delivered[sender] = self.stats.frames_delivered.get(sender, 0) + 1
+
+    def _run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.sock, selectors.EVENT_READ)
+        while self._running:
+            timeout = max(0.0, self._pending[0][0] - time.monotonic()) if self._pending else 0.05
+            if selector.select(timeout=min(timeout, 0.05)):
+                while True:
+                    try:
+                        data, sender = self.sock.recvfrom(2048)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    self._enqueue(data, sender, time.monotonic())
+            self._deliver(time.monotonic())
+        selector.close()
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="LossyLink")
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+        self.sock.close()
+        self.out.close()
+
+
+class Prober:
+    """UDP ping through a LossyLink; probe() -> (ok, rtt) like a health probe"""
+
+    def __init__(self, link_address: Tuple[str, int], timeout: float = 0.2):
+        self.link_address = link_address
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(timeout)
+        self._n = 0
+
+    def probe(self) -> Tuple[bool, Optional[float]]:
+        self._n += 1
+        token = self._n.to_bytes(4, "big")
+        start = time.monotonic()
+        self.sock.sendto(token, self.link_address)
+        try:
+            while True:
+                data = self.sock.recv(64)
+                if data == token:
+                    return True, time.monotonic() - start
+        except socket.timeout:
+            return False, None
+
+    def close(self):
+        self.sock.close()
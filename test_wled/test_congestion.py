@@ -0,0 +1,129 @@
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wled.congestion import CongestionController  # noqa: E402
+from wled.output import DdpOutput  # noqa: E402
+from wled.wled_common_client import Wled, WledDMX  # noqa: E402
+from devices import make_wled  # noqa: E402
+from net_emulator import LossyLink, Prober  # noqa: E402
+
+
+def test_congestion_controller_aimd():
+    wled = make_wled("10.0.0.9", "crowded")
+    controller = CongestionController(max_fps=16, min_fps=4, increase=2, decrease=0.5, max_grouping=4,
+                                      hold=1.0, grouping_hold=5.0)
+    control = controller.control(wled)
+    controller.on_probe(wled, True, 0.010, now=0.0)
+    assert control.fps == 16 and not control.delta
+
+    # Losses and queueing delay halve the rate once per hold period, then coarsen the strip
+    now = 10.0
+    for ok, rtt in [(False, None), (False, None), (True, 0.200), (True, 0.200), (False, None)]:
+        controller.on_probe(wled, ok, rtt, now=now)
+        now += 1.0
+    assert control.fps == 4 and control.grouping == 2 and control.delta
+    assert control.congestion_events == 5 and control.losses == 3
+
+    # Clean probes restore resolution first, then add frame rate back, dropping delta frames at full rate
+    for _ in range(12):
+        now += 1.0
+        controller.on_probe(wled, True, 0.011, now=now)
+    assert control.grouping == 1 and control.fps == 16 and not control.delta
+
+    # Frame pacing at the reduced rate
+    control.fps = 5
+    assert controller.due(wled, now=100.0) and not controller.due(wled, now=100.1) and controller.due(wled, now=100.2)
+
+
+def test_ddp_delta_starts_with_a_keyframe():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    wled = Wled("127.0.0.1")
+    wled.cfg = {"hw": {"led": {"ins": [{"start": 0, "len": 1440}]}}}
+    wled.dmx = WledDMX(wled, backend="ddp")
+    wled.dmx.backend = DdpOutput(wled.dmx, port=receiver.getsockname()[1])
+    wled.dmx.start()
+    try:
+        backend = wled.dmx.backend
+        frame = bytearray(3 * 1440)
+        backend.delta = True
+        wled.dmx.set_data(bytes(frame))
+        backend.delta = False
+        changed = bytearray(frame)
+        changed[0] = changed[2000] = 1  # the strip shows this frame, sent while delta was off
+        wled.dmx.set_data(bytes(changed))
+        sent = backend.packets
+        # Back to delta with the first frame again: _previous still holds it, but the strip does not
+        backend.delta = True
+        wled.dmx.set_data(bytes(frame))
+        assert backend.packets - sent == 3
+        wled.dmx.set_data(bytes(frame))
+        assert backend.packets - sent == 3 + 1  # then only the push packet
+    finally:
+        wled.dmx.stop()
+        receiver.close()
+
+
+def test_ddp_delta_frames_through_lossy_link():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(0.5)
+    # 1 Mbit/s with 50 ms of queue: room for four 1450 byte packets
+    link = LossyLink(receiver.getsockname(), bandwidth=1e6, delay=0.02, max_queue_delay=0.05)
+    link.start()
+    wled = Wled("127.0.0.1")
+    wled.cfg = {"hw": {"led": {"ins": [{"start": 0, "len": 1440}]}}}
+    wled.dmx = WledDMX(wled, backend="ddp")
+    wled.dmx.backend = DdpOutput(wled.dmx, port=link.address[1])
+    wled.dmx.start()
+    try:
+        ok, rtt = Prober(link.address).probe()
+        assert ok and rtt >= 0.02
+
+        # Only the changed packet and the push packet of a delta frame go out
+        frame = bytearray(3 * 1440)
+        wled.dmx.backend.delta = True
+        wled.dmx.set_data(bytes(frame))
+        frame[100] = 1
+        wled.dmx.set_data(bytes(frame))
+        assert wled.dmx.backend.packets == 3 + 2
+        time.sleep(0.2)
+        assert link.stats.delivered == 4 and link.stats.dropped == 1
+
+        # Grouping 4: a quarter of the pixels, a single packet
+        wled.dmx.stop()
+        wled.dmx.set_grouping(4, configure_device=False)
+        wled.dmx.start()
+        assert wled.dmx.n_leds == 360 and wled.dmx.backend.n_packets == 1
+    finally:
+        wled.dmx.stop()
+        link.stop()
+        receiver.close()
+
+
+def test_stream_restart_resets_grouping():
+    from wled.controller import WLEDController
+    controller = WLEDController.__new__(WLEDController)  # only the regrouping state, no devices or threads
+    controller.congestion = CongestionController(max_fps=16)
+    controller._regrouping, controller._regrouped = {}, set()
+    wled = make_wled("10.0.0.9", "crowded")
+    wled.dmx = WledDMX(wled, backend="ddp")
+    posted = []
+    wled.post_json_state = lambda new_json={}: posted.append(new_json["seg"][0]["grp"])
+
+    controller.congestion.control(wled).grouping = 2
+    controller._regroup(wled, 2, 4.0)
+    controller._regrouping[id(wled)][0].result(timeout=1)
+    controller._regroup(wled, 2, 4.0)
+    assert wled.dmx.grouping == 2 and posted == [2]
+
+    # Stopped while the device was down: local state only, the device is reset on the next start
+    controller._reset_grouping(wled, configure_device=False)
+    assert wled.dmx.grouping == 1 and controller.congestion.control(wled).grouping == 1 and posted == [2]
+    controller._reset_grouping(wled)
+    controller._reset_grouping(wled)
+    assert posted == [2, 1]
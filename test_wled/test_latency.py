@@ -0,0 +1,36 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wled.health import HealthMonitor  # noqa: E402
+from wled.latency import LatencyCompensator  # noqa: E402
+from devices import make_wled  # noqa: E402
+
+
+def test_latency_compensation_delays_fast_strips_from_a_ring():
+    near, far, new = make_wled("10.0.0.1", "near"), make_wled("10.0.0.2", "far"), make_wled("10.0.0.3", "new")
+    compensator = LatencyCompensator(frame_interval=0.05, max_delay=0.25)
+    rtts = {"near": 0.010, "far": 0.150}
+    monitor = HealthMonitor([near, far], on_rtt=compensator.record)
+    monitor._probe = lambda w: rtts[w.name]
+    for _ in range(3):
+        monitor.check_all()
+
+    # One-way delays 5 and 75 ms: near is sent the frame from one tick ago, 20 ms into the tick
+    plan = compensator.schedule([near, far, new])
+    assert [(round(offset, 3), back, w.name) for offset, back, w in plan] == [(0.0, 0, "far"), (0.0, 0, "new"), (0.02, 1, "near")]
+    # At the silent frame rate the same 70 ms fit into the current tick
+    plan = compensator.schedule([near, far], frame_interval=0.5)
+    assert [(round(offset, 3), back, w.name) for offset, back, w in plan] == [(0.0, 0, "far"), (0.07, 0, "near")]
+
+    assert compensator.frame(0) is None
+    for i in range(10):
+        compensator.push(np.full(6, i, dtype=np.uint8))
+    ring = compensator.line.frames
+    assert compensator.frame(0)[0] == 9 and compensator.frame(1)[0] == 8 and compensator.frame(compensator.slots) is None
+    compensator.push(np.zeros(6, dtype=np.uint8))
+    assert compensator.line.frames is ring
+    monitor.stop()
@@ -0,0 +1,42 @@
+import os
+import socket
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wled.udp_codec import decode_sync_v9  # noqa: E402
+from wled.wled_common_client import Wled  # noqa: E402
+from wled.parametric import ParametricSync, strip_mode, PARAMETRIC, PIXELS  # noqa: E402
+
+
+def test_parametric_sync_sends_changed_parameters_in_phase():
+    receivers, strips = [], []
+    for name in ("a", "b"):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(1)
+        wled = Wled("127.0.0.1")
+        wled.name = name
+        wled.udp_port = receiver.getsockname()[1]
+        receivers.append(receiver)
+        strips.append(wled)
+    sync = ParametricSync(fx=9, speed=(0, 200), brightness=(50, 250), phase_shifts={"b": 500})
+    try:
+        assert sync.update(strips, [255, 40, 0], 0.5, now=100.0) == {}
+        a, b = [decode_sync_v9(r.recv(64)) for r in receivers]
+        assert a["effectCurrent"] == 9 and a["effectSpeed"] == 100 and a["bri"] == 150 and a["col"] == [255, 40, 0, 0]
+        assert 400 < (b["t"] - a["t"]) % (1 << 32) < 600
+
+        # Jitter within the tolerance is not sent again before the keepalive, a real change is
+        sync.update(strips, [254, 40, 0], 0.505, now=100.1)
+        assert sync.packets_sent == 2
+        sync.update(strips, [254, 40, 0], 0.9, now=100.2)
+        sync.update(strips, [254, 40, 0], 0.9, now=101.5)
+        assert sync.packets_sent == 6
+        assert decode_sync_v9(receivers[0].recv(64))["effectSpeed"] == 180
+    finally:
+        for receiver in receivers:
+            receiver.close()
+
+    assert strip_mode(strips[0], {"a": PARAMETRIC}, PIXELS) == PARAMETRIC
+    assert strip_mode(strips[1], {"a": PARAMETRIC}, PIXELS) == PIXELS
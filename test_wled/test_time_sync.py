@@ -0,0 +1,111 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wled.udp_codec import SyncPacketV9, decode_sync_v9  # noqa: E402
+from wled.wled_common_client import Wled  # noqa: E402
+from wled.state_mirror import WledSyncListener  # noqa: E402
+from wled.parametric import ParametricSync  # noqa: E402
+from wled.time_sync import DeviceClock, TimeSyncService, exchange  # noqa: E402
+
+
+def test_time_sync_models_offset_drift_and_delay():
+    # Device clock 200 ms ahead and 50 ppm fast; exchanges with 4..40 ms round trips, asymmetric on slow ones
+    rng = np.random.default_rng(1)
+    clock = DeviceClock(window=64)
+    for i in range(60):
+        t0 = 1000.0 + 10 * i
+        rtt = rng.uniform(0.004, 0.04)
+        device_time = t0 + 0.2 + 50e-6 * (t0 - 1000) + rtt * rng.uniform(0.3, 0.7)
+        clock.add(t0 + rtt / 2, *exchange(t0, device_time, t0 + rtt))
+    assert abs(clock.drift_ppm - 50) < 15
+    assert abs(clock.offset_at(1600.0) - (0.2 + 50e-6 * 600)) < 0.003
+    assert 0.004 <= clock.rtt < 0.006
+
+    # Probes give the round trip, notifier packets from the device its clock
+    wled = Wled("10.0.0.7")
+    service = TimeSyncService(probe=lambda w: (5.0, None, 5.010), tolerance=0.003)
+    service.watch(wled)
+    service.measure(wled)
+    assert service.timebase_shift(wled) == pytest.approx(5.0)
+    for now in (2000.0, 2010.0, 2020.0):
+        packet = bytes(SyncPacketV9().pack(now - 0.005 + 0.1))
+        service.on_packet("10.0.0.7", packet, now=now)
+    assert service.clock(wled).offset_at(2020.0) == pytest.approx(0.1, abs=0.002)
+    assert service.to_device(wled, 2020.0) == pytest.approx(2020.1, abs=0.002)
+
+    # The correction is added to the time base of parametric packets
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(1)
+    strip = Wled("127.0.0.1")
+    strip.udp_port = receiver.getsockname()[1]
+    service.watch(strip)
+    service.clock(strip).add_rtt(0.040)
+    try:
+        ParametricSync(clock=service).update([strip], [0, 0, 255], 1.0)
+        before = time.time()
+        decoded = decode_sync_v9(receiver.recv(64))
+        assert 10 < (decoded["t"] - int(before * 1000)) % (1 << 32) < 40
+    finally:
+        receiver.close()
+
+
+def test_time_sync_takes_device_clocks_from_the_listener(caplog):
+    listener = WledSyncListener(ports=[0], bind_address="127.0.0.1")
+    service = TimeSyncService(listener, probe=lambda w: (time.time(), None, time.time() + 0.002))
+    sender, silent = Wled("127.0.0.1"), Wled("10.0.0.8")
+    service.watch(sender)
+    service.watch(silent)
+    listener.start()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # A device clock 100 ms ahead, heard over UDP once the path delay is known
+        service.measure_all()
+        sock.sendto(bytes(SyncPacketV9().pack(time.time() + 0.1)), ("127.0.0.1", listener.bound_ports[0]))
+        deadline = time.monotonic() + 2
+        while not service.clock(sender).samples and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert service.clock(sender).offset_at(time.time()) == pytest.approx(0.1, abs=0.01)
+
+        # HTTP alone gives no device time: the silent device is reported once
+        with caplog.at_level("WARNING", logger="wled.time_sync"):
+            for _ in range(4):
+                service.measure_all()
+        warnings = [r.message for r in caplog.records if "No notifier packets" in r.message]
+        assert len(warnings) == 1 and "10.0.0.8" in warnings[0]
+        assert service.status()[str(silent)]["notifier"] is False
+    finally:
+        sock.close()
+        listener.stop()
+        service.stop()
+
+
+def test_device_clock_is_read_while_samples_arrive():
+    clock = DeviceClock(window=8)
+    stop = threading.Event()
+
+    def feed():
+        i = 0
+        while not stop.is_set():
+            clock.add(1000.0 + i, 0.1, 0.01)
+            clock.add_rtt(0.02)
+            i += 1
+
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    try:
+        for _ in range(2000):
+            clock.offset_at(1000.0)
+            clock.rtt
+    finally:
+        stop.set()
+        feeder.join()
+    assert clock.offset_at(1000.0) == pytest.approx(0.1)
@@ -0,0 +1,308 @@
+import os
+import socket
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wled.udp_codec import (  # noqa: E402
+    SyncPacketV9, decode_sync_v9, decode_sync_v9_batch, decode_sync_v9_packets, decode_sys_info,
+    SYNC_V9_SIZE,
+)
+from wled.wled_common_client import Wled, WledDMX  # noqa: E402
+from wled.frame_sync import FrameSync, parse_e131, E131_DATA_OFFSET  # noqa: E402
+from wled.output import DdpOutput, SacnOutput, DDP_HEADER  # noqa: E402
+from wled.udp_batch import UdpBatch, have_sendmmsg  # noqa: E402
+from wled.state_mirror import WledStateMirror, WledSyncListener  # noqa: E402
+from wled.discovery import WledDiscovery, WledRegistry  # noqa: E402
+
+
+def sys_info_packet(ip=(192, 168, 8, 40), name=b"cube-1", node_type=32, unit_id=7, build=2405180):
+    return bytes([255, 1, *ip]) + name.ljust(32, b"\0") + bytes([node_type, unit_id]) + build.to_bytes(4, "little")
+
+
+def test_sync_packet_only_patches_time():
+    packet = SyncPacketV9(brightness=200, col=[1, 2, 3], fx=42, transition_delay=700, sync_groups={1, 3})
+    first = bytes(packet.pack(1_700_000_000.250))
+    second = bytes(packet.pack(1_700_000_123.500))
+
+    assert len(first) == SYNC_V9_SIZE
+    assert first[:25] == second[:25] and first[36] == second[36] == 0b101
+    decoded = decode_sync_v9(second)
+    assert decoded["bri"] == 200 and decoded["col"] == [1, 2, 3, 0] and decoded["effectCurrent"] == 42
+    assert decoded["transitionDelay"] == 700
+    assert decoded["unix"] == 1_700_000_123 and decoded["ms"] == 500
+    assert decoded["t"] == (1_700_000_123_500 & 0xFFFFFFFF)
+
+
+def test_batch_decode_matches_single_decode():
+    packets = [bytes(SyncPacketV9(brightness=b, fx=b % 7).pack(1_700_000_000 + b)) for b in range(10)]
+    batch = decode_sync_v9_packets(packets + [b"\x00" * 10])
+
+    assert len(batch) == 10
+    assert list(batch["bri"]) == list(range(10))
+    assert all(batch["unix"][i] == decode_sync_v9(p)["unix"] for i, p in enumerate(packets))
+
+    # Packets in fixed-size receive slots, one of them a realtime packet
+    slots = bytearray(64 * 3)
+    for i, p in enumerate(packets[:3]):
+        slots[i * 64:i * 64 + SYNC_V9_SIZE] = p
+    slots[64] = 2
+    assert list(decode_sync_v9_batch(slots, stride=64)["bri"]) == [0, 2]
+
+
+def test_wled_parse_dispatch():
+    sync = bytes(SyncPacketV9(brightness=17).pack())
+    assert Wled.parse_udp_sync(sync)["bri"] == 17
+
+    info = Wled.parse_udp_sync(sys_info_packet())
+    assert info == decode_sys_info(sys_info_packet())
+    assert info["ip"] == [192, 168, 8, 40] and info["name"] == "cube-1" and info["node_type"] == "esp32"
+    assert info["build"] == 2405180
+
+    assert Wled.parse_udp_sync_v9(sync[:20]) == {}
+
+
+def test_state_mirror_tracks_changes():
+    mirror = WledStateMirror()
+    changes = []
+    mirror.subscribe(lambda ip, state, changed: changes.append((ip, changed)))
+
+    packet = SyncPacketV9(brightness=100, fx=3, col=[10, 20, 30])
+    mirror.apply_packet("192.168.8.41", packet.pack())
+    mirror.apply_packet("192.168.8.41", packet.pack())
+    mirror.apply_packet("192.168.8.41", packet.update(brightness=50, fx=3, col=[10, 20, 30]).pack())
+    mirror.apply_packet("10.0.0.1", sys_info_packet())
+
+    state = mirror.get("192.168.8.41")
+    assert state.bri == 50 and state.fx == 3 and state.col == (10, 20, 30, 0)
+    assert changes[1] == ("192.168.8.41", ("bri",))
+    assert len(changes) == 3
+    assert mirror["192.168.8.40"].name == "cube-1"
+    assert sorted(mirror.alive_ips()) == ["192.168.8.40", "192.168.8.41"]
+
+
+def test_sync_listener_receives_over_loopback():
+    listener = WledSyncListener(ports=[0, 0], bind_address="127.0.0.1")
+    listener.start()
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.sendto(SyncPacketV9(brightness=77).pack(), ("127.0.0.1", listener.bound_ports[0]))
+        sock.sendto(sys_info_packet(ip=(127, 0, 0, 1)), ("127.0.0.1", listener.bound_ports[1]))
+        sock.close()
+
+        deadline = time.time() + 2
+        while listener.packets < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        state = listener.mirror.get("127.0.0.1")
+        assert state.bri == 77 and state.name == "cube-1"
+    finally:
+        listener.stop()
+
+
+def test_registry_persists_and_follows_ip_changes():
+    path = os.path.join(tempfile.mkdtemp(), "registry.json")
+    discovery = WledDiscovery(registry=WledRegistry(path), listener=WledSyncListener(ports=[]))
+
+    discovery._on_packet("192.168.8.40", sys_info_packet())
+    discovery._on_packet("192.168.8.41", sys_info_packet(ip=(192, 168, 8, 41), name=b"cube-2", unit_id=8))
+    discovery.registry.save()
+    assert not discovery.registry.update("192.168.8.40", decode_sys_info(sys_info_packet()))
+
+    registry = WledRegistry(path)
+    assert len(registry) == 2
+    registry.update("192.168.8.99", decode_sys_info(sys_info_packet(ip=(192, 168, 8, 99))))
+    assert len(registry) == 2
+    assert registry.get_by_ip("192.168.8.99")["name"] == "cube-1"
+    assert registry.get_by_ip("192.168.8.40") is None
+
+    wleds = registry.to_wleds()
+    assert wleds.get_names() == ["cube-1", "cube-2"]
+    assert wleds.get_by_name("cube-1").ip == "192.168.8.99"
+
+    # A device remembered with its cfg comes back ready to stream, without HTTP
+    known = Wled("192.168.8.41")
+    known.name = "cube-2"
+    known.cfg = {"if": {"sync": {"port0": 21325}}, "hw": {"led": {"ins": [{"start": 0, "len": 30}]}}}
+    registry.remember(known)
+    wled = WledRegistry.to_wled(registry.get_by_ip("192.168.8.41"))
+    assert wled.name == "cube-2" and wled.cfg == known.cfg and wled.udp_port == 21325
+
+
+
+def test_registry_keeps_one_entry_per_ip(tmp_path):
+    registry = WledRegistry(str(tmp_path / "registry.json"))
+    registry.update("192.168.8.40", decode_sys_info(sys_info_packet()))
+    # Renamed in the WLED UI: same address, same device
+    assert registry.update("192.168.8.40", decode_sys_info(sys_info_packet(name=b"cube-renamed")))
+    assert len(registry) == 1 and registry.get_by_ip("192.168.8.40")["name"] == "cube-renamed"
+
+    # A known device got the address of another one, which has moved away
+    registry.update("192.168.8.41", decode_sys_info(sys_info_packet(name=b"cube-2", unit_id=8)))
+    registry.update("192.168.8.41", decode_sys_info(sys_info_packet(name=b"cube-renamed")))
+    wleds = registry.to_wleds()
+    assert [w.ip for w in wleds] == ["192.168.8.41"]
+    assert wleds.get_by_ip("192.168.8.41").name == "cube-renamed"
+
+    registry.save()
+    assert len(WledRegistry(registry.path)) == 1
+
+
+def test_frame_sync_latches_all_strips_with_one_sync_packet():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    receiver.bind(("127.0.0.1", 5568))
+    receiver.settimeout(1)
+    strips = []
+    for n_leds in (280, 100):
+        wled = Wled("127.0.0.1")
+        wled.cfg = {"hw": {"led": {"ins": [{"start": 0, "len": n_leds}]}}}
+        wled.dmx = WledDMX(wled, bind_port=0)
+        wled.dmx.start()
+        strips.append(wled)
+    try:
+        sync = FrameSync(unicast=True)
+        errors = sync.send_frame({w.dmx: bytes([7]) * 3 * w.dmx.n_leds for w in strips})
+        assert errors == {} and sync.seq == 1
+        packets = []
+        while not packets or packets[-1][0]["kind"] != "sync":
+            data = receiver.recv(1500)
+            info = parse_e131(data)
+            # The sender threads may have sent their initial unsynced universes before
+            if info is not None and info["sync_addr"]:
+                packets.append((info, data))
+        # Three data universes (2 + 1), all pointing at the sync universe, then one sync packet
+        assert [info["kind"] for info, _ in packets] == ["data", "data", "data", "sync"]
+        assert all(info["sync_addr"] == sync.sync_universe for info, _ in packets)
+        assert packets[0][1][E131_DATA_OFFSET] == 7 and packets[-1][0]["sequence"] == 1
+    finally:
+        FrameSync.release(w.dmx for w in strips)
+        for w in strips:
+            w.dmx.stop()
+        receiver.close()
+
+
+def test_frame_sync_reports_missing_sacn_internals():
+    wled = Wled("127.0.0.1")
+    wled.cfg = {"hw": {"led": {"ins": [{"start": 0, "len": 10}]}}}
+    wled.dmx = WledDMX(wled, backend="ddp")
+    errors = FrameSync().send_frame({wled.dmx: bytes(30)})
+    assert "no sACN sender" in str(errors[wled.dmx])
+
+    class OtherSacnDmx:
+        """A strip on a sacn release without the sender internals FrameSync uses"""
+        backend_name = "sacn"
+        sender = SimpleNamespace(manual_flush=False)
+
+    dmx = OtherSacnDmx()
+    dmx.wled = wled
+    errors = FrameSync().send_frame({dmx: bytes(30)})
+    assert isinstance(errors[dmx], RuntimeError) and "sACNsender._sender_handler" in str(errors[dmx])
+
+
+def test_ddp_output_splits_frame_into_pushed_packets():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(1)
+    wled = Wled("127.0.0.1")
+    wled.cfg = {"hw": {"led": {"ins": [{"start": 0, "len": 400}, {"start": 400, "len": 200}]}}}
+    wled.dmx = WledDMX(wled, backend="ddp")
+    wled.dmx.backend = DdpOutput(wled.dmx, port=receiver.getsockname()[1])
+    wled.dmx.start()
+    try:
+        data = bytes(i % 251 for i in range(3 * 600))
+        wled.dmx.set_data(data)
+        packets = [receiver.recv(1500) for _ in range(2)]
+        headers = [DDP_HEADER.unpack(p[:DDP_HEADER.size]) for p in packets]
+        # 1800 bytes: 480 pixels, then the remaining 120 with the push flag
+        assert headers == [(0x40, 1, 0x0B, 1, 0, 1440), (0x41, 1, 0x0B, 1, 1440, 360)]
+        assert b"".join(p[DDP_HEADER.size:] for p in packets) == data
+        assert wled.dmx.backend.n_packets == 2 and wled.dmx.sender is None and wled.dmx.running
+    finally:
+        wled.dmx.stop()
+        receiver.close()
+
+
+
+def test_get_senders_works_on_every_backend():
+    wled = Wled("127.0.0.1")
+    wled.cfg = {"hw": {"led": {"ins": [{"start": 0, "len": 200}]}}}
+    batch = UdpBatch()
+    for backend, batched, n_senders in (("sacn", None, 2), ("sacn", batch, 0), ("ddp", None, 0)):
+        dmx = WledDMX(wled, bind_port=0, backend=backend)
+        assert dmx.get_senders() == []
+        if batched is not None:
+            dmx.backend = SacnOutput(dmx, batch=batched)
+        dmx.start()
+        try:
+            assert len(dmx.get_senders()) == n_senders
+        finally:
+            dmx.stop()
+    batch.close()
+
+
+def test_udp_batch_flushes_frame_with_patched_headers():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(1)
+    strips = []
+    for use_sendmmsg in (True, False):
+        batch = UdpBatch(use_sendmmsg=use_sendmmsg)
+        wled = Wled("127.0.0.1")
+        wled.cfg = {"hw": {"led": {"ins": [{"start": 0, "len": 600}]}}}
+        wled.dmx = WledDMX(wled, backend="ddp")
+        wled.dmx.backend = DdpOutput(wled.dmx, port=receiver.getsockname()[1], batch=batch)
+        wled.dmx.start()
+        strips.append(wled)
+        extra = batch.add(receiver.getsockname(), b"HDR", 4, seq_offset=2)
+
+        for frame in range(1, 3):
+            wled.dmx.set_data(bytes([frame]) * 1800)
+            batch.payload(extra)[:] = b"abcd"
+            batch.next_seq(extra)
+            batch.queue(extra)
+            assert batch.flush() == 3
+            assert batch.last_flush_syscalls == (1 if use_sendmmsg and have_sendmmsg() else 3)
+            packets = [receiver.recv(1500) for _ in range(3)]
+            assert b"HD" + bytes([frame]) + b"abcd" in packets
+            ddp = [p for p in packets if not p.startswith(b"HD")]
+            assert [DDP_HEADER.unpack(p[:10])[1] for p in ddp] == [frame, frame]
+            assert b"".join(p[10:] for p in ddp) == bytes([frame]) * 1800
+        # Nothing queued this tick: nothing is resent
+        assert batch.flush() == 0
+
+        # Delta frames queue only the changed packets and the push packet
+        wled.dmx.backend.delta = True
+        wled.dmx.set_data(bytes(1800))
+        assert batch.flush() == 2
+        wled.dmx.set_data(bytes(1800))
+        assert batch.flush() == 1
+        changed = bytearray(1800)
+        changed[100] = 9
+        wled.dmx.set_data(bytes(changed))
+        assert batch.flush() == 2
+        packets = [receiver.recv(1500) for _ in range(5)]
+        assert packets[3][10:] == bytes(changed[:1440])
+
+        wled.dmx.stop()
+        assert len(batch) == 1
+        batch.close()
+    receiver.close()
+
+
+def test_udp_batch_falls_back_to_sendto(monkeypatch):
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(1)
+    monkeypatch.setattr("wled.udp_batch._sendmmsg", lambda *args: -1)
+    batch = UdpBatch()
+    batch.use_sendmmsg = True
+    packet_id = batch.add(receiver.getsockname(), b"H", 2)
+    batch.payload(packet_id)[:] = b"ok"
+    batch.queue(packet_id)
+    assert batch.flush() == 1
+    assert receiver.recv(16) == b"Hok"
+    batch.close()
+    receiver.close()
@@ -0,0 +1,182 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wled.circuit_breaker import CircuitBreaker, OPEN, HALF_OPEN, CLOSED  # noqa: E402
+from wled.health import HealthMonitor, UP, DEGRADED, DOWN  # noqa: E402
+from wled.state_mirror import WledStateMirror  # noqa: E402
+from wled.wled_common_client import Wleds  # noqa: E402
+from devices import make_wled  # noqa: E402
+
+
+def slow_call(wled, value):
+    if wled.fail:
+        raise ConnectionError("unreachable")
+    time.sleep(wled.delay)
+    return f"{wled.name}:{value}"
+
+
+def test_bulk_returns_partial_results_at_deadline():
+    release = threading.Event()
+    fast = make_wled("10.0.0.1", "fast")
+    broken = make_wled("10.0.0.2", "broken", fail=True)
+    dead = make_wled("10.0.0.3", "dead")
+    wleds = Wleds([fast, broken, dead])
+
+    def call(wled, value):
+        if wled is dead:
+            release.wait(5)
+        return slow_call(wled, value)
+
+    start = time.monotonic()
+    result = wleds.bulk(call, 7, timeout=0.2)
+    assert time.monotonic() - start < 0.5
+    assert result.values() == ["fast:7", None, None]
+    assert list(result.errors) == [broken] and result.timed_out == [dead]
+
+    # The dead device still has a call in flight, so it is skipped instead of queued
+    result = wleds.bulk(call, 8, timeout=0.2)
+    assert result.skipped == [dead]
+    release.set()
+
+
+def test_bulk_iter_streams_in_completion_order():
+    wleds = Wleds([make_wled("10.0.0.1", "slow", delay=0.1), make_wled("10.0.0.2", "quick")])
+    order = [wled.name for wled, result, error in wleds.bulk_iter(slow_call, 1, timeout=1)]
+    assert order == ["quick", "slow"]
+
+
+def test_deadline_does_not_count_a_slow_call_as_failure():
+    slow = make_wled("10.0.0.1", "slow", delay=0.15)
+    result = Wleds([slow]).bulk(slow_call, 1, timeout=0.05)
+    assert result.timed_out == [slow]
+    time.sleep(0.2)
+    assert slow.breaker.state == CLOSED and slow.breaker.failures == 0
+
+
+def test_pass_through_calls_wait_and_forward_timeout(monkeypatch):
+    monkeypatch.setattr("config.WLED_BULK_TIMEOUT", 0.05)
+    wled = make_wled("10.0.0.1", "flashing")
+    wled.update_firmware = lambda filename, timeout=None: time.sleep(0.1) or (filename, timeout)
+    assert Wleds([wled]).update_firmware("fw.bin", timeout=30) == [("fw.bin", 30)]
+
+
+
+def test_pass_through_raises_the_first_device_error():
+    def post_json_state(wled, new_json={}):
+        if wled.fail:
+            raise ConnectionError(f"{wled.name} unreachable")
+        return new_json
+
+    wleds = Wleds([make_wled("10.0.0.1", "up"), make_wled("10.0.0.2", "broken", fail=True),
+                   make_wled("10.0.0.3", "gone", fail=True)])
+    for wled in wleds:
+        wled.post_json_state = lambda new_json={}, w=wled: post_json_state(w, new_json)
+    with pytest.raises(ConnectionError, match="broken unreachable"):
+        wleds.post_json_state({"on": True})
+    # bulk() keeps the partial results
+    assert wleds.bulk(post_json_state, {"on": True}).values() == [{"on": True}, None, None]
+
+
+def test_circuit_breaker_opens_and_readmits():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_open_breaker_is_skipped():
+    down = make_wled("10.0.0.9", "down")
+    down.breaker.trip()
+    result = Wleds([down, make_wled("10.0.0.1", "up")]).bulk(slow_call, 0, timeout=1)
+    assert result.skipped == [down]
+    assert result.values() == [None, "up:0"]
+
+
+def test_indexes_follow_append_remove_filter_sort():
+    a, b, c = make_wled("10.0.0.1", "b"), make_wled("10.0.0.2", "a"), make_wled("10.0.0.3", "c")
+    c.mac = "aa:bb"
+    wleds = Wleds([a, b])
+    wleds.append(c)
+    assert wleds["c"] is c and wleds.get_by_ip("10.0.0.2") is b and wleds.get_by_mac("aa:bb") is c
+    assert c in wleds
+
+    wleds.remove(a)
+    assert wleds.get_by_ip("10.0.0.1") is None and wleds["b"] is None and a not in wleds
+    assert wleds.sort().get_names() == ["a", "c"]
+    assert wleds.filter(lambda w: w.name == "c").get_by_ip("10.0.0.3") is c
+
+    wleds.append(make_wled("10.0.0.4", "a"))
+    try:
+        wleds["a"]
+        assert False, "duplicate names must raise"
+    except ValueError:
+        pass
+
+
+def test_select_by_tag():
+    wleds = Wleds([make_wled(f"10.0.1.{i}", f"strip-{i}") for i in range(6)])
+    wleds.add_tag("inside", [wleds[f"strip-{i}"] for i in range(4)])
+    wleds.add_tag("motion", [wleds["strip-5"]])
+
+    assert [w.name for w in wleds.tagged("inside")] == ["strip-0", "strip-1", "strip-2", "strip-3"]
+    assert len(wleds.select("inside", "motion")) == 5
+    assert wleds.select("motion")["strip-5"].tags == {"motion"}
+
+    wleds.remove_tag("inside", [wleds["strip-0"]])
+    assert len(wleds.tagged("inside")) == 3
+    wleds.remove(wleds["strip-5"])
+    assert wleds.get_tags() == ["inside"]
+
+
+def test_health_monitor_trips_and_readmits():
+    wled = make_wled("10.0.0.5", "flaky")
+    changes = []
+    monitor = HealthMonitor([wled], down_after=2, on_change=lambda w, old, new: changes.append(new))
+
+    def probe(w):
+        if w.fail:
+            raise ConnectionError("unreachable")
+        return 0.01
+
+    monitor._probe = probe
+    wled.fail = True
+    monitor.check_all()
+    assert monitor.state(wled) == DEGRADED and wled.is_available()
+    monitor.check_all()
+    assert monitor.state(wled) == DOWN and not wled.is_available()
+
+    wled.fail = False
+    monitor.check_all()
+    assert monitor.state(wled) == UP and wled.breaker.state == CLOSED
+    assert changes == [DEGRADED, DOWN, UP]
+    assert monitor.status()[str(wled)]["failures"] == 2
+    monitor.stop()
+
+
+def test_health_monitor_skips_http_for_devices_heard_over_udp():
+    heard, silent = make_wled("10.0.0.6", "heard"), make_wled("10.0.0.7", "silent")
+    mirror = WledStateMirror()
+    monitor = HealthMonitor([heard, silent], mirror=mirror)
+    probed = []
+    monitor._probe = lambda w: probed.append(w.name) or 0.01
+    mirror.apply_sys_info("10.0.0.6", {"name": "heard", "node_type": 32, "wled_id": 0, "build": 1})
+    monitor.check_all()
+    assert probed == ["silent"] and monitor.state(heard) == UP
+    # Round trip consumers need real probes of every device
+    monitor.on_rtt = lambda w, rtt: None
+    monitor.check_all()
+    assert sorted(probed) == ["heard", "silent", "silent"]
+    monitor.stop()
@@ -0,0 +1,185 @@
+"""
+Bulk operations over many Wled devices.
+
+All fan-out calls share one long-lived, bounded thread pool. Every call has
+a deadline: whatever finished by then is returned and devices that did not
+answer are reported as timed out. The deadline only bounds the wait; the
+circuit breaker counts the real outcome of the call once it returns (every
+request carries its own TCP timeout), so a slow but healthy device is not
+marked down. NO_DEADLINE waits for every call, for long operations such as
+firmware updates. A device whose previous call is still running is skipped
+instead of queueing a second request behind a dead TCP connection.
+"""
+
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+NO_DEADLINE = math.inf
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def _wait_timeout(remaining: float) -> Optional[float]:
+    return None if remaining == NO_DEADLINE else remaining
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def shared_executor() -> ThreadPoolExecutor:
+    """The process-wide pool used for all WLED fan-out calls"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=config.WLED_BULK_WORKERS, thread_name_prefix="wled-bulk")
+        return _executor
+
+
+class BulkResult:
+    """Outcome of one bulk call, per device"""
+
+    def __init__(self, wleds: List[Any]):
+        self.wleds = wleds
+        self.results: Dict[Any, Any] = {}
+        self.errors: Dict[Any, BaseException] = {}
+        self.timed_out: List[Any] = []
+        self.skipped: List[Any] = []
+        self.elapsed = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return not (self.errors or self.timed_out or self.skipped)
+
+    def raise_first_error(self):
+        """Raise the error of the first device, in device order, that has no result"""
+        for wled in self.wleds:
+            if wled in self.errors:
+                raise self.errors[wled]
+            if wled in self.skipped:
+                raise CircuitOpenError(f"{wled} skipped: circuit open or previous call still running")
+            if wled in self.timed_out:
+                raise TimeoutError(f"{wled} did not answer within the deadline")
+
+    def values(self, default=None) -> List[Any]:
+        """Results in device order, default for devices without a result"""
+        return [self.results.get(w, default) for w in self.wleds]
+
+    def __repr__(self) -> str:
+        return (f"BulkResult(ok={len(self.results)}, errors={len(self.errors)}, "
+                f"timed_out={len(self.timed_out)}, skipped={len(self.skipped)}, elapsed={self.elapsed:.3f}s)")
+
+
+class BulkRunner:
+    """Runs one method on many devices through the shared pool, tracking calls still in flight"""
+
+    def __init__(self, executor: Optional[ThreadPoolExecutor] = None):
+        self._executor = executor
+        self._inflight: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        return self._executor or shared_executor()
+
+    def _resolve(self, method: Union[str, Callable]) -> Callable:
+        if callable(method):
+            return method
+        return lambda wled, *args, **kwargs: getattr(wled, method)(*args, **kwargs)
+
+    def _submit(self, wleds, method, args, kwargs, result: BulkResult) -> Dict[Future, Any]:
+        fun = self._resolve(method)
+        futures = {}
+        for wled in wleds:
+            breaker = getattr(wled, "breaker", None)
+            with self._lock:
+                busy = id(wled) in self._inflight
+            if busy or (breaker is not None and not breaker.allow()):
+                result.skipped.append(wled)
+                continue
+            future = self.executor.submit(fun, wled, *args, **kwargs)
+            with self._lock:
+                self._inflight[id(wled)] = future
+            future.add_done_callback(lambda f, w=wled: self._on_done(w, f))
+            futures[future] = wled
+        return futures
+
+    def _on_done(self, wled, future: Future):
+        with self._lock:
+            if self._inflight.get(id(wled)) is future:
+                del self._inflight[id(wled)]
+        breaker = getattr(wled, "breaker", None)
+        if breaker is None or future.cancelled():
+            return
+        if future.exception() is None:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    def run(self, wleds, method, args=(), kwargs=None, timeout: Optional[float] = None) -> BulkResult:
+        """Call method on every device and wait at most timeout seconds (None: config.WLED_BULK_TIMEOUT, NO_DEADLINE: no limit)"""
+        timeout = config.WLED_BULK_TIMEOUT if timeout is None else timeout
+        wleds = list(wleds)
+        result = BulkResult(wleds)
+        start = time.monotonic()
+        futures = self._submit(wleds, method, args, kwargs or {}, result)
+        done, not_done = wait(futures, timeout=_wait_timeout(timeout))
+        for future in done:
+            wled = futures[future]
+            if future.exception() is None:
+                result.results[wled] = future.result()
+            else:
+                result.errors[wled] = future.exception()
+        for future in not_done:
+            result.timed_out.append(futures[future])
+        result.elapsed = time.monotonic() - start
+        if not result.complete:
+            logger.warning(f"Bulk {getattr(method, '__name__', method)}: {result}")
+        return result
+
+    def iter(self, wleds, method, args=(), kwargs=None,
+             timeout: Optional[float] = None) -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+        """Yield (wled, result, error) as calls complete; stragglers are yielded with a TimeoutError at the deadline"""
+        timeout = config.WLED_BULK_TIMEOUT if timeout is None else timeout
+        result = BulkResult(list(wleds))
+        deadline = time.monotonic() + timeout
+        pending = self._submit(result.wleds, method, args, kwargs or {}, result)
+        for wled in result.skipped:
+            yield wled, None, CircuitOpenError(f"{wled} skipped: circuit open or previous call still running")
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=_wait_timeout(remaining), return_when=FIRST_COMPLETED)
+            for future in done:
+                wled = pending.pop(future)
+                yield wled, (future.result() if future.exception() is None else None), future.exception()
+        for future, wled in pending.items():
+            yield wled, None, TimeoutError(f"{wled} did not answer within {timeout}s")
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+
+_runner: Optional[BulkRunner] = None
+
+
+def shared_runner() -> BulkRunner:
+    """One runner for all collections, so a device busy in one Wleds is busy in every other"""
+    global _runner
+    with _executor_lock:
+        if _runner is None:
+            _runner = BulkRunner()
+        return _runner
@@ -0,0 +1,75 @@
+"""
+Per-device circuit breaker.
+
+closed     calls go through, consecutive failures are counted
+open       calls are skipped instantly until reset_timeout has passed
+half_open  one trial call is let through; success closes, failure re-opens
+"""
+
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = CLOSED
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may be made now. In half-open state only one trial is allowed."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self._state = HALF_OPEN
+                self._trial_running = False
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = CLOSED
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._state = OPEN
+                self.opened_at = time.monotonic()
+
+    def trip(self):
+        """Open immediately, e.g. when a health probe says the device is down"""
+        with self._lock:
+            self.failures = max(self.failures, self.failure_threshold)
+            self._state = OPEN
+            self._trial_running = False
+            self.opened_at = time.monotonic()
+
+    def reset(self):
+        self.record_success()
+
+    def __repr__(self) -> str:
+        return f"CircuitBreaker({self.state}, failures={self.failures})"
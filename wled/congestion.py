@@ -0,0 +1,160 @@
+"""
+Per-strip congestion control of streamed frames.
+
+Each strip has three knobs, from cheapest to most visible: delta frames
+(only changed packets are sent, see DdpOutput.delta), frame rate, and spatial
+resolution (LED grouping: the device repeats every pixel `grouping` times, as
+WLED's segment `grp`, so only n / grouping pixels go over the air).
+
+Feedback comes from device probes (HealthMonitor on_probe): a lost probe or
+a round trip well above the best one seen is a congestion signal. The policy
+is AIMD: on congestion the frame rate is cut multiplicatively (at most once
+per hold period, like once per RTT in TCP) and, once at the minimum rate,
+grouping doubles; every clean probe first restores resolution and then adds
+to the frame rate, and delta frames are dropped again at full rate.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class StripControl:
+    """Current settings and feedback state of one strip"""
+
+    def __init__(self, fps: float):
+        self.fps = fps
+        self.grouping = 1
+        self.delta = False
+        self.base_rtt: Optional[float] = None
+        self.last_sent = 0.0
+        self.last_decrease = 0.0
+        self.last_grouping_change = 0.0
+        self.probes = 0
+        self.losses = 0
+        self.congestion_events = 0
+
+    def as_dict(self) -> dict:
+        return {
+            'fps': round(self.fps, 1),
+            'grouping': self.grouping,
+            'delta': self.delta,
+            'base_rtt_ms': round(self.base_rtt * 1000, 1) if self.base_rtt is not None else None,
+            'probes': self.probes,
+            'losses': self.losses,
+            'congestion_events': self.congestion_events,
+        }
+
+
+class CongestionController:
+    def __init__(
+        self,
+        max_fps: float,
+        min_fps: float = config.CONGESTION_MIN_FPS,
+        increase: float = 2.0,
+        decrease: float = 0.5,
+        max_grouping: int = config.CONGESTION_MAX_GROUPING,
+        rtt_factor: float = 2.0,
+        rtt_slack: float = 0.010,
+        hold: float = 2.0,
+        grouping_hold: float = 10.0,
+    ):
+        """
+        Args:
+            max_fps, min_fps: frame rate range of a strip
+            increase: frame rate added per clean probe (additive increase)
+            decrease: factor applied to the frame rate on congestion (multiplicative decrease)
+            max_grouping: largest LED grouping, a power of two
+            rtt_factor, rtt_slack: a probe slower than base_rtt * rtt_factor + rtt_slack counts as congestion
+            hold: seconds after a decrease in which further congestion signals are ignored
+            grouping_hold: minimum seconds between grouping changes (each one reconfigures the device)
+        """
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.increase = increase
+        self.decrease = decrease
+        self.max_grouping = max_grouping
+        self.rtt_factor = rtt_factor
+        self.rtt_slack = rtt_slack
+        self.hold = hold
+        self.grouping_hold = grouping_hold
+        self._controls: Dict[int, StripControl] = {}
+        self._names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def control(self, wled) -> StripControl:
+        with self._lock:
+            control = self._controls.get(id(wled))
+            if control is None:
+                control = self._controls[id(wled)] = StripControl(self.max_fps)
+                self._names[id(wled)] = str(wled)
+            return control
+
+    def reset(self, wled):
+        """Forget wled: its next stream starts at full rate and resolution"""
+        with self._lock:
+            self._controls.pop(id(wled), None)
+            self._names.pop(id(wled), None)
+
+    def status(self) -> Dict[str, dict]:
+        with self._lock:
+            return {self._names[key]: control.as_dict() for key, control in self._controls.items()}
+
+    # Feedback
+    def on_probe(self, wled, ok: bool, rtt: Optional[float] = None, now: Optional[float] = None):
+        """HealthMonitor on_probe callback: one probe outcome of wled"""
+        now = time.monotonic() if now is None else now
+        control = self.control(wled)
+        control.probes += 1
+        if not ok:
+            control.losses += 1
+            self._decrease(control, now)
+            return
+        if rtt is None:
+            return
+        if control.base_rtt is None or rtt < control.base_rtt:
+            control.base_rtt = rtt
+        if rtt > control.base_rtt * self.rtt_factor + self.rtt_slack:
+            self._decrease(control, now)
+        else:
+            self._increase(control, now)
+
+    def _decrease(self, control: StripControl, now: float):
+        if now - control.last_decrease < self.hold:
+            return
+        control.last_decrease = now
+        control.congestion_events += 1
+        control.delta = True
+        if control.fps > self.min_fps:
+            control.fps = max(self.min_fps, control.fps * self.decrease)
+        elif control.grouping < self.max_grouping and now - control.last_grouping_change >= self.grouping_hold:
+            control.grouping *= 2
+            control.last_grouping_change = now
+
+    def _increase(self, control: StripControl, now: float):
+        if now - control.last_decrease < self.hold:
+            return
+        if control.grouping > 1:
+            if now - control.last_grouping_change >= self.grouping_hold:
+                control.grouping //= 2
+                control.last_grouping_change = now
+            return
+        control.fps = min(self.max_fps, control.fps + self.increase)
+        if control.fps == self.max_fps:
+            control.delta = False
+
+    # Pacing
+    def due(self, wled, now: Optional[float] = None) -> bool:
+        """Whether wled gets the current frame at its frame rate; marks it as sent if so"""
+        now = time.monotonic() if now is None else now
+        control = self.control(wled)
+        # Half a millisecond of slack so a strip at full rate is not skipped by timer jitter
+        if now - control.last_sent < 1 / control.fps - 0.0005:
+            return False
+        control.last_sent = now
+        return True
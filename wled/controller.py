@@ -1,11 +1,27 @@
 import config
-from utils.math_funcs import generate_sine_wave
+from render import effects
+from render.farm import RenderFarm
+from render.frame_cache import FrameCache
+from render.show import ShowFile, ShowPlayer, ShowRecorder, free_path
+from render.layout import CubeLayout
+from render.palette import Palette
+from render.power import PowerLimiter
+from render.scenes import SceneMixer
 from wled.wled_common_client import Wled, Wleds
+from wled.health import HealthMonitor, DOWN
+from wled.frame_sync import FrameSync
+from wled.udp_batch import shared_batch
+from wled.parametric import ParametricSync, strip_mode, PIXELS, PARAMETRIC
+from wled.state_mirror import WledSyncListener
+from wled.discovery import WledDiscovery, WledRegistry
+from wled.time_sync import TimeSyncService
+from wled.latency import LatencyCompensator
+from wled.congestion import CongestionController
+from wled.bulk import shared_executor
+from concurrent.futures import wait
 import logging
-from threading import Thread
-from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Timer, Lock, Event
 import time
-import math
 logger = logging.getLogger(__name__)
 
 AMP_COEFF = 0.7
@@ -13,6 +29,7 @@ TRANSITION_SPEED = 0.4
 AMPLITUDE_THRESHOLD = 1
 PRESET_THRESHOLD = 30
 MIN_AMP = 1
+FRAME_INTERVAL = 0.06  # секунды между кадрами
 MAX_AMP = 100
 
 INSIDE_COLORS = [
@@ -23,6 +40,14 @@ INSIDE_COLORS = [
     [32, 178, 170],
 ]
 
+# Цвет по амплитуде: палитра с точками на верхних границах бывших полос амплитуды (амплитуда / MAX_AMP)
+INSIDE_STOPS = [(0.2, INSIDE_COLORS[0]), (0.3, INSIDE_COLORS[1]), (0.5, INSIDE_COLORS[2]),
+                (0.7, INSIDE_COLORS[3]), (0.9, INSIDE_COLORS[4])]
+PALETTES = {
+    "inside": INSIDE_STOPS,
+    "inside_steps": [(0.0, INSIDE_COLORS[0])] + INSIDE_STOPS[1:],
+}
+
 MOTION_PRESET = {
     "on": True,
     "bri": 128,
@@ -61,8 +86,8 @@ MOTION_PRESET = {
 }  
 
 MOTION_WLED_IP = '192.168.8.46'
+AUDIO_WLED_IPS = ['192.168.8.40', '192.168.8.41']
 
-AMP_COUNT = (MAX_AMP) / len(INSIDE_COLORS)
     
 class WLEDController:
     def __init__(self):
@@ -70,76 +95,492 @@ class WLEDController:
         self.audio_leds_colors = INSIDE_COLORS[0]
         self.target_colors = list(INSIDE_COLORS[0])
         self.current_colors = [float(c) for c in INSIDE_COLORS[0]]
+        self.palette = self.make_palette(config.PALETTE, config.PALETTE_MODE)
 
         self.last_amplitude = 0
         self.amplitude_change_time = time.time()
         self.hypno_phase = 0
         self.animation_time = 0
         self.audio_leds_stopped = False
+        # Гейт активности звука (audio/activity.py): в тишине кадры идут редко, звук будит цикл сразу
+        self.audio_active = True
+        self.activity_wake = Event()
+        # Начало текущего тика и его длина: цикл идёт по абсолютным срокам, паузы внутри тика их не сдвигают
+        self.tick_start = time.monotonic()
+        self.tick_interval = FRAME_INTERVAL
+        # Зоны микрофонов: ленты рядом с микрофоном следуют уровню его канала
+        channels = sorted(config.AUDIO_CHANNEL_ZONES)
+        self.zone_channels = channels
+        self.zones = [float(c) for channel in channels for c in config.AUDIO_CHANNEL_ZONES[channel]]
+        self.zone_levels = [1.0] * len(channels)
+        self.layout = None
+        # Раскладку меняет только поток рендера; поток здоровья лишь просит пересобрать её к следующему тику
+        self.layout_stale = Event()
+        self.frame_errors = 0
+        self.farm = None
+        self.farm_next = None  # (seq, t) кадра, который ферма уже считает к следующему тику
+        self.frame_cache = FrameCache()
+        self.idle_loop = None
+        self.idle_loop_pending = None  # (future, layout): петля рендерится в фоне
+        # Сцены сводятся в кадр плавными переходами: живой рендер, петля из кэша, затемнение перед пресетом
+        self.scenes = SceneMixer(duration=config.SCENE_FADE, curve=config.SCENE_CURVE)
+        self.scenes.add("live", self._render)
+        self.scenes.add("idle", self._idle_frame)
+        self.motion_off_timer = None
+        self.motion_lock = Lock()
+        self.recorder = None
+        self.player = None
+        # Кадр масштабируется по яркости, если блок питания не вытянет его ток
+        self.power_limit = config.PSU_BUDGET_MA > 0 or bool(config.PSU_BUDGETS)
+        self.power = None
+        self.player_power = None
+        if config.SHOW_PLAYBACK_PATH:
+            self.player = ShowPlayer(ShowFile(config.SHOW_PLAYBACK_PATH), speed=config.SHOW_PLAYBACK_SPEED)
+            if self.power_limit:
+                self.player_power = self._power_limiter(PowerLimiter.from_show, self.player.show)
+            logger.info(f"Воспроизведение шоу {config.SHOW_PLAYBACK_PATH}: {len(self.player.show)} кадров, "
+                        f"{self.player.show.duration:.0f} с")
+        # Все ленты защёлкивают кадр одновременно по sync-пакету E1.31
+        self.frame_sync = (FrameSync() if config.E131_FRAME_SYNC and config.WLED_OUTPUT == "sacn"
+                           and not config.WLED_BATCH_SEND else None)
+
+        # Ленты в параметрическом режиме крутят эффект сами, мы шлём только его параметры
+        self.parametric = ParametricSync(phase_shifts=config.PARAMETRIC_PHASE_SHIFTS)
+        # Один UDP-слушатель на всё: анонсы лент для реестра, пакеты синхронизации, часы лент
+        self.sync_listener = WledSyncListener()
+        # Известные ленты (имя, cfg.json) берутся из реестра без HTTP, анонсы по UDP держат его свежим
+        self.registry = WledRegistry()
+        self.discovery = WledDiscovery(self.registry, listener=self.sync_listener)
+        # Часы лент: задержка до каждой ленты и дрейф, метки времени в пакетах синхронизации с поправкой
+        self.time_sync = None
+        if config.TIME_SYNC:
+            self.time_sync = TimeSyncService(self.sync_listener)
+            self.parametric.clock = self.time_sync
+
+        # Быстрые ленты получают кадр позже на разницу сетевых задержек, медленные не ждут.
+        # Не вместе с E1.31 sync и пакетной отправкой: там все ленты получают кадр разом.
+        self.latency = (LatencyCompensator(FRAME_INTERVAL, config.LATENCY_MAX_DELAY)
+                        if config.LATENCY_COMPENSATION and self.frame_sync is None and not config.WLED_BATCH_SEND
+                        else None)
+
+        # При перегрузке Wi-Fi лента получает меньше кадров, потом пониженное разрешение (AIMD по пробам)
+        self.congestion = CongestionController(max_fps=1 / FRAME_INTERVAL) if config.CONGESTION_CONTROL else None
+        # Смена группировки: запрос к ленте в пуле, локальный вывод переключается, когда лента ответила
+        self._regrouping = {}  # id(wled) -> (future запроса, группировка в нём)
+        self._regrouped = set()  # id(wled) лент, которым контроллер менял grp
+
+        # Недоступные ленты помечаются монитором, их breaker открыт и кадры им не шлются
+        # Ленты, чьи UDP-пакеты слушатель недавно слышал, живы без HTTP-пробы
+        self.health = HealthMonitor(mirror=self.sync_listener.mirror, on_change=self._on_health_change,
+                                    on_rtt=self.latency.record if self.latency is not None else None,
+                                    on_probe=self.congestion.on_probe if self.congestion is not None else None)
+
+        try:
+            self.sync_listener.start()
+        except OSError as e:
+            logger.error(f"UDP-слушатель WLED не запустился: {e}")
+        self.discovery.start()
 
         self.audio_leds_thread = Thread(target=self._init_audio_leds, daemon=True)
         self.audio_leds_thread.start()
 
-        self.motion_wled = Wled.from_one_ip(MOTION_WLED_IP)
+        self.motion_wled = self._connect(MOTION_WLED_IP)
+        self.health.start()
     
 
+    def _connect(self, ip):
+        """Подключение к ленте; недоступная лента не роняет контроллер, её вернёт монитор здоровья"""
+        entry = self.registry.get_by_ip(ip)
+        if entry is not None and entry.get("cfg"):
+            # Лента из реестра: имя и cfg.json уже известны, HTTP не нужен
+            wled = WledRegistry.to_wled(entry)
+        else:
+            try:
+                wled = Wled.from_one_ip(ip)
+                self.registry.remember(wled)
+            except Exception as e:
+                logger.error(f"Лента {ip} недоступна: {e}")
+                wled = Wled(ip)
+                wled.breaker.trip()
+        self.health.watch(wled)
+        return wled
+
+    def _connect_all(self, ips):
+        """Ленты не из реестра опрашиваются по HTTP параллельно, а не одна за другой"""
+        wleds = list(shared_executor().map(self._connect, ips))
+        try:
+            self.registry.save()
+        except OSError as e:
+            logger.error(f"Не удалось сохранить реестр лент: {e}")
+        return wleds
+
+    def _on_health_change(self, wled, old_state, new_state):
+        if new_state == DOWN:
+            logger.warning(f"Лента недоступна: {wled}")
+            wled.dmx.stop()
+            self._reset_grouping(wled, configure_device=False)  # grp на ленте сбросится при запуске
+            return
+        if old_state != DOWN:
+            return
+        logger.info(f"Лента снова доступна: {wled}")
+        if wled.cfg is None:
+            wled.cache_fs()
+            wled.name = wled.cfg["id"]["name"]
+            self.registry.remember(wled)
+        layout = self.layout
+        if layout is not None and wled in self.audio_leds and wled not in layout:
+            self.layout_stale.set()  # пересоберётся в начале следующего тика вместе с вернувшейся лентой
+        if wled in self.audio_leds and not self.audio_leds_stopped:
+            self._start_strip(wled)
+
+    def _start_strip(self, wled):
+        self._reset_grouping(wled)
+        if strip_mode(wled) == PARAMETRIC:
+            self.parametric.activate(wled)
+        else:
+            wled.dmx.start()
+
+    def _build_layout(self):
+        self.idle_loop = None
+        self.idle_loop_pending = None
+        if self.farm is not None:
+            self.farm.stop()
+            self.farm = None
+            self.farm_next = None
+        self.layout = CubeLayout.from_wleds(self.audio_leds, config.CUBE_LAYOUT)
+        logger.info(f"Раскладка куба: {len(self.layout)} светодиодов, ленты {list(self.layout.strips.values())}")
+        self.scenes.resize(len(self.layout.frame))
+        if self.power_limit:
+            self.power = self._power_limiter(PowerLimiter.from_layout, self.layout)
+        if config.RENDER_WORKERS > 0 and len(self.layout):
+            # Ленты одной группы (тега) рендерит один процесс
+            params = [("color", 3), ("amplitude", 1)]
+            if self.zones:
+                params += [("levels", len(self.zone_levels)), ("zones", len(self.zones))]
+            self.farm = RenderFarm(self.layout, self._effect(), params,
+                                   workers=config.RENDER_WORKERS,
+                                   group=lambda wled: min(wled.tags) if wled.tags else wled.ip)
+            self.farm.start()
+        if config.SHOW_CAPTURE_PATH and self.player is None:
+            # Запись продолжается через пересборки; новый файл только если изменился состав лент (формат кадра)
+            strips = ShowRecorder.layout_strips(self.layout)
+            if self.recorder is None or self.recorder.strips != strips:
+                if self.recorder is not None:
+                    self.recorder.close()
+                path = free_path(time.strftime(config.SHOW_CAPTURE_PATH))
+                self.recorder = ShowRecorder(path, strips, len(self.layout.frame))
+                logger.info(f"Запись шоу в {self.recorder.path}")
+
+    @staticmethod
+    def _power_limiter(build, source):
+        return build(source, config.PSU_GROUPS, config.PSU_BUDGETS, config.PSU_BUDGET_MA)
+
+    def _effect(self):
+        return effects.zoned_wave if self.zones else effects.amplitude_wave
+
+    def _render(self, current_time):
+        # Один векторный расчёт на весь куб, ленты получают свои срезы кадра
+        params = {"color": self.current_colors, "amplitude": AMP_COEFF}
+        if self.zones:
+            params.update(levels=self.zone_levels, zones=self.zones)
+        if self.farm is not None:
+            return self._render_farm(current_time, params)
+        return self.layout.render(self._effect(), current_time, **params)
+
+    def _render_farm(self, current_time, params):
+        # Кадр этого тика заказан на прошлом; следующий заказываем сразу, воркеры считают его, пока этот отправляется.
+        # Параметры звука в нём на тик старше; после паузы (сцена, пересборка) кадр заказывается заново
+        seq = None
+        if self.farm_next is not None and abs(self.farm_next[1] - current_time) <= self.tick_interval:
+            seq = self.farm_next[0]
+        if seq is None:
+            seq = self.farm.submit(current_time, **params)
+        try:
+            frame = self.farm.collect(seq)
+        except TimeoutError as e:
+            # Зависший или упавший воркер: дальше рендерим в этом процессе, до следующей пересборки раскладки
+            logger.error(f"Ферма рендера не успела: {e}, рендер в основном процессе")
+            self.farm.stop()
+            self.farm = None
+            self.farm_next = None
+            return self.layout.render(self._effect(), current_time, **params)
+        next_time = current_time + self.tick_interval
+        self.farm_next = (self.farm.submit(next_time, **params), next_time)
+        return frame
+
+    def _idle_loop(self, layout, color):
+        return self.frame_cache.loop(layout, effects.amplitude_wave, effects.AMPLITUDE_WAVE_PERIOD, 1 / FRAME_INTERVAL,
+                                     color=color, amplitude=AMP_COEFF)
+
+    def _idle_frame(self, current_time):
+        if self.idle_loop is None and not self._poll_idle_loop():
+            # Новую петлю рендерит пул, кадры пока идут из живого рендера
+            return self._render(current_time)
+        return self.idle_loop.frame(current_time)
+
+    def _poll_idle_loop(self):
+        """Запускает рендер петли в фоне; True, когда она готова для текущей раскладки"""
+        pending = self.idle_loop_pending
+        if pending is None or pending[1] is not self.layout:
+            color = [round(c) for c in self.current_colors]
+            self.idle_loop_pending = (shared_executor().submit(self._idle_loop, self.layout, color), self.layout)
+            return False
+        future = pending[0]
+        # None: не получилось, до смены цвета или раскладки остаётся живой рендер
+        if future is None or not future.done():
+            return False
+        if future.exception() is not None:
+            logger.error(f"Не удалось построить петлю из кэша: {future.exception()}")
+            self.idle_loop_pending = (None, self.layout)
+            return False
+        self.idle_loop_pending = None
+        self.idle_loop = future.result()
+        logger.info(f"Петля из кэша: {len(self.idle_loop)} кадров")
+        return True
+
+    def _switch_scene(self, scene, current_time, time_since_change):
+        """Переход начинается с этого кадра и не блокирует цикл; None - затемнение и передача лент пресету"""
+        if scene is None:
+            logger.info(f"Время с прошлого обновления большое, гашу ленты и включаю пресет: {time_since_change}")
+        elif scene == "idle":
+            logger.info(f"Время с прошлого обновления большое, перехожу на петлю из кэша: {time_since_change}")
+            self.idle_loop = None  # петля в текущем цвете
+            self.idle_loop_pending = None
+        else:
+            logger.info(f"Начала меняться амплитуда, включаю живой рендер")
+        if scene is not None and self.audio_leds_stopped:
+            # Отправители запускаются в фоне, ленты получают кадры по мере готовности, сцена проявляется из чёрного
+            self.start_audio_leds_threaded()
+            self.audio_leds_stopped = False
+        self.scenes.switch(scene, current_time)
+
+    def _send_frame(self, frame, source=None):
+        """source раскладывает кадр по лентам (strip_bytes, in): раскладка куба или записанное шоу"""
+        source = source if source is not None else self.layout
+        power = self.power if source is self.layout else self.player_power
+        if power is not None:
+            frame = power.apply(frame)
+        if self.recorder is not None and source is self.layout:
+            self.recorder.write(frame, time.time())
+        ready = [wled for wled in self.audio_leds
+                 if wled.is_available() and wled.dmx.running and wled in source and strip_mode(wled) == PIXELS]
+        if self.congestion is not None:
+            ready = self._apply_congestion(ready)
+        if self.frame_sync is not None:
+            errors = self.frame_sync.send_frame({wled.dmx: self._strip_payload(wled, source, frame) for wled in ready})
+            for dmx, e in errors.items():
+                logger.error(f"Ошибка отправки кадра на {dmx.wled}: {e}")
+                dmx.wled.breaker.record_failure()
+            return
+        if self.latency is not None:
+            self._send_compensated(frame, source, ready)
+            return
+        # set_data только раскладывает данные по буферам sACN, пул потоков тут не нужен
+        for wled in ready:
+            self._set_strip(wled, self._strip_payload(wled, source, frame))
+        self._flush_batch()
+
+    def _flush_batch(self):
+        """Пакеты, поставленные в очередь set_data этого тика, уходят одним sendmmsg"""
+        if not config.WLED_BATCH_SEND:
+            return
+        try:
+            shared_batch().flush()
+        except OSError as e:
+            # Остальные пакеты уже ушли по одному, кадр потерян только для недоступной ленты
+            logger.error(f"Ошибка пакетной отправки кадра: {e}")
+
+    def _strip_payload(self, wled, source, frame):
+        grouping = wled.dmx.grouping
+        if grouping == 1:
+            return source.strip_bytes(wled, frame)
+        # Лента сама повторяет каждый пиксель grouping раз, шлём только каждый grouping-й
+        return source.strip_data(wled, frame).reshape(-1, 3)[::grouping].tobytes()
+
+    def _apply_congestion(self, ready):
+        """Ленты, которым пора слать кадр при их частоте, с настройками контроллера перегрузки"""
+        now = time.monotonic()
+        due = []
+        for wled in ready:
+            if not self.congestion.due(wled, now):
+                continue
+            control = self.congestion.control(wled)
+            if control.grouping != wled.dmx.grouping:
+                self._regroup(wled, control.grouping, control.fps)
+            if hasattr(wled.dmx.backend, "delta"):
+                wled.dmx.backend.delta = control.delta
+            due.append(wled)
+        return due
+
+    def _regroup(self, wled, grouping, fps):
+        """Лента перегружена, её HTTP-ответ может идти долго: цикл рендера его не ждёт"""
+        pending = self._regrouping.get(id(wled))
+        if pending is None:
+            future = shared_executor().submit(wled.post_json_state, {"seg": [{"id": 0, "grp": grouping}]})
+            self._regrouping[id(wled)] = (future, grouping)
+            self._regrouped.add(id(wled))
+            return
+        future, grouping = pending
+        if not future.done():
+            return
+        del self._regrouping[id(wled)]
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Не удалось сменить группировку на {wled}: {error}")
+            wled.breaker.record_failure()
+            return
+        # Лента уже повторяет пиксели, переключаем свой вывод; если контроллер тем временем передумал,
+        # следующий кадр отправит новый запрос
+        wled.dmx.set_grouping(grouping, configure_device=False)
+        logger.info(f"Группировка светодиодов {wled}: {grouping}, {fps:.0f} кадров/с")
+
+    def _reset_grouping(self, wled, configure_device=True):
+        """Поток ленты остановлен или запускается заново: grp 1 и контроллер перегрузки с нуля"""
+        pending = self._regrouping.pop(id(wled), None)
+        if self.congestion is not None:
+            self.congestion.reset(wled)
+        if configure_device and id(wled) in self._regrouped:
+            if pending is not None:
+                wait([pending[0]], timeout=config.WLED_BULK_TIMEOUT)  # запрос из пула не должен прийти позже сброса
+            try:
+                wled.post_json_state({"seg": [{"id": 0, "grp": 1}]})
+                self._regrouped.discard(id(wled))
+            except Exception as e:
+                logger.error(f"Не удалось сбросить группировку на {wled}: {e}")
+        wled.dmx.set_grouping(1, configure_device=False)
+
+    def _set_strip(self, wled, data):
+        try:
+            wled.dmx.set_data(data)
+        except Exception as e:
+            logger.error(f"Ошибка отправки кадра на {wled}: {e}")
+            wled.breaker.record_failure()
+
+    def _send_compensated(self, frame, source, ready):
+        # Кадр ложится в кольцо; лента с задержкой k кадров + r секунд получает кадр k тиков назад, через r от начала тика
+        self.latency.push(frame)
+        for offset, back, wled in self.latency.schedule(ready, self.tick_interval):
+            delayed = self.latency.frame(back)
+            if delayed is None:
+                continue
+            pause = self.tick_start + offset - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            self._set_strip(wled, self._strip_payload(wled, source, delayed))
+            self._flush_batch()
+
+    def _update_parametric(self, current_time):
+        strips = [wled for wled in self.audio_leds if wled.is_available() and strip_mode(wled) == PARAMETRIC]
+        if not strips:
+            return
+        level = min(1.0, self.last_amplitude / MAX_AMP)
+        errors = self.parametric.update(strips, self.current_colors, level, current_time)
+        for wled, e in errors.items():
+            logger.error(f"Ошибка отправки параметров эффекта на {wled}: {e}")
+            wled.breaker.record_failure()
+
     def turn_motion_wled(self, timeout):
-        self.motion_wled.post_json_state(MOTION_PRESET)
-        logger.info("Включили ленту движения")
-        
-        def turn_off():
-            time.sleep(timeout)
-            self.motion_wled.post_json_state({"bri": 1})
-            logger.info("Выключили ленту движения")
-        
-        Thread(target=turn_off, daemon=True).start()
+        """Не блокирует: запросы уходят из общего пула, лента сама плавно переходит (transition пресета)"""
+        with self.motion_lock:
+            # Повторное движение продлевает свечение, а не добавляет ещё одно выключение
+            if self.motion_off_timer is not None:
+                self.motion_off_timer.cancel()
+            off_state = {"bri": 1, "transition": MOTION_PRESET["transition"]}
+            self.motion_off_timer = Timer(timeout, self._post_motion_state, args=(off_state, "Выключили ленту движения"))
+            self.motion_off_timer.daemon = True
+            self.motion_off_timer.start()
+        shared_executor().submit(self._post_motion_state, MOTION_PRESET, "Включили ленту движения")
+
+    def _post_motion_state(self, state, message):
+        try:
+            self.motion_wled.post_json_state(state)
+            logger.info(message)
+        except Exception as e:
+            logger.error(f"Не удалось изменить ленту движения: {e}")
 
     def _init_audio_leds(self):
         logger.info("Инициализация WLED устройств...")
-        # wled1 = Wled.from_one_ip("192.168.8.40")
-        # wled2 = Wled.from_one_ip("192.168.8.41")
         
-        self.audio_leds = [Wled.from_one_ip("192.168.8.40"), Wled.from_one_ip("192.168.8.41")]
-        # self.audio_leds.append(Wled.from_one_ip("192.168.8.40"))
-        # self.audio_leds.append(Wled.from_one_ip("192.168.8.41"))
+        self.audio_leds = self._connect_all(AUDIO_WLED_IPS)
+        if self.time_sync is not None:
+            for wled in self.audio_leds:
+                self.time_sync.watch(wled)
+            self.time_sync.start()
         
         logger.info(f"Количество внутренних лент лент: {self.audio_leds}")
         self.start_and_wait()
-        
-        n_leds = self.audio_leds[0].dmx.n_leds
     
         try:
             while True:
-                current_time = time.time()
-                time_since_change = current_time - self.amplitude_change_time
-                self._update_color_transition()
-                dmx_data = self._generate_amplitude_animation(n_leds, current_time)
-                
-                if time_since_change > PRESET_THRESHOLD:
-                    if not self.audio_leds_stopped:
-                        logger.info(f"Время с прошлого обновления большое, включаю пресет: {time_since_change}")
-                        self.stop_and_wait()
-                        self.audio_leds_stopped = True
-                else:
-                    if self.audio_leds_stopped:
-                        self.start_and_wait()
-                        self.audio_leds_stopped = False
-                        logger.info(f"Начала меняться амплитуда, включаю контроль лент")
-
-                    with ThreadPoolExecutor() as executor:
-                        futures = [
-                            executor.submit(wled.dmx.set_data, dmx_data)
-                            for wled in self.audio_leds
-                        ]
-                    
-                
-                time.sleep(0.06)
-        except Exception as e:
-            logger.error(f"Ошибка в работе лент: {e}")
-            self.stop()
+                self._start_tick()
+                try:
+                    self._tick()
+                    self.frame_errors = 0
+                except Exception as e:
+                    # Сбой одного кадра (ферма, отправка) не останавливает вывод: следующий тик пробует снова
+                    self.frame_errors += 1
+                    if self.frame_errors == 1 or self.frame_errors % 100 == 0:
+                        logger.error(f"Ошибка кадра ({self.frame_errors} подряд): {e}")
+                self._wait_frame()
         finally:
             self.stop_audio_leds_threaded()
 
+    def _tick(self):
+        current_time = time.time()
+        time_since_change = current_time - self.amplitude_change_time
+        self._update_color_transition()
+        if self.layout is None or self.layout_stale.is_set():
+            self.layout_stale.clear()
+            self._build_layout()
+        if self.player is not None:
+            # Записанное шоу: кадры берутся из файла, рендер не нужен
+            frame = self.player.frame(current_time)
+            if frame is not None:
+                self._send_frame(frame, self.player.show)
+            return
+        idle = time_since_change > PRESET_THRESHOLD
+        # Без звука: петля из кэша (без рендера) или затемнение и пресет на самих лентах
+        scene = "live" if not idle else ("idle" if config.IDLE_MODE == "cache" else None)
+        if scene != self.scenes.current:
+            self._switch_scene(scene, current_time, time_since_change)
+
+        if not self.audio_leds_stopped:
+            if scene is None and self.scenes.settled(current_time):
+                # Затемнение закончилось: отдаём ленты пресету
+                self.stop_audio_leds_threaded()
+                self.audio_leds_stopped = True
+            else:
+                self._send_frame(self.scenes.render(current_time))
+                self._update_parametric(current_time)
+
+
+    def _start_tick(self):
+        # Записанное шоу идёт с полной частотой, живой рендер в тишине реже
+        self.tick_start = time.monotonic()
+        full_rate = self.audio_active or self.player is not None
+        self.tick_interval = FRAME_INTERVAL if full_rate else config.ACTIVITY_IDLE_INTERVAL
+
+    def _wait_frame(self):
+        # До конца тика от его начала: время рендера и паузы компенсации задержки уже входят в интервал
+        remaining = self.tick_start + self.tick_interval - time.monotonic()
+        if remaining <= 0 or self.activity_wake.wait(remaining):
+            self.activity_wake.clear()
+
+    def set_audio_activity(self, active, t=None):
+        """Слушатель ActivityGate: вызывается из аудио потока при смене состояния"""
+        self.audio_active = active
+        if active:
+            logger.info("Звук появился, кадры с полной частотой")
+            self.amplitude_change_time = time.time()
+            self.activity_wake.set()
+        else:
+            logger.info(f"Тишина, кадры раз в {config.ACTIVITY_IDLE_INTERVAL} с")
+
+    def set_audio_features(self, features):
+        """Признаки всех каналов за блок (audio/features.py): уровни каналов 0..1 ведут свои зоны"""
+        if not self.zones:
+            return
+        self.zone_levels = features.levels[self.zone_channels].tolist()
 
     def _update_color_transition(self):
         color_changed = False
@@ -167,25 +608,6 @@ class WLEDController:
             logger.debug("No color change needed")
             
 
-    def _generate_amplitude_animation(self, n_leds, current_time):
-        self.animation_time = current_time
-        sine_wave = generate_sine_wave(n_leds, frequency=2, amplitude=AMP_COEFF)
-        
-        dmx_data = []
-        for led_idx, sine_value in enumerate(sine_wave):
-            phase_offset = (current_time * 2 + led_idx * 0.1) % (2 * math.pi)
-            wave_modifier = (math.sin(phase_offset) * 0.3 + 0.7)
-            
-            rgb = [
-                max(0, min(255, int(self.current_colors[0] * sine_value * wave_modifier))),
-                max(0, min(255, int(self.current_colors[1] * sine_value * wave_modifier))),
-                max(0, min(255, int(self.current_colors[2] * sine_value * wave_modifier)))
-            ]
-            dmx_data.extend(rgb)
-        
-        return dmx_data
-
-    
     def set_audio_gipnojam_from_amplitude(self, amplitude):
         amplitude_change = abs(amplitude - self.last_amplitude)
         if amplitude_change > AMPLITUDE_THRESHOLD:
@@ -193,53 +615,30 @@ class WLEDController:
         
         self.last_amplitude = amplitude
 
-        # color1 = INSIDE_COLORS[round(amplitude / AMP_COUNT)]
-        # if round(amplitude / AMP_COUNT) < 1:
-        #     color2 = INSIDE_COLORS[0]
-        # else:
-        #     color2 = INSIDE_COLORS[min(4, round(amplitude / AMP_COUNT) + 1)]
-        # frac = (amplitude - 10 * (round(amplitude / AMP_COUNT) + 1)) / 5.0 
-        
-        if amplitude <= 20:
-            frac = (amplitude - 20) / 5.0 
-            color1 = INSIDE_COLORS[0]
-            color2 = INSIDE_COLORS[0]
-        elif amplitude <= 30:
-            frac = (amplitude - 30) / 5.0 
-            color1 = INSIDE_COLORS[0]
-            color2 = INSIDE_COLORS[1]
-        elif amplitude <= 50:
-            frac = (amplitude - 50) / 5.0 
-            color1 = INSIDE_COLORS[1]
-            color2 = INSIDE_COLORS[2]
-        elif amplitude <= 70:
-            frac = (amplitude - 70) / 5.0
-            color1 = INSIDE_COLORS[2]
-            color2 = INSIDE_COLORS[3]
-        else:
-            frac = (amplitude - 85) / 5.0 
-            color1 = INSIDE_COLORS[3]
-            color2 = INSIDE_COLORS[4]
-        # else:
-        #     frac = min(1.0, (amplitude - 100) / 5.0)
-        #     color1 = INSIDE_COLORS[4]
-        #     color2 = INSIDE_COLORS[5]
-        
-        self.target_colors = [
-                int(color1[0] + (color2[0] - color1[0]) * frac),
-                int(color1[1] + (color2[1] - color1[1]) * frac),
-                int(color1[2] + (color2[2] - color1[2]) * frac)
-            ]
+        # Один индекс в LUT палитры вместо полос if/elif
+        self.target_colors = self.palette.color(amplitude / MAX_AMP).tolist()
+
+    @staticmethod
+    def make_palette(name, mode="linear"):
+        return Palette(PALETTES[name], mode=mode, size=config.PALETTE_SIZE, name=name)
+
+    def set_palette(self, palette):
+        """Смена палитры на лету: одна замена ссылки, рендер не пересобирается"""
+        self.palette = palette
+        logger.info(f"Палитра: {palette}")
 
     def start_audio_leds_threaded(self):
         def _start_leds():
-            try:
-                for audio_wled in self.audio_leds:
-                    logger.info(f"Лента запущена: {audio_wled.ip},{audio_wled.name}")
-                    audio_wled.dmx.start()
+            for audio_wled in self.audio_leds:
+                if not audio_wled.is_available():
+                    logger.warning(f"Лента пропущена, недоступна: {audio_wled}")
+                    continue
+                try:
+                    self._start_strip(audio_wled)
                     logger.info(f"Лента запущена: {audio_wled}")
-            except Exception as e:
-                logger.error(f"Ошибка при запуске лент: {e}")
+                except Exception as e:
+                    logger.error(f"Ошибка при запуске ленты {audio_wled}: {e}")
+                    audio_wled.breaker.record_failure()
         
         start_thread = Thread(target=_start_leds, daemon=True)
         start_thread.start()
@@ -248,8 +647,12 @@ class WLEDController:
     def stop_audio_leds_threaded(self):
         def _stop_leds():
             try:
+                if self.frame_sync is not None:
+                    # Ленты больше не ждут sync-пакета, потоки sacn снова шлют сами
+                    FrameSync.release(audio_wled.dmx for audio_wled in self.audio_leds)
                 for audio_wled in self.audio_leds:
                     audio_wled.dmx.stop()
+                    self._reset_grouping(audio_wled)
                     logger.info(f"Лента остановлена: {audio_wled}")
             except Exception as e:
                 logger.error(f"Ошибка при остановке лент: {e}")
@@ -267,5 +670,16 @@ class WLEDController:
         thread.join()
 
     def stop(self):
+        self.health.stop()
+        if self.motion_off_timer is not None:
+            self.motion_off_timer.cancel()
+        if self.time_sync is not None:
+            self.time_sync.stop()
+        self.discovery.stop()
+        self.sync_listener.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.farm is not None:
+            self.farm.stop()
         self.stop_audio_leds_threaded()
         
\ No newline at end of file
@@ -0,0 +1,269 @@
+"""
+Zero-HTTP WLED discovery.
+
+WLED nodes periodically broadcast a sys-info packet (IP, name, node type,
+unit id, build) on the sys-info port. WledDiscovery listens for those via
+WledSyncListener and keeps a WledRegistry up to date. The registry is a
+JSON file, so the next start knows every device (and its cached cfg.json)
+without crawling /json/nodes over HTTP.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+import config
+from wled.bulk import shared_executor
+from wled.state_mirror import WledSyncListener
+from wled.udp_codec import SYS_INFO_PURPOSE, SYS_INFO_SIZE, decode_sys_info
+from wled.wled_common_client import Wled, Wleds
+
+logger = logging.getLogger(__name__)
+
+
+def name_key(entry: dict) -> str:
+    return f"{entry.get('name')}#{entry.get('wled_id', 0)}"
+
+
+def device_key(entry: dict) -> str:
+    """
+    Stable registry key. sys-info packets carry no MAC, so the key is the
+    device name plus unit id until the MAC is learned from /json/info.
+    """
+    if entry.get("mac"):
+        return entry["mac"]
+    return name_key(entry)
+
+
+class WledRegistry:
+    """
+    Persistent table of known WLED devices.
+
+    An announcement is matched to a known device by MAC, then by IP (a renamed
+    device keeps its address), then by name and unit id (a device that got a
+    new address keeps its name). One IP belongs to at most one entry.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or config.WLED_REGISTRY_PATH
+        self._entries: Dict[str, dict] = {}
+        self._by_ip: Dict[str, str] = {}
+        self._by_name: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read WLED registry {self.path}: {e}")
+            return
+        with self._lock:
+            self._entries, self._by_ip, self._by_name = {}, {}, {}
+            for entry in entries:
+                self._put(entry)
+        logger.info(f"Loaded {len(self._entries)} WLED devices from {self.path}")
+
+    def save(self, force: bool = False):
+        """Atomically write the registry if anything changed since the last save"""
+        if not (self.dirty or force):
+            return
+        with self._lock:
+            data = json.dumps(list(self._entries.values()), separators=(',', ':'))
+            self.dirty = False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def update(self, ip: str, info: dict, now: Optional[float] = None) -> bool:
+        """
+        Merge one device announcement. Returns True if anything but last_seen changed.
+        The cached cfg is dropped when the firmware build changes.
+        """
+        now = now or time.time()
+        fields = {k: info[k] for k in ("name", "node_type", "wled_id", "build", "mac") if info.get(k) is not None}
+        fields["ip"] = ip
+        with self._lock:
+            key = self._find(ip, fields)
+            entry = self._entries.get(key, {})
+            changed = any(entry.get(k) != v for k, v in fields.items())
+            if changed:
+                if entry.get("build") is not None and entry.get("build") != fields.get("build", entry["build"]):
+                    entry.pop("cfg", None)
+                if key is not None:
+                    self._drop(key)
+                entry.update(fields)
+                self._put(entry)
+                self.dirty = True
+            entry["last_seen"] = now
+        return changed
+
+    def _find(self, ip: str, fields: dict) -> Optional[str]:
+        """Key of the known device an announcement belongs to, None for a new one"""
+        if fields.get("mac") in self._entries:
+            return fields["mac"]
+        key = self._by_ip.get(ip)
+        if key is not None and not (fields.get("mac") and self._entries[key].get("mac")):
+            return key
+        return self._by_name.get(name_key(fields))
+
+    def _put(self, entry: dict):
+        """Index entry under its current key; a stale owner of its IP is dropped"""
+        key = device_key(entry)
+        if key in self._entries:
+            self._drop(key)
+        stale = self._by_ip.get(entry["ip"])
+        if stale is not None:
+            # Two devices cannot share an address: the other one moved and will announce itself again
+            logger.info(f"WLED {self._entries[stale].get('name')} no longer at {entry['ip']}, dropped")
+            self._drop(stale)
+        self._entries[key] = entry
+        self._by_ip[entry["ip"]] = key
+        self._by_name[name_key(entry)] = key
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if self._by_ip.get(entry.get("ip")) == key:
+            del self._by_ip[entry["ip"]]
+        if self._by_name.get(name_key(entry)) == key:
+            del self._by_name[name_key(entry)]
+
+    def remember(self, wled: Wled, mac: Optional[str] = None):
+        """Store what a fully initialized Wled already knows (name, cfg, MAC)"""
+        info = {"name": wled.name, "mac": mac}
+        if wled.cfg:
+            info["cfg"] = wled.cfg
+        with self._lock:
+            key = self._by_ip.get(wled.ip)
+            entry = self._entries[key] if key else {"ip": wled.ip, "last_seen": time.time()}
+            if key:
+                self._drop(key)
+            entry.update({k: v for k, v in info.items() if v is not None})
+            self._put(entry)
+            self.dirty = True
+
+    def get_by_ip(self, ip: str) -> Optional[dict]:
+        key = self._by_ip.get(ip)
+        return self._entries.get(key) if key else None
+
+    def entries(self, max_age: Optional[float] = None) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            return [
+                dict(e) for e in self._entries.values()
+                if max_age is None or now - e.get("last_seen", 0) < max_age
+            ]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def to_wled(entry: dict) -> Wled:
+        """Wled object of one registry entry, without any HTTP requests"""
+        w = Wled(entry["ip"])
+        w.name = entry.get("name")
+        w.mac = entry.get("mac")
+        w.cfg = entry.get("cfg")
+        w.udp_port = w.cfg["if"]["sync"]["port0"] if w.cfg else config.WLED_PORT
+        return w
+
+    def to_wleds(self, max_age: Optional[float] = None) -> Wleds:
+        """Build Wled objects from the registry without any HTTP requests"""
+        return Wleds(wleds=[self.to_wled(entry) for entry in self.entries(max_age)]).sort()
+
+    def fetch_missing_cfgs(self, wleds: Optional[Wleds] = None):
+        """Fetch cfg.json (in parallel, on the shared WLED pool) only for devices that have no cached cfg"""
+        wleds = wleds if wleds is not None else self.to_wleds()
+        missing = [w for w in wleds if w.cfg is None]
+        if not missing:
+            return wleds
+
+        def _fetch(w):
+            try:
+                w.get_cfg()
+                w.udp_port = w.cfg["if"]["sync"]["port0"]
+                self.remember(w)
+            except Exception as e:
+                logger.warning(f"Could not fetch cfg of {w}: {e}")
+
+        list(shared_executor().map(_fetch, missing))
+        self.save()
+        return wleds
+
+
+class WledDiscovery:
+    """
+    Keeps a WledRegistry updated from sys-info broadcasts.
+    Uses an existing WledSyncListener if given, otherwise starts its own.
+    """
+
+    def __init__(self, registry: Optional[WledRegistry] = None, listener: Optional[WledSyncListener] = None,
+                 save_interval: float = 10.0):
+        self.registry = registry if registry is not None else WledRegistry()
+        self._own_listener = listener is None
+        self.listener = listener if listener is not None else WledSyncListener(ports=[config.WLED_INFO_PORT])
+        self.listener.add_packet_handler(self._on_packet)
+        self.save_interval = save_interval
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _on_packet(self, ip: str, data):
+        if len(data) < SYS_INFO_SIZE or data[0] != SYS_INFO_PURPOSE or data[1] != 1:
+            return
+        info = decode_sys_info(bytes(data[:SYS_INFO_SIZE]))
+        node_ip = ".".join(str(b) for b in info["ip"]) if any(info["ip"]) else ip
+        if self.registry.update(node_ip, info):
+            logger.info(f"WLED discovered/updated: {info['name']} at {node_ip} ({info['node_type']}, build {info['build']})")
+
+    def announce(self, name: str = "windy_cube"):
+        """
+        Broadcast a sys-info packet for this controller to config.WLED_DISCOVERY_IP,
+        so it shows up in the WLED nodes list. Nodes announce themselves on their own
+        schedule, this does not make them answer.
+        """
+        packet = bytearray(SYS_INFO_SIZE)
+        packet[0], packet[1] = SYS_INFO_PURPOSE, 1
+        packet[6:6 + 32] = name.encode("utf-8")[:32].ljust(32, b"\0")
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            sock.sendto(packet, (config.WLED_DISCOVERY_IP, config.WLED_INFO_PORT))
+        finally:
+            sock.close()
+
+    def _save_loop(self):
+        while self._running:
+            time.sleep(self.save_interval)
+            try:
+                self.registry.save()
+            except OSError as e:
+                logger.error(f"Could not save WLED registry: {e}")
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        if self._own_listener:
+            self.listener.start()
+        self._thread = threading.Thread(target=self._save_loop, daemon=True, name="WledDiscovery")
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._own_listener:
+            self.listener.stop()
+        self.registry.save()
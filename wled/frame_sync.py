@@ -0,0 +1,139 @@
+"""
+Frame-synchronized sACN output across strips (E1.31 universe synchronization).
+
+Normally every WledDMX sender thread pushes its universes on its own tick, so
+strips show a new frame at slightly different moments. FrameSync switches the
+senders to manual flush and sends one frame on the caller's thread: first the
+data packets of every universe of every strip, all carrying the sync
+universe address, then a single sync packet that makes the receivers latch
+the frame together. The sync packet sequence is the frame number (mod 256).
+
+sacn has no public API for this, so FrameSync reaches into the sender
+internals of the pinned sacn version (requirements.txt). All of those
+accesses go through _SacnInternals, which fails with a clear error on a sacn
+release that changed them.
+"""
+
+import logging
+import time
+from importlib.metadata import version
+from typing import Dict, Iterable, List, Optional
+
+from sacn.messages.data_packet import calculate_multicast_addr
+from sacn.messages.sync_packet import SyncPacket
+
+import config
+
+logger = logging.getLogger(__name__)
+
+E131_DATA = "data"
+E131_SYNC = "sync"
+E131_DATA_OFFSET = 126  # first DMX slot in a data packet
+SACN_VERSION = "1.11.0"  # the version whose internals _SacnInternals uses, as pinned in requirements.txt
+
+
+class _SacnInternals:
+    """The only place that touches private sacn attributes"""
+
+    @staticmethod
+    def _fail(what: str, e: Exception):
+        raise RuntimeError(f"FrameSync needs sacn {SACN_VERSION} internals ({what}), "
+                           f"installed sacn is {version('sacn')}: {e}") from e
+
+    @classmethod
+    def handler(cls, dmx):
+        """The SenderHandler of a strip's sACNsender: socket, source CID and send_out()"""
+        if dmx.sender is None:
+            raise RuntimeError(f"{dmx.wled} has no sACN sender (backend {dmx.backend_name}, batched or stopped)")
+        try:
+            return dmx.sender._sender_handler
+        except AttributeError as e:
+            cls._fail("sACNsender._sender_handler", e)
+
+    @classmethod
+    def cid(cls, handler):
+        try:
+            return handler._CID
+        except AttributeError as e:
+            cls._fail("SenderHandler._CID", e)
+
+    @classmethod
+    def set_sync_addr(cls, output, sync_universe: int):
+        try:
+            output._packet.syncAddr = sync_universe
+        except AttributeError as e:
+            cls._fail("Output._packet.syncAddr", e)
+
+
+def parse_e131(data) -> Optional[dict]:
+    """Minimal E1.31 decoder for measurements: kind, universe, sequence and sync address"""
+    if len(data) < 49 or bytes(data[4:16]) != b"ASC-E1.17\x00\x00\x00":
+        return None
+    root_vector = int.from_bytes(data[18:22], "big")
+    if root_vector == 0x04 and len(data) >= E131_DATA_OFFSET:
+        return {"kind": E131_DATA, "universe": int.from_bytes(data[113:115], "big"), "sequence": data[111],
+                "sync_addr": int.from_bytes(data[109:111], "big")}
+    if root_vector == 0x08 and int.from_bytes(data[40:44], "big") == 0x01:
+        return {"kind": E131_SYNC, "universe": None, "sequence": data[44],
+                "sync_addr": int.from_bytes(data[45:47], "big")}
+    return None
+
+
+class FrameSync:
+    def __init__(self, sync_universe: int = config.E131_SYNC_UNIVERSE, unicast: bool = True):
+        """
+        Args:
+            sync_universe: universe address used for synchronization
+            unicast: send the sync packet to every destination IP instead of the sync
+                universe multicast group (for unicast setups where multicast is not routed)
+        """
+        self.sync_universe = sync_universe
+        self.unicast = unicast
+        self.seq = 0
+        self.last_send_time = 0.0
+
+    def send_frame(self, frame: Dict, now: Optional[float] = None) -> Dict:
+        """
+        Send one frame: {WledDMX: data} with data as accepted by WledDMX.set_data.
+        Returns {WledDMX: exception} for strips that could not be sent; the others are latched.
+        """
+        now = now or time.time()
+        started = time.perf_counter()
+        self.seq += 1
+        errors = {}
+        sent: List = []
+        for dmx, data in frame.items():
+            try:
+                handler = _SacnInternals.handler(dmx)
+                dmx.sender.manual_flush = True
+                dmx.set_data(data)
+                for output in dmx.get_senders():
+                    _SacnInternals.set_sync_addr(output, self.sync_universe)
+                    handler.send_out(output, now)
+                sent.append(dmx)
+            except Exception as e:
+                errors[dmx] = e
+        if sent:
+            self._send_sync(sent)
+        self.last_send_time = time.perf_counter() - started
+        return errors
+
+    def _send_sync(self, dmxs: List):
+        handler = _SacnInternals.handler(dmxs[0])
+        packet = SyncPacket(cid=_SacnInternals.cid(handler), syncAddr=self.sync_universe, sequence=self.seq & 0xFF)
+        socket = handler.socket
+        if not self.unicast:
+            socket.send_multicast(packet, calculate_multicast_addr(self.sync_universe), 255)
+            return
+        for ip in dict.fromkeys(dmx.wled.ip for dmx in dmxs):
+            socket.send_unicast(packet, ip)
+
+    @staticmethod
+    def release(dmxs: Iterable):
+        """Hand the strips back to their sender threads (receivers stop waiting for sync packets)"""
+        for dmx in dmxs:
+            if dmx.sender is None:
+                continue
+            for output in dmx.get_senders():
+                _SacnInternals.set_sync_addr(output, 0)
+            dmx.sender.manual_flush = False
@@ -0,0 +1,233 @@
+"""
+Background health monitor for WLED controllers.
+
+Each round a device is considered alive for free if the state mirror saw a
+UDP packet from it recently; otherwise it gets a short HTTP probe over a
+pooled connection. Probe outcomes drive a per-device state (up, degraded,
+down) and the device's CircuitBreaker: a device that is down is tripped,
+so callers skip it instantly, and it is re-admitted on the first good probe.
+With an on_rtt or on_probe consumer every device is probed over HTTP, since
+a broadcast packet says the device is alive but carries no round trip.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+logger = logging.getLogger(__name__)
+
+UP = "up"
+DEGRADED = "degraded"
+DOWN = "down"
+
+HealthCallback = Callable[[object, str, str], None]
+
+
+class DeviceHealth:
+    """Probe statistics of one device"""
+
+    def __init__(self):
+        self.state = UP
+        self.rtt: Optional[float] = None  # EWMA of probe round trips, seconds
+        self.last_ok = 0.0
+        self.consecutive_failures = 0
+        self.probes = 0
+        self.failures = 0
+
+    def as_dict(self) -> dict:
+        return {
+            'state': self.state,
+            'rtt_ms': round(self.rtt * 1000, 1) if self.rtt is not None else None,
+            'last_ok': self.last_ok,
+            'consecutive_failures': self.consecutive_failures,
+            'probes': self.probes,
+            'failures': self.failures,
+        }
+
+
+class HealthMonitor:
+    """
+    Periodically probes devices and keeps their circuit breakers in line with reality.
+    on_change(wled, old_state, new_state) is called from the monitor thread.
+    """
+
+    def __init__(
+        self,
+        wleds: Iterable = (),
+        mirror=None,
+        interval: float = config.WLED_HEALTH_INTERVAL,
+        probe_timeout: float = config.WLED_HEALTH_PROBE_TIMEOUT,
+        down_after: int = 2,
+        degraded_rtt: float = 0.25,
+        on_change: Optional[HealthCallback] = None,
+        on_rtt: Optional[Callable[[object, float], None]] = None,
+        on_probe: Optional[Callable[[object, bool, Optional[float]], None]] = None
+    ):
+        """
+        Args:
+            wleds: devices to watch (more can be added with watch())
+            mirror: WledStateMirror; fresh UDP packets count as a successful probe
+            interval: seconds between probe rounds
+            probe_timeout: HTTP timeout of one probe
+            down_after: consecutive failed probes before a device is marked down
+            degraded_rtt: probe RTT above which a device is marked degraded
+            on_change: callback for state transitions
+            on_rtt: on_rtt(wled, rtt) for every successful probe, e.g. a latency estimator
+            on_probe: on_probe(wled, ok, rtt) for every probe outcome, e.g. a congestion controller
+        """
+        self.mirror = mirror
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.down_after = down_after
+        self.degraded_rtt = degraded_rtt
+        self.on_change = on_change
+        self.on_rtt = on_rtt
+        self.on_probe = on_probe
+
+        self._wleds: List = []
+        self._health: Dict[int, DeviceHealth] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=64, pool_maxsize=4, max_retries=0)
+        self.session.mount("http://", adapter)
+
+        for wled in wleds:
+            self.watch(wled)
+
+    def watch(self, wled):
+        with self._lock:
+            if id(wled) not in self._health:
+                self._wleds.append(wled)
+                self._health[id(wled)] = DeviceHealth()
+
+    def unwatch(self, wled):
+        with self._lock:
+            if id(wled) in self._health:
+                self._wleds.remove(wled)
+                del self._health[id(wled)]
+
+    def health(self, wled) -> Optional[DeviceHealth]:
+        return self._health.get(id(wled))
+
+    def state(self, wled) -> str:
+        health = self._health.get(id(wled))
+        return health.state if health else UP
+
+    def is_up(self, wled) -> bool:
+        return self.state(wled) != DOWN
+
+    def status(self) -> Dict[str, dict]:
+        with self._lock:
+            return {str(w): self._health[id(w)].as_dict() for w in self._wleds}
+
+    # Probing
+    def _probe(self, wled) -> float:
+        """One HTTP round trip; returns the RTT or raises"""
+        start = time.monotonic()
+        response = self.session.get(wled.json_info_endpoint(), timeout=self.probe_timeout)
+        response.raise_for_status()
+        rtt = time.monotonic() - start
+        if getattr(wled, "mac", None) is None:
+            wled.mac = response.json().get("mac")
+        return rtt
+
+    def _recently_heard(self, wled) -> bool:
+        if self.mirror is None:
+            return False
+        state = self.mirror.get(wled.ip)
+        return state is not None and state.is_alive(timeout=2 * self.interval)
+
+    def check_all(self):
+        """Run one probe round (blocking, bounded by probe_timeout)"""
+        with self._lock:
+            wleds = list(self._wleds)
+        to_probe = []
+        for wled in wleds:
+            if self._recently_heard(wled) and self.on_rtt is None and self.on_probe is None:
+                self._record(wled, ok=True)
+            else:
+                to_probe.append(wled)
+        if not to_probe:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="wled-health")
+        futures = {self._executor.submit(self._probe, w): w for w in to_probe}
+        done, not_done = wait(futures, timeout=self.probe_timeout + 0.5)
+        for future in done:
+            error = future.exception()
+            self._record(futures[future], ok=error is None, rtt=future.result() if error is None else None)
+        for future in not_done:
+            self._record(futures[future], ok=False)
+
+    def _record(self, wled, ok: bool, rtt: Optional[float] = None):
+        health = self._health.get(id(wled))
+        if health is None:
+            return
+        health.probes += 1
+        if self.on_probe:
+            self.on_probe(wled, ok, rtt)
+        if ok:
+            health.consecutive_failures = 0
+            health.last_ok = time.time()
+            if rtt is not None:
+                health.rtt = rtt if health.rtt is None else 0.8 * health.rtt + 0.2 * rtt
+                if self.on_rtt:
+                    self.on_rtt(wled, rtt)
+            new_state = DEGRADED if health.rtt is not None and health.rtt > self.degraded_rtt else UP
+        else:
+            health.failures += 1
+            health.consecutive_failures += 1
+            new_state = DOWN if health.consecutive_failures >= self.down_after else DEGRADED
+
+        breaker = getattr(wled, "breaker", None)
+        if breaker is not None:
+            if new_state == DOWN:
+                breaker.trip()
+            elif ok:
+                breaker.record_success()
+
+        old_state = health.state
+        if new_state != old_state:
+            health.state = new_state
+            logger.info(f"{wled}: {old_state} -> {new_state}")
+            if self.on_change:
+                try:
+                    self.on_change(wled, old_state, new_state)
+                except Exception as e:
+                    logger.error(f"Error in health callback for {wled}: {e}")
+
+    def _run(self):
+        while self._running:
+            started = time.monotonic()
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.error(f"Error in health monitor: {e}")
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="WledHealthMonitor")
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=self.interval + self.probe_timeout + 1)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
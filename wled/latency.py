@@ -0,0 +1,123 @@
+"""
+Network latency compensation for streamed frames.
+
+Every device gets an RttEstimator (smoothed RTT and variation as in TCP,
+RFC 6298), fed by health probe round trips. The one-way delay of a device is
+taken as srtt / 2; the slowest device sets the pace and every faster one gets
+each frame later by the difference, so all strips show it at the same moment.
+
+A delay of d seconds at frame interval T is split into whole frames k and a
+remainder r: at each tick the device is sent the frame from k ticks ago, r
+seconds into the tick. T is the interval the loop actually runs at, so k
+follows it when the frame rate drops in silence. Past frames come from a DelayLine, a preallocated
+ring of frame buffers, so the compensation allocates nothing per frame.
+"""
+
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class RttEstimator:
+    """Smoothed round trip time of one device, RFC 6298 style"""
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+
+    def __init__(self):
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.samples = 0
+
+    def update(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.samples += 1
+
+    @property
+    def one_way(self) -> Optional[float]:
+        return self.srtt / 2 if self.srtt is not None else None
+
+
+class DelayLine:
+    """The last `slots` frames in a preallocated ring; back(k) is the frame pushed k pushes ago"""
+
+    def __init__(self, frame_size: int, slots: int):
+        self.frames = np.zeros((slots, frame_size), dtype=np.uint8)
+        self.slots = slots
+        self._head = -1
+        self._count = 0
+
+    @property
+    def frame_size(self) -> int:
+        return self.frames.shape[1]
+
+    def push(self, frame: np.ndarray):
+        self._head = (self._head + 1) % self.slots
+        self.frames[self._head] = frame
+        self._count = min(self._count + 1, self.slots)
+
+    def back(self, k: int) -> Optional[np.ndarray]:
+        if k >= self._count:
+            return None
+        return self.frames[(self._head - k) % self.slots]
+
+
+class LatencyCompensator:
+    """Per-device transmit delays from RTT estimates, and the delay line they read from"""
+
+    def __init__(self, frame_interval: float, max_delay: float = 0.25):
+        """
+        Args:
+            frame_interval: seconds between frames
+            max_delay: largest compensation applied to a device, seconds
+        """
+        self.frame_interval = frame_interval
+        self.max_delay = max_delay
+        self.slots = math.ceil(max_delay / frame_interval) + 1
+        self.line: Optional[DelayLine] = None
+        self._estimators: Dict[int, RttEstimator] = {}
+        self._lock = threading.Lock()
+
+    def estimator(self, wled) -> RttEstimator:
+        with self._lock:
+            estimator = self._estimators.get(id(wled))
+            if estimator is None:
+                estimator = self._estimators[id(wled)] = RttEstimator()
+            return estimator
+
+    def record(self, wled, rtt: float):
+        """An RTT sample of wled, e.g. from a health probe"""
+        self.estimator(wled).update(rtt)
+
+    def delays(self, wleds: Iterable) -> Dict[object, float]:
+        """Transmit delay of each device; devices without an estimate are not delayed"""
+        one_way = {wled: self.estimator(wled).one_way for wled in wleds}
+        known = [d for d in one_way.values() if d is not None]
+        slowest = max(known, default=0.0)
+        return {wled: min(self.max_delay, slowest - d) if d is not None else 0.0 for wled, d in one_way.items()}
+
+    def schedule(self, wleds: Iterable, frame_interval: Optional[float] = None) -> List[Tuple[float, int, object]]:
+        """(offset into the tick, frames back, wled) for every device, by offset; frame_interval: of this tick"""
+        interval = frame_interval or self.frame_interval
+        plan = []
+        for wled, delay in self.delays(wleds).items():
+            k, remainder = divmod(delay, interval)
+            plan.append((remainder, int(k), wled))
+        plan.sort(key=lambda item: item[0])
+        return plan
+
+    def push(self, frame: np.ndarray):
+        """Store the frame of this tick; the ring is (re)allocated only when the frame size changes"""
+        if self.line is None or self.line.frame_size != len(frame):
+            self.line = DelayLine(len(frame), self.slots)
+        self.line.push(frame)
+
+    def frame(self, k: int) -> Optional[np.ndarray]:
+        return self.line.back(k) if self.line is not None else None
@@ -0,0 +1,234 @@
+"""
+Output backends of WledDMX: how a strip's RGB data gets to the device.
+
+    sacn  E1.31 via the sacn library; 170 LEDs per universe, one sender thread per
+          strip resending on its own tick (see WledDMX.SEND_OUT_INTERVAL)
+    ddp   Distributed Display Protocol on UDP 4048; up to 480 RGB pixels per packet
+          behind a 10 byte header, sent on the caller's thread when data is set
+
+A backend is created by WledDMX.start() and gets the WledDMX, whose n_leds is
+already known. It implements start(), set_data(data) and stop().
+
+With a UdpBatch (config.WLED_BATCH_SEND) both backends only register prebuilt
+packets with the batch, patch payloads and sequence numbers in set_data and
+queue the packets of that frame (DDP delta frames only the changed ones);
+nothing is sent until the batch is flushed once per frame.
+"""
+
+import logging
+import socket
+import struct
+from math import ceil
+from typing import Dict, Optional, Type
+
+import uuid
+
+import sacn
+from sacn.messages.data_packet import DataPacket
+
+import config
+from wled.udp_batch import UdpBatch, shared_batch
+
+logger = logging.getLogger(__name__)
+
+DDP_PORT = 4048
+DDP_HEADER = struct.Struct(">BBBBIH")  # flags, sequence, data type, destination id, offset, length
+DDP_MAX_DATA = 1440  # 480 RGB pixels
+DDP_VERSION_1 = 0x40
+DDP_PUSH = 0x01
+DDP_TYPE_RGB24 = 0x0B
+DDP_ID_DISPLAY = 1
+
+E131_PORT = 5568
+E131_HEADER_SIZE = 126  # everything before the DMX slots
+E131_SEQUENCE_OFFSET = 111
+E131_SOURCE_NAME = "windy_cube"
+_E131_CID = tuple(uuid.uuid4().bytes)  # one source id for all batched universes
+
+
+class OutputBackend:
+    name = None
+
+    def __init__(self, dmx, batch: Optional[UdpBatch] = None):
+        self.dmx = dmx
+        self.batch = batch
+        self._packet_ids = []
+
+    def _copy_payloads(self, data, step: int):
+        """Batched set_data: patch every registered packet with its slice of data"""
+        for i, packet_id in enumerate(self._packet_ids):
+            chunk = data[i * step:(i + 1) * step]
+            self.batch.payload(packet_id)[:len(chunk)] = chunk
+
+    @property
+    def n_packets(self) -> int:
+        """Packets per frame"""
+        raise NotImplementedError
+
+    def start(self):
+        raise NotImplementedError
+
+    def get_senders(self) -> list:
+        """The sacn per-universe outputs of a sACNsender; empty for backends that do not use one"""
+        return []
+
+    def set_data(self, data):
+        raise NotImplementedError
+
+    def stop(self):
+        if self.batch is not None:
+            self.batch.remove(self._packet_ids)
+            self._packet_ids = []
+
+
+class SacnOutput(OutputBackend):
+    name = "sacn"
+
+    def __init__(self, dmx, batch: Optional[UdpBatch] = None):
+        super().__init__(dmx, batch)
+        self.sender = None
+
+    @property
+    def n_packets(self) -> int:
+        return self.dmx.n_universes
+
+    def start(self):
+        if self.batch is not None:
+            for universe in range(1, self.dmx.n_universes + 1):
+                packet = DataPacket(cid=_E131_CID, sourceName=E131_SOURCE_NAME, universe=universe)
+                header = bytes(packet.getBytes()[:E131_HEADER_SIZE])
+                self._packet_ids.append(self.batch.add((self.dmx.wled.ip, E131_PORT), header, 512, E131_SEQUENCE_OFFSET))
+            return
+        if self.sender is None:
+            self.sender = sacn.sACNsender(bind_port=self.dmx.bind_port)
+        for i in range(1, self.dmx.n_universes + 1):
+            self.sender.activate_output(i)
+        for sender in self.get_senders():
+            sender.destination = self.dmx.wled.ip
+        self.sender.start()
+
+    def get_senders(self) -> list:
+        if self.sender is None:
+            return []
+        return [self.sender[i] for i in self.sender.get_active_outputs()]
+
+    def set_data(self, data):
+        step = 3 * self.dmx.LEDS_PER_UNIVERSE
+        if self.batch is not None:
+            self._copy_payloads(data, step)
+            for packet_id in self._packet_ids:
+                self.batch.next_seq(packet_id)
+                self.batch.queue(packet_id)
+            return
+        for i, sender in enumerate(self.get_senders()):
+            sender.dmx_data = data[i * step:(i + 1) * step]
+
+    def stop(self):
+        super().stop()
+        if self.sender is not None:
+            self.sender.stop()
+        self.sender = None
+
+
+class DdpOutput(OutputBackend):
+    """
+    Headers of all packets of a frame are built once in one buffer; per frame only the
+    sequence byte is patched and every packet goes out as sendmsg([header, payload slice]),
+    so the pixel data is never copied into a packet buffer.
+
+    With delta set, packets whose pixels did not change since the last frame are skipped
+    (the push packet always goes out), and every keyframe_interval frames all are sent again.
+    """
+
+    name = "ddp"
+
+    def __init__(self, dmx, port: int = DDP_PORT, batch: Optional[UdpBatch] = None):
+        super().__init__(dmx, batch)
+        self.port = port
+        self.sock = None
+        self.packets = 0  # sent so far
+        self.seq = 0
+        self._headers = bytearray()
+        self._parts = []
+        self._delta = False
+        self.keyframe_interval = 30
+        self._previous = bytearray()
+        self._frames = 0
+
+    @property
+    def delta(self) -> bool:
+        """Send only the packets that changed since the previous frame, with a full keyframe every keyframe_interval"""
+        return self._delta
+
+    @delta.setter
+    def delta(self, value: bool):
+        if value and not self._delta:
+            # _previous is not kept up to date without delta: the next frame is a keyframe
+            self._frames = 0
+        self._delta = value
+
+    @property
+    def n_packets(self) -> int:
+        return ceil(3 * self.dmx.n_leds / DDP_MAX_DATA)
+
+    def start(self):
+        n_bytes = 3 * self.dmx.n_leds
+        self._headers = bytearray(DDP_HEADER.size * self.n_packets)
+        headers = memoryview(self._headers)
+        self._parts = []
+        for i, offset in enumerate(range(0, n_bytes, DDP_MAX_DATA)):
+            length = min(DDP_MAX_DATA, n_bytes - offset)
+            flags = DDP_VERSION_1 | (DDP_PUSH if offset + length == n_bytes else 0)
+            DDP_HEADER.pack_into(self._headers, i * DDP_HEADER.size, flags, 0, DDP_TYPE_RGB24, DDP_ID_DISPLAY, offset, length)
+            self._parts.append((headers[i * DDP_HEADER.size:(i + 1) * DDP_HEADER.size], offset, offset + length))
+        self.address = (self.dmx.wled.ip, self.port)
+        self._previous = bytearray(n_bytes)
+        self._frames = 0
+        if self.batch is not None:
+            for header, start, end in self._parts:
+                self._packet_ids.append(self.batch.add(self.address, bytes(header), end - start, seq_offset=1))
+            return
+        if self.sock is None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def set_data(self, data):
+        if not isinstance(data, (bytes, bytearray, memoryview)) and not hasattr(data, "__array_interface__"):
+            data = bytes(data)
+        view = memoryview(data).cast("B")
+        self.seq = self.seq % 15 + 1  # 1..15, 0 means "not used" in DDP
+        if self.batch is None:
+            for i in range(len(self._parts)):
+                self._headers[i * DDP_HEADER.size + 1] = self.seq
+        keyframe = not self.delta or self._frames % self.keyframe_interval == 0
+        self._frames += 1
+        last = len(self._parts) - 1
+        for i, (header, start, end) in enumerate(self._parts):
+            if not keyframe and i != last and self._previous[start:end] == view[start:end]:
+                continue
+            if self.batch is not None:
+                packet_id = self._packet_ids[i]
+                self.batch.payload(packet_id)[:end - start] = view[start:end]
+                self.batch.header(packet_id)[1] = self.seq
+                self.batch.queue(packet_id)
+            else:
+                self.sock.sendmsg([header, view[start:end]], (), 0, self.address)
+            self.packets += 1
+        if self.delta:
+            self._previous[:] = view
+
+    def stop(self):
+        super().stop()
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+
+
+BACKENDS: Dict[str, Type[OutputBackend]] = {backend.name: backend for backend in (SacnOutput, DdpOutput)}
+
+
+def make_output(name: str, dmx) -> OutputBackend:
+    batch = shared_batch() if config.WLED_BATCH_SEND else None
+    try:
+        return BACKENDS[name](dmx, batch=batch)
+    except KeyError:
+        raise ValueError(f"Unknown output backend {name!r}, expected one of {sorted(BACKENDS)}") from None
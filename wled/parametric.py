@@ -0,0 +1,133 @@
+"""
+Parametric sync: drive the effect engine on the strip instead of streaming pixels.
+
+Audio features are mapped to WLED effect parameters (color, palette, speed,
+intensity, brightness) and sent as one 37 byte UDP notifier packet per strip
+(Wled.send_udp_sync_v9), instead of kilobytes of sACN per frame. Every packet
+carries the controller clock as the effect time base, shifted per strip by
+timebase_shift, so the on-device effects of all strips run in phase (or with a
+fixed phase offset).
+
+A packet is only sent when the parameters changed noticeably or the keepalive
+expired. Strips in realtime (sACN/DDP) mode ignore notifier packets, so a
+strip is either streamed or parametric, see strip_mode().
+"""
+
+import logging
+import time
+from typing import Dict, Iterable, Optional, Sequence
+
+import config
+
+logger = logging.getLogger(__name__)
+
+PIXELS = "pixels"
+PARAMETRIC = "parametric"
+MODES = (PIXELS, PARAMETRIC)
+
+
+def strip_mode(wled, modes: Optional[Dict[str, str]] = None, default: Optional[str] = None) -> str:
+    """Output mode of a strip: by WLED name or IP in modes, else the default"""
+    modes = config.WLED_STRIP_MODES if modes is None else modes
+    mode = modes.get(wled.name) or modes.get(wled.ip) or default or config.WLED_STRIP_MODE
+    if mode not in MODES:
+        raise ValueError(f"Unknown strip mode {mode!r} for {wled}, expected one of {MODES}")
+    return mode
+
+
+class ParametricSync:
+    """Maps (color, level) to notifier parameters and keeps the strips in sync"""
+
+    def __init__(self, fx: int = config.PARAMETRIC_FX, palette: int = config.PARAMETRIC_PALETTE,
+                 speed: Sequence[int] = (40, 255), intensity: Sequence[int] = (64, 255),
+                 brightness: Sequence[int] = (config.MIN_BRIGHTNESS, config.MAX_BRIGHTNESS),
+                 transition_ms: int = 200, keepalive: float = 1.0, phase_shifts: Optional[Dict[str, float]] = None,
+                 sync_groups=frozenset({1}), clock=None):
+        """
+        Args:
+            fx, palette: WLED effect and palette index run on the strips
+            speed, intensity, brightness: (min, max) the level 0..1 is mapped onto
+            transition_ms: transition the strip uses to blend to new parameters
+            keepalive: seconds after which unchanged parameters are sent again
+            phase_shifts: WLED name or IP -> timebase shift in ms, for deliberate phase offsets
+            sync_groups: notifier sync groups the strips receive
+            clock: TimeSyncService; adds the one-way delay to the time base and
+                shortens the keepalive so drift stays within its tolerance
+        """
+        self.fx = fx
+        self.palette = palette
+        self.speed = speed
+        self.intensity = intensity
+        self.brightness = brightness
+        self.transition_ms = transition_ms
+        self.keepalive = keepalive
+        self.phase_shifts = phase_shifts or {}
+        self.sync_groups = set(sync_groups)
+        self.clock = clock
+        self._sent: Dict[object, tuple] = {}  # wled -> (params, time) of the last packet
+        self.packets_sent = 0
+
+    @staticmethod
+    def _scale(level: float, bounds: Sequence[int]) -> int:
+        return round(bounds[0] + (bounds[1] - bounds[0]) * min(1.0, max(0.0, level)))
+
+    def params(self, color: Sequence[float], level: float) -> dict:
+        """send_udp_sync_v9 arguments for an RGB color and a loudness level in 0..1"""
+        return dict(
+            brightness=self._scale(level, self.brightness),
+            col=[round(c) for c in color[:3]] + [0],
+            fx=self.fx,
+            fx_speed=self._scale(level, self.speed),
+            fx_intensity=self._scale(level, self.intensity),
+            palette=self.palette,
+            transition_delay=self.transition_ms,
+            sync_groups=self.sync_groups,
+        )
+
+    def _timebase_shift(self, wled) -> float:
+        shift = self.phase_shifts.get(wled.name) or self.phase_shifts.get(wled.ip) or 0
+        if self.clock is not None:
+            shift += self.clock.timebase_shift(wled)
+        return shift
+
+    def _keepalive(self, wled) -> float:
+        if self.clock is None:
+            return self.keepalive
+        return min(self.keepalive, self.clock.push_interval(wled))
+
+    @staticmethod
+    def _changed(old: dict, new: dict, tolerance: int = 2) -> bool:
+        # Small jitter of the mapped values is not worth a packet, the strip blends anyway
+        for name in ("brightness", "fx_speed", "fx_intensity"):
+            if abs(old[name] - new[name]) > tolerance:
+                return True
+        if any(abs(a - b) > tolerance for a, b in zip(old["col"], new["col"])):
+            return True
+        return (old["fx"], old["palette"]) != (new["fx"], new["palette"])
+
+    def activate(self, wled):
+        """Make the strip leave realtime mode and accept notifier packets"""
+        wled.dmx.stop()
+        wled.post_json_state({"on": True, "live": False, "udpn": {"recv": True}})
+        self._sent.pop(wled, None)
+
+    def update(self, wleds: Iterable, color: Sequence[float], level: float, now: Optional[float] = None) -> dict:
+        """
+        Send the parameters for (color, level) to the strips that need them.
+        Returns {wled: exception} for the strips the packet could not be sent to.
+        """
+        now = time.time() if now is None else now
+        params = self.params(color, level)
+        errors = {}
+        for wled in wleds:
+            sent = self._sent.get(wled)
+            if sent is not None and now - sent[1] < self._keepalive(wled) and not self._changed(sent[0], params):
+                continue
+            try:
+                wled.send_udp_sync_v9(**params, timebase_shift=self._timebase_shift(wled))
+            except Exception as e:
+                errors[wled] = e
+                continue
+            self._sent[wled] = (params, now)
+            self.packets_sent += 1
+        return errors
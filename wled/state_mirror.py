@@ -0,0 +1,238 @@
+"""
+In-memory mirror of WLED device state fed by UDP broadcasts.
+
+WledSyncListener listens on the notifier port (v9 sync packets) and the
+sys-info port (node announcements) with non-blocking sockets and one
+selector thread. Every packet updates WledStateMirror, which keeps one
+DeviceState per device IP: O(1) reads, no HTTP polling, and change
+callbacks with the names of the fields that changed.
+"""
+
+import logging
+import selectors
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import config
+from wled.udp_codec import (
+    decode_sync_v9, decode_sys_info,
+    NOTIFIER_PURPOSE, NOTIFIER_VERSION, SYS_INFO_PURPOSE, SYNC_V9_SIZE, SYS_INFO_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+LIVENESS_TIMEOUT = 150  # seconds without any packet before a device counts as gone
+
+StateCallback = Callable[[str, "DeviceState", Tuple[str, ...]], None]
+
+
+class DeviceState:
+    """Last known state of one device. Fields stay None until a packet carried them."""
+
+    SYNC_FIELDS = ("bri", "fx", "fx_speed", "fx_intensity", "palette", "col", "col_sec", "col_ter", "sync_groups")
+    INFO_FIELDS = ("name", "node_type", "wled_id", "build")
+
+    __slots__ = ("ip", "last_seen", "last_sync", "last_info") + SYNC_FIELDS + INFO_FIELDS
+
+    def __init__(self, ip: str):
+        self.ip = ip
+        self.last_seen = 0.0
+        self.last_sync = 0.0
+        self.last_info = 0.0
+        for field in self.SYNC_FIELDS + self.INFO_FIELDS:
+            setattr(self, field, None)
+
+    def is_alive(self, timeout: float = LIVENESS_TIMEOUT, now: Optional[float] = None) -> bool:
+        return (now or time.time()) - self.last_seen < timeout
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"DeviceState({self.ip}, name={self.name!r}, bri={self.bri}, fx={self.fx}, col={self.col})"
+
+
+class WledStateMirror:
+    """Device states keyed by IP, updated from decoded notifier and sys-info packets"""
+
+    def __init__(self):
+        self._states: Dict[str, DeviceState] = {}
+        self._callbacks: List[StateCallback] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: StateCallback):
+        """callback(ip, state, changed_fields) is called on the listener thread for every change"""
+        self._callbacks.append(callback)
+
+    def unsubscribe(self, callback: StateCallback):
+        self._callbacks.remove(callback)
+
+    def get(self, ip: str) -> Optional[DeviceState]:
+        return self._states.get(ip)
+
+    def __getitem__(self, ip: str) -> DeviceState:
+        return self._states[ip]
+
+    def __contains__(self, ip: str) -> bool:
+        return ip in self._states
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def ips(self) -> List[str]:
+        return list(self._states)
+
+    def alive_ips(self, timeout: float = LIVENESS_TIMEOUT) -> List[str]:
+        now = time.time()
+        return [ip for ip, state in list(self._states.items()) if state.is_alive(timeout, now)]
+
+    def _update(self, ip: str, values: dict, now: float, stamp: str) -> Tuple[str, ...]:
+        with self._lock:
+            state = self._states.get(ip)
+            is_new = state is None
+            if is_new:
+                state = self._states[ip] = DeviceState(ip)
+            changed = tuple(k for k, v in values.items() if getattr(state, k) != v)
+            for k in changed:
+                setattr(state, k, values[k])
+            state.last_seen = now
+            setattr(state, stamp, now)
+        if is_new:
+            changed = ("new",) + changed
+        if changed:
+            for callback in list(self._callbacks):
+                try:
+                    callback(ip, state, changed)
+                except Exception as e:
+                    logger.error(f"Error in state mirror callback: {e}")
+        return changed
+
+    def apply_sync(self, ip: str, sync: dict, now: Optional[float] = None) -> Tuple[str, ...]:
+        """Apply a decoded v9 notifier packet (see udp_codec.decode_sync_v9)"""
+        values = {
+            "bri": sync["bri"],
+            "fx": sync["effectCurrent"],
+            "fx_speed": sync["effectSpeed"],
+            "fx_intensity": sync["effectIntensity"],
+            "palette": sync["effectPalette"],
+            "col": tuple(sync["col"]),
+            "col_sec": tuple(sync["colSec"]),
+            "col_ter": ((sync["colTer"] >> 16) & 0xFF, (sync["colTer"] >> 8) & 0xFF,
+                        sync["colTer"] & 0xFF, (sync["colTer"] >> 24) & 0xFF),
+            "sync_groups": sync["syncGroups"],
+        }
+        return self._update(ip, values, now or time.time(), "last_sync")
+
+    def apply_sys_info(self, ip: str, info: dict, now: Optional[float] = None) -> Tuple[str, ...]:
+        """Apply a decoded sys-info packet (see udp_codec.decode_sys_info)"""
+        values = {field: info[field] for field in DeviceState.INFO_FIELDS}
+        return self._update(ip, values, now or time.time(), "last_info")
+
+    def apply_packet(self, ip: str, data, now: Optional[float] = None) -> Tuple[str, ...]:
+        """Decode one raw packet and apply it. Unknown and short packets are ignored."""
+        if not data:
+            return ()
+        if data[0] == NOTIFIER_PURPOSE and len(data) >= SYNC_V9_SIZE and data[11] >= NOTIFIER_VERSION:
+            return self.apply_sync(ip, decode_sync_v9(data), now)
+        if data[0] == SYS_INFO_PURPOSE and len(data) >= SYS_INFO_SIZE and data[1] == 1:
+            info = decode_sys_info(bytes(data[:SYS_INFO_SIZE]))
+            # Announcements may be relayed, the packet itself knows the node's IP
+            node_ip = ".".join(str(b) for b in info["ip"]) if any(info["ip"]) else ip
+            return self.apply_sys_info(node_ip, info, now)
+        return ()
+
+
+class WledSyncListener:
+    """
+    Non-blocking UDP listener feeding a WledStateMirror.
+    Runs one selector thread for all ports; start()/stop() like the other servers.
+    """
+
+    RECV_BUFFER = 1500
+
+    def __init__(self, mirror: Optional[WledStateMirror] = None, ports: Optional[Iterable[int]] = None,
+                 bind_address: str = "0.0.0.0"):
+        """
+        Args:
+            mirror: mirror to update (a new one is created if omitted)
+            ports: UDP ports to listen on (default: config.WLED_PORT and config.WLED_INFO_PORT).
+                Port 0 binds an ephemeral port, see bound_ports.
+            bind_address: local address to bind
+        """
+        self.mirror = mirror if mirror is not None else WledStateMirror()
+        self.ports = list(ports) if ports is not None else [config.WLED_PORT, config.WLED_INFO_PORT]
+        self.bind_address = bind_address
+        self.bound_ports: List[int] = []
+        self.packets = 0
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._buffer = bytearray(self.RECV_BUFFER)
+        self._view = memoryview(self._buffer)
+        self._packet_handlers: List[Callable[[str, memoryview], None]] = []
+
+    def add_packet_handler(self, handler: Callable[[str, memoryview], None]):
+        """handler(ip, data) sees every raw packet; data is only valid during the call"""
+        self._packet_handlers.append(handler)
+
+    def _open_socket(self, port: int) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.bind((self.bind_address, port))
+        sock.setblocking(False)
+        return sock
+
+    def start(self):
+        if self._running:
+            return
+        self._selector = selectors.DefaultSelector()
+        self.bound_ports = []
+        for port in self.ports:
+            sock = self._open_socket(port)
+            self._selector.register(sock, selectors.EVENT_READ)
+            self.bound_ports.append(sock.getsockname()[1])
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="WledSyncListener")
+        self._thread.start()
+        logger.info(f"Listening for WLED UDP sync on ports {self.bound_ports}")
+
+    def _run(self):
+        while self._running:
+            for key, _ in self._selector.select(timeout=0.5):
+                self._drain(key.fileobj)
+
+    def _drain(self, sock: socket.socket):
+        while True:
+            try:
+                n, addr = sock.recvfrom_into(self._buffer)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                if self._running:
+                    logger.error(f"Error receiving WLED UDP packet: {e}")
+                return
+            self.packets += 1
+            data = self._view[:n]
+            try:
+                self.mirror.apply_packet(addr[0], data)
+                for handler in self._packet_handlers:
+                    handler(addr[0], data)
+            except Exception as e:
+                logger.error(f"Error handling WLED UDP packet from {addr[0]}: {e}")
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._selector:
+            for key in list(self._selector.get_map().values()):
+                self._selector.unregister(key.fileobj)
+                key.fileobj.close()
+            self._selector.close()
+            self._selector = None
@@ -0,0 +1,287 @@
+"""
+Clock synchronization of WLED devices with the controller.
+
+Every device gets a DeviceClock: a drift model (offset + rate) of its clock
+relative to ours, fitted over a window of timestamped exchanges. An exchange
+is (t0, device time, t1) with t0/t1 our send/receive time; as in NTP, the
+device time is assumed to be taken halfway, so offset = device - (t0 + t1) / 2
+with an error of at most rtt / 2. Samples with the lowest round trips are
+the most accurate and weigh most in the fit.
+
+TimeSyncService collects the exchanges: HTTP probes give round trip times,
+and the v9 notifier packets the devices broadcast carry their clock (unix, ms)
+and become samples with the one-way delay estimated from the probes. The
+HTTP API has no millisecond clock, so offset and drift are only modelled
+for devices that send notifier packets (WLED: Sync settings, UDP "Send"
+on); for the others only the path delay is known and a warning is logged.
+A custom probe returning the device time replaces the notifier path. It also
+says how to correct pushed timebases: a notifier packet leaving now should
+carry our time plus the one-way delay to that device, and must be repeated
+before the modelled drift exceeds the tolerance (see ParametricSync.clock).
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+import config
+from wled.udp_codec import NOTIFIER_PURPOSE, NOTIFIER_VERSION, SYNC_V9_SIZE, decode_sync_v9
+
+logger = logging.getLogger(__name__)
+
+Probe = Callable[[object], Tuple[float, Optional[float], float]]
+
+
+def exchange(t0: float, device_time: float, t1: float) -> Tuple[float, float]:
+    """(offset, rtt) of one timestamped exchange; offset is device clock minus ours"""
+    return device_time - (t0 + t1) / 2, t1 - t0
+
+
+class DeviceClock:
+    """
+    Offset and drift of one device clock, fitted over the last samples.
+    Samples come from the probe and listener threads while the render thread
+    reads the model, so both sides go through one lock.
+    """
+
+    def __init__(self, window: int = 32):
+        self.samples: deque = deque(maxlen=window)  # (local time, offset, rtt)
+        self.rtts: deque = deque(maxlen=window)  # probe round trips without a device time
+        self._fit: Optional[Tuple[float, float, float]] = None  # (reference time, offset, drift)
+        self._lock = threading.Lock()
+
+    def add(self, local_time: float, offset: float, rtt: float):
+        with self._lock:
+            self.samples.append((local_time, offset, rtt))
+            self.rtts.append(rtt)
+            self._fit = None
+
+    def add_rtt(self, rtt: float):
+        with self._lock:
+            self.rtts.append(rtt)
+
+    @property
+    def rtt(self) -> Optional[float]:
+        """Lowest recent round trip, the best estimate of the network path itself"""
+        with self._lock:
+            return min(self.rtts) if self.rtts else None
+
+    @property
+    def one_way(self) -> float:
+        rtt = self.rtt
+        return rtt / 2 if rtt is not None else 0.0
+
+    def fit(self) -> Optional[Tuple[float, float, float]]:
+        """(reference time, offset at it, drift in s/s), weighted by 1 / rtt^2"""
+        with self._lock:
+            if self._fit is not None or not self.samples:
+                return self._fit
+            local, offset, rtt = np.array(self.samples, dtype=np.float64).T
+            reference = local[-1]
+            weights = 1.0 / np.maximum(rtt, 1e-3)
+            if len(local) < 3 or np.ptp(local) < 1.0:
+                self._fit = (reference, float(np.average(offset, weights=weights ** 2)), 0.0)
+            else:
+                drift, at_reference = np.polyfit(local - reference, offset, 1, w=weights)
+                self._fit = (reference, float(at_reference), float(drift))
+            return self._fit
+
+    def offset_at(self, t: float) -> Optional[float]:
+        fit = self.fit()
+        if fit is None:
+            return None
+        reference, offset, drift = fit
+        return offset + drift * (t - reference)
+
+    @property
+    def drift_ppm(self) -> Optional[float]:
+        fit = self.fit()
+        return fit[2] * 1e6 if fit is not None else None
+
+    def to_device(self, t: float) -> float:
+        """Our time t on the device clock"""
+        return t + (self.offset_at(t) or 0.0)
+
+    def as_dict(self) -> dict:
+        offset = self.offset_at(time.time())
+        return {
+            'offset_ms': round(offset * 1000, 2) if offset is not None else None,
+            'drift_ppm': round(self.drift_ppm, 1) if self.drift_ppm is not None else None,
+            'rtt_ms': round(self.rtt * 1000, 2) if self.rtt is not None else None,
+            'samples': len(self.samples),
+            'notifier': bool(self.samples),
+        }
+
+
+class TimeSyncService:
+    """
+    Keeps a DeviceClock per device from probes and notifier packets.
+    start()/stop() run the probe rounds in a background thread.
+    """
+
+    def __init__(
+        self,
+        listener=None,
+        probe: Optional[Probe] = None,
+        interval: float = config.TIME_SYNC_INTERVAL,
+        tolerance: float = config.TIME_SYNC_TOLERANCE,
+        burst: int = 4,
+        window: int = 32,
+        probe_timeout: float = config.WLED_HEALTH_PROBE_TIMEOUT,
+    ):
+        """
+        Args:
+            listener: WledSyncListener whose notifier packets become clock samples
+            probe: probe(wled) -> (t0, device time or None, t1); default: HTTP round trip
+            interval: seconds between probe rounds
+            tolerance: allowed clock error, seconds; sets how often timebases are pushed
+            burst: probes per device and round, the fastest one is kept
+            window: samples per device clock
+            probe_timeout: HTTP timeout of one probe
+        """
+        self.probe = probe or self._http_probe
+        self.interval = interval
+        self.tolerance = tolerance
+        self.burst = burst
+        self.window = window
+        self.probe_timeout = probe_timeout
+
+        self._wleds: List = []
+        self._by_ip: Dict[str, object] = {}
+        self._clocks: Dict[int, DeviceClock] = {}
+        self._warned = set()  # devices reported as not sending notifier packets
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.session = requests.Session()
+
+        if listener is not None:
+            listener.add_packet_handler(self.on_packet)
+
+    def watch(self, wled):
+        with self._lock:
+            if id(wled) not in self._clocks:
+                self._wleds.append(wled)
+                self._clocks[id(wled)] = DeviceClock(self.window)
+            self._by_ip[wled.ip] = wled
+
+    def unwatch(self, wled):
+        with self._lock:
+            if id(wled) in self._clocks:
+                self._wleds.remove(wled)
+                del self._clocks[id(wled)]
+                self._by_ip.pop(wled.ip, None)
+
+    def clock(self, wled) -> Optional[DeviceClock]:
+        return self._clocks.get(id(wled))
+
+    def status(self) -> Dict[str, dict]:
+        with self._lock:
+            return {str(w): self._clocks[id(w)].as_dict() for w in self._wleds}
+
+    # Corrections
+    def timebase_shift(self, wled) -> float:
+        """ms to add to the time base of a packet sent now, so it is right when it arrives"""
+        clock = self.clock(wled)
+        return clock.one_way * 1000 if clock is not None else 0.0
+
+    def push_interval(self, wled, minimum: float = 0.5, maximum: float = 30.0) -> float:
+        """Seconds until the modelled drift would exceed the tolerance"""
+        clock = self.clock(wled)
+        drift = clock.drift_ppm if clock is not None else None
+        if not drift:
+            return maximum
+        return min(maximum, max(minimum, self.tolerance / (abs(drift) * 1e-6)))
+
+    def to_device(self, wled, t: float) -> float:
+        """Our time t on the clock of wled, e.g. to schedule a flash on the beat"""
+        clock = self.clock(wled)
+        return clock.to_device(t) if clock is not None else t
+
+    # Samples
+    def on_packet(self, ip: str, data, now: Optional[float] = None):
+        """WledSyncListener packet handler: a notifier packet carries the sender's clock"""
+        now = time.time() if now is None else now
+        wled = self._by_ip.get(ip)
+        if wled is None or len(data) < SYNC_V9_SIZE or data[0] != NOTIFIER_PURPOSE or data[11] < NOTIFIER_VERSION:
+            return
+        clock = self.clock(wled)
+        if clock is None or clock.rtt is None:
+            return  # without a path delay estimate the sample would be off by the one-way delay
+        sync = decode_sync_v9(data)
+        device_time = sync["unix"] + sync["ms"] / 1000
+        # Sent one-way delay ago: the same as an exchange with t0 = now - rtt
+        offset, rtt = exchange(now - clock.rtt, device_time, now)
+        clock.add(now, offset, rtt)
+
+    def _http_probe(self, wled) -> Tuple[float, Optional[float], float]:
+        t0 = time.time()
+        response = self.session.get(wled.json_info_endpoint(), timeout=self.probe_timeout)
+        t1 = time.time()
+        response.raise_for_status()
+        return t0, None, t1
+
+    def measure(self, wled):
+        """One burst of probes; the fastest exchange is kept"""
+        clock = self.clock(wled)
+        if clock is None:
+            return
+        best = None
+        for _ in range(self.burst):
+            t0, device_time, t1 = self.probe(wled)
+            if best is None or t1 - t0 < best[2] - best[0]:
+                best = (t0, device_time, t1)
+        t0, device_time, t1 = best
+        if device_time is None:
+            clock.add_rtt(t1 - t0)
+            if not clock.samples and len(clock.rtts) >= 3 and id(wled) not in self._warned:
+                self._warned.add(id(wled))
+                logger.warning(f"No notifier packets from {wled}: its clock drift is not modelled, "
+                               f"enable UDP sync send on the device")
+        else:
+            clock.add((t0 + t1) / 2, *exchange(t0, device_time, t1))
+
+    def measure_all(self):
+        with self._lock:
+            wleds = [w for w in self._wleds if not hasattr(w, "is_available") or w.is_available()]
+        if not wleds:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="wled-time-sync")
+        futures = {self._executor.submit(self.measure, w): w for w in wleds}
+        done, _ = wait(futures, timeout=self.burst * self.probe_timeout + 0.5)
+        for future in done:
+            if future.exception() is not None:
+                logger.debug(f"Time sync probe of {futures[future]} failed: {future.exception()}")
+
+    def _run(self):
+        while self._running:
+            started = time.monotonic()
+            try:
+                self.measure_all()
+            except Exception as e:
+                logger.error(f"Error in time sync: {e}")
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="WledTimeSync")
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=self.interval + self.burst * self.probe_timeout + 1)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,230 @@
+"""
+Batched UDP transmission of whole frames.
+
+UdpBatch owns one socket and one prebuilt packet buffer per registered packet
+(header + payload). Output backends patch payloads and sequence numbers in
+place while a frame is built and queue() the packets they want sent this
+frame; strips that are not due, not ready or whose delta frame skipped a
+packet simply do not queue it. flush() then hands the queued packets to the
+kernel with sendmmsg (one syscall per 1024 packets, via ctypes since the
+socket module has no binding) and empties the queue. Where sendmmsg is
+unavailable or fails, flush() falls back to a tight sendto loop over the same
+buffers.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+UIO_MAXIOV = 1024  # max messages per sendmmsg call
+
+
+class _SockaddrIn(ctypes.Structure):
+    _fields_ = [("sin_family", ctypes.c_ushort), ("sin_port", ctypes.c_uint16),
+                ("sin_addr", ctypes.c_uint8 * 4), ("sin_zero", ctypes.c_uint8 * 8)]
+
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p), ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_Iovec)), ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p), ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _Msghdr), ("msg_len", ctypes.c_uint)]
+
+
+def _load_sendmmsg():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_Mmsghdr), ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg
+
+
+_sendmmsg = _load_sendmmsg()
+
+
+def have_sendmmsg() -> bool:
+    return _sendmmsg is not None
+
+
+class _Packet:
+    __slots__ = ("buffer", "view", "address", "header_size", "seq_offset", "seq", "index", "queued",
+                 "_pinned", "_sockaddr")
+
+    def __init__(self, address: Tuple[str, int], header: bytes, payload_size: int, seq_offset: Optional[int]):
+        self.buffer = bytearray(header) + bytearray(payload_size)
+        self.view = memoryview(self.buffer)
+        self.address = address
+        self.header_size = len(header)
+        self.seq_offset = seq_offset
+        self.seq = 0
+        self.index: Optional[int] = None  # position in the prebuilt message array
+        self.queued = False
+        self._pinned = (ctypes.c_char * len(self.buffer)).from_buffer(self.buffer)
+        self._sockaddr = _SockaddrIn(socket.AF_INET, socket.htons(address[1]),
+                                     (ctypes.c_uint8 * 4)(*socket.inet_aton(address[0])))
+
+    @property
+    def payload(self) -> memoryview:
+        return self.view[self.header_size:]
+
+
+class UdpBatch:
+    """Registered packets of all strips, sent together by flush()"""
+
+    def __init__(self, use_sendmmsg: bool = True):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 22)
+        self.use_sendmmsg = use_sendmmsg and have_sendmmsg()
+        self._packets: Dict[int, _Packet] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._msgs = None
+        self._iovs = None
+        self._send = None
+        self._order: List[_Packet] = []
+        self._queue: List[_Packet] = []
+        # Stats of the last flush and totals
+        self.syscalls = 0
+        self.packets_sent = 0
+        self.last_flush_time = 0.0
+        self.last_flush_syscalls = 0
+
+    def add(self, address: Tuple[str, int], header: bytes, payload_size: int, seq_offset: Optional[int] = None) -> int:
+        """Register a packet; returns its id. seq_offset is the header byte next_seq() patches."""
+        with self._lock:
+            packet_id = self._next_id
+            self._next_id += 1
+            self._packets[packet_id] = _Packet(address, header, payload_size, seq_offset)
+            self._msgs = None
+            return packet_id
+
+    def remove(self, packet_ids):
+        with self._lock:
+            for packet_id in packet_ids:
+                packet = self._packets.pop(packet_id, None)
+                if packet is not None:
+                    packet.index = None
+            self._msgs = None
+
+    def payload(self, packet_id: int) -> memoryview:
+        return self._packets[packet_id].payload
+
+    def header(self, packet_id: int) -> memoryview:
+        packet = self._packets[packet_id]
+        return packet.view[:packet.header_size]
+
+    def next_seq(self, packet_id: int, modulo: int = 256, start: int = 0) -> int:
+        """Advance the packet's sequence number (start..modulo-1) and patch it into the header"""
+        packet = self._packets[packet_id]
+        packet.seq = packet.seq + 1 if packet.seq + 1 < modulo else start
+        packet.buffer[packet.seq_offset] = packet.seq
+        return packet.seq
+
+    def queue(self, packet_id: int):
+        """Send the packet with the next flush (once, however often it is queued)"""
+        packet = self._packets[packet_id]
+        if not packet.queued:
+            packet.queued = True
+            self._queue.append(packet)
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def __len__(self) -> int:
+        return len(self._packets)
+
+    def _build(self):
+        self._order = list(self._packets.values())
+        n = len(self._order)
+        self._iovs = (_Iovec * max(n, 1))()
+        self._msgs = (_Mmsghdr * max(n, 1))()
+        self._send = (_Mmsghdr * max(n, 1))()
+        for i, packet in enumerate(self._order):
+            packet.index = i
+            self._iovs[i].iov_base = ctypes.addressof(packet._pinned)
+            self._iovs[i].iov_len = len(packet.buffer)
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(packet._sockaddr)
+            hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+            hdr.msg_iov = ctypes.pointer(self._iovs[i])
+            hdr.msg_iovlen = 1
+
+    def flush(self) -> int:
+        """
+        Send the queued packets and empty the queue; returns the number of packets sent.
+        Raises the first OSError of the sendto fallback after trying every packet.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            if self._msgs is None:
+                self._build()
+            queue = [packet for packet in self._queue if packet.index is not None]
+            for packet in self._queue:
+                packet.queued = False
+            self._queue = []
+            n = len(queue)
+            sent = syscalls = 0
+            if self.use_sendmmsg and n:
+                size = ctypes.sizeof(_Mmsghdr)
+                source, base = ctypes.addressof(self._msgs), ctypes.addressof(self._send)
+                for i, packet in enumerate(queue):
+                    ctypes.memmove(base + i * size, source + packet.index * size, size)
+                while sent < n:
+                    chunk = min(n - sent, UIO_MAXIOV)
+                    result = _sendmmsg(self.sock.fileno(), ctypes.cast(base + sent * size, ctypes.POINTER(_Mmsghdr)),
+                                       chunk, 0)
+                    syscalls += 1
+                    if result < 0:
+                        errno = ctypes.get_errno()
+                        logger.warning(f"sendmmsg failed ({os.strerror(errno)}), sending the rest one by one")
+                        break
+                    sent += result
+            error = None
+            for packet in queue[sent:]:
+                try:
+                    self.sock.sendto(packet.buffer, packet.address)
+                except OSError as e:
+                    error = error or e
+                syscalls += 1
+        self.syscalls += syscalls
+        self.packets_sent += n
+        self.last_flush_syscalls = syscalls
+        self.last_flush_time = time.perf_counter() - started
+        if error is not None:
+            raise error
+        return n
+
+    def close(self):
+        self.sock.close()
+
+
+_batch: Optional[UdpBatch] = None
+_batch_lock = threading.Lock()
+
+
+def shared_batch() -> UdpBatch:
+    """The process-wide batch all batched outputs register their packets with"""
+    global _batch
+    with _batch_lock:
+        if _batch is None:
+            _batch = UdpBatch()
+        return _batch
@@ -0,0 +1,208 @@
+"""
+Binary codec for WLED UDP notifier (v9 sync) and sys-info packets.
+
+Encoding uses precompiled struct formats and a reusable bytearray: the
+parameter part of a sync packet is packed once, and each send only patches
+the time fields (t, unix, ms). Decoding maps packets onto NumPy structured
+dtypes, so a whole receive buffer can be parsed in one call.
+
+Packet layout: https://github.com/Aircoookie/WLED/blob/master/wled00/udp.cpp
+"""
+
+import struct
+import time
+from math import floor
+from typing import Iterable, Optional
+
+import numpy as np
+
+SYNC_V9_SIZE = 37
+SYS_INFO_SIZE = 44
+
+NOTIFIER_PURPOSE = 0
+SYS_INFO_PURPOSE = 255
+CALL_MODE_DIRECT_CHANGE = 1
+TIME_SOURCE_UDP = 160
+NOTIFIER_VERSION = 9
+
+# Bytes 0..24: everything up to followUp. transitionDelay is little endian.
+_SYNC_HEAD = struct.Struct("<17BHB4BB")
+# Bytes 25..35: t, time source, unix seconds, ms. Big endian.
+_SYNC_TIME = struct.Struct(">IBIH")
+_SYNC_TIME_OFFSET = 25
+# Byte 36: sync groups bitmask
+_SYNC_GROUPS_OFFSET = 36
+
+SYNC_V9_DTYPE = np.dtype([
+    ("purpose", "u1"),
+    ("callMode", "u1"),
+    ("bri", "u1"),
+    ("col", "u1", (3,)),
+    ("nightlightActive", "u1"),
+    ("nightlightDelayMins", "u1"),
+    ("effectCurrent", "u1"),
+    ("effectSpeed", "u1"),
+    ("white", "u1"),
+    ("version", "u1"),
+    ("colSec", "u1", (4,)),
+    ("effectIntensity", "u1"),
+    ("transitionDelay", "<u2"),
+    ("effectPalette", "u1"),
+    ("colTer", "u1", (4,)),
+    ("followUp", "u1"),
+    ("t", ">u4"),
+    ("timeSource", "u1"),
+    ("unix", ">u4"),
+    ("ms", ">u2"),
+    ("syncGroups", "u1"),
+])
+assert SYNC_V9_DTYPE.itemsize == SYNC_V9_SIZE
+
+SYS_INFO_DTYPE = np.dtype([
+    ("purpose", "u1"),
+    ("infoType", "u1"),
+    ("ip", "u1", (4,)),
+    ("name", "S32"),
+    ("nodeType", "u1"),
+    ("unitId", "u1"),
+    ("build", "<u4"),
+])
+assert SYS_INFO_DTYPE.itemsize == SYS_INFO_SIZE
+
+NODE_TYPES = {82: "esp8266", 32: "esp32"}
+
+
+def _rgbw(color) -> tuple:
+    color = tuple(int(c) & 0xFF for c in color)
+    return color + (0,) * (4 - len(color))
+
+
+def sync_groups_mask(sync_groups: Iterable[int]) -> int:
+    mask = 0
+    for g in sync_groups:
+        mask |= 1 << (int(g) - 1)
+    return mask & 0xFF
+
+
+class SyncPacketV9:
+    """
+    Reusable v9 notifier packet. Parameters are packed once on update(),
+    pack() only writes the time fields into the same buffer.
+    """
+
+    def __init__(self, **params):
+        self.buffer = bytearray(SYNC_V9_SIZE)
+        self.timebase_shift = 0
+        self.update(**params)
+
+    def update(self, brightness=255, col=(255, 0, 0, 0), fx=0, fx_speed=10, fx_intensity=255, transition_delay=1000,
+               palette=0, nightlightActive=0, nightlightDelayMins=60,
+               secondary_color=(0, 255, 0, 0), tertiary_color=(0, 0, 255, 0),
+               follow_up=False, sync_groups=(1,), timebase_shift=0, call_mode=CALL_MODE_DIRECT_CHANGE):
+        col = _rgbw(col)
+        col_sec = _rgbw(secondary_color)
+        col_ter = _rgbw(tertiary_color)
+        _SYNC_HEAD.pack_into(
+            self.buffer, 0,
+            NOTIFIER_PURPOSE, call_mode, brightness & 0xFF, col[0], col[1], col[2],
+            nightlightActive & 0xFF, nightlightDelayMins & 0xFF, fx & 0xFF, fx_speed & 0xFF, col[3],
+            NOTIFIER_VERSION, *col_sec, fx_intensity & 0xFF,
+            int(transition_delay) & 0xFFFF, palette & 0xFF, *col_ter, int(bool(follow_up)),
+        )
+        self.buffer[_SYNC_GROUPS_OFFSET] = sync_groups_mask(sync_groups)
+        self.timebase_shift = timebase_shift
+        return self
+
+    def pack(self, current_time: Optional[float] = None, timebase_shift: Optional[float] = None) -> bytearray:
+        """Patch t/unix/ms for current_time (default: now) and return the shared buffer"""
+        if current_time is None:
+            current_time = time.time()
+        if timebase_shift is None:
+            timebase_shift = self.timebase_shift
+        t = floor(current_time * 1000 + timebase_shift) & 0xFFFFFFFF
+        unix = floor(current_time) & 0xFFFFFFFF
+        ms = floor((current_time % 1) * 1000)
+        _SYNC_TIME.pack_into(self.buffer, _SYNC_TIME_OFFSET, t, TIME_SOURCE_UDP, unix, ms)
+        return self.buffer
+
+
+def decode_sync_v9(bts) -> dict:
+    """Decode one v9 notifier packet into the field names used by WLED's udp.cpp"""
+    head = _SYNC_HEAD.unpack_from(bts, 0)
+    t, time_source, unix, ms = _SYNC_TIME.unpack_from(bts, _SYNC_TIME_OFFSET)
+    col_ter = head[19:23]
+    return {
+        "msg_type": "udp_sync",
+        "callMode": head[1],
+        "bri": head[2],
+        "col": [head[3], head[4], head[5], head[10]],
+        "nightlightActive": head[6],
+        "nightlightDelayMins": head[7],
+        "effectCurrent": head[8],
+        "effectSpeed": head[9],
+        "version": head[11],
+        "colSec": list(head[12:16]),
+        "effectIntensity": head[16],
+        "transitionDelay": head[17],
+        "effectPalette": head[18],
+        "colTer": (col_ter[0] << 16) | (col_ter[1] << 8) | col_ter[2] | (col_ter[3] << 24),
+        "followUp": head[23],
+        "t": t,
+        "toki_getTimeSource": time_source,
+        "unix": unix,
+        "ms": ms,
+        "syncGroups": bts[_SYNC_GROUPS_OFFSET],
+    }
+
+
+def decode_sys_info(bts) -> dict:
+    """Decode one sys-info packet"""
+    rec = np.frombuffer(bts, dtype=SYS_INFO_DTYPE, count=1)[0]
+    return {
+        "msg_type": "udp_sys_info",
+        "ip": [int(b) for b in rec["ip"]],
+        "name": rec["name"].decode("utf-8", errors="replace").rstrip("\x00"),
+        "node_type": NODE_TYPES.get(int(rec["nodeType"]), "undefined"),
+        "wled_id": int(rec["unitId"]),
+        "build": int(rec["build"]),
+    }
+
+
+def _strided_view(buffer, dtype: np.dtype, count: Optional[int], stride: Optional[int]) -> np.ndarray:
+    stride = stride or dtype.itemsize
+    if stride < dtype.itemsize:
+        raise ValueError(f"stride {stride} is smaller than the packet size {dtype.itemsize}")
+    raw = np.frombuffer(buffer, dtype=np.uint8)
+    available = (len(raw) - dtype.itemsize) // stride + 1 if len(raw) >= dtype.itemsize else 0
+    count = available if count is None else min(count, available)
+    return np.ndarray(shape=(count,), dtype=dtype, buffer=raw, strides=(stride,))
+
+
+def decode_sync_v9_batch(buffer, count: Optional[int] = None, stride: Optional[int] = None,
+                         valid_only: bool = True) -> np.ndarray:
+    """
+    Parse many v9 packets from one receive buffer into a structured array.
+
+    Args:
+        buffer: bytes-like object holding the packets
+        count: number of packets in the buffer (default: as many as fit)
+        stride: distance between packet starts, e.g. the slot size of a receive ring.
+            Defaults to back-to-back 37 byte packets.
+        valid_only: drop packets that are not notifier packets of version >= 9
+    """
+    packets = _strided_view(buffer, SYNC_V9_DTYPE, count, stride)
+    if valid_only:
+        return packets[(packets["purpose"] == NOTIFIER_PURPOSE) & (packets["version"] >= NOTIFIER_VERSION)]
+    return packets.copy()
+
+
+def decode_sync_v9_packets(packets: Iterable[bytes]) -> np.ndarray:
+    """Parse a sequence of individually received packets; short packets are skipped"""
+    data = b"".join(bytes(p[:SYNC_V9_SIZE]) for p in packets if len(p) >= SYNC_V9_SIZE)
+    return decode_sync_v9_batch(data)
+
+
+def decode_sys_info_batch(buffer, count: Optional[int] = None, stride: Optional[int] = None) -> np.ndarray:
+    """Parse many sys-info packets from one receive buffer into a structured array"""
+    packets = _strided_view(buffer, SYS_INFO_DTYPE, count, stride)
+    return packets[(packets["purpose"] == SYS_INFO_PURPOSE) & (packets["infoType"] == 1)]
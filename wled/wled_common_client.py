@@ -1,12 +1,17 @@
-from typing import Optional, Type
+from typing import Dict, Iterable, List, Optional, Type
 import requests
 import time
 import json
 import os
 # from omegaconf import DictConfig, OmegaConf, ListConfig
 import sacn
-from math import ceil, floor
-from concurrent.futures import ThreadPoolExecutor
+import config
+from math import ceil
+from concurrent.futures import wait
+from wled.bulk import shared_executor, shared_runner, BulkResult, CircuitOpenError, NO_DEADLINE
+from wled.circuit_breaker import CircuitBreaker, OPEN
+from wled.output import make_output
+from wled.udp_codec import SyncPacketV9, decode_sync_v9, decode_sys_info, SYNC_V9_SIZE, SYS_INFO_SIZE
 # from scripts.local_env import DEFAULT_OMAEGACONFS, FS_DUMP_DIR, DEFAULT_PRESETS, OMEGACONF_DUMP_DIR
 
 
@@ -37,24 +42,31 @@ class WledDMX:
     SEND_OUT_INTERVAL = 0.3
     _port_counter = 5568
     
-    def __init__(self, wled, bind_port=None):
+    def __init__(self, wled, bind_port=None, backend=None):
         self.wled = wled
-        self.sender = None
-        self.bind_port = bind_port or WledDMX._get_next_port()
+        self.backend_name = backend or config.WLED_OUTPUT
+        self.backend = None
+        self.bind_port = bind_port if bind_port is not None else WledDMX._get_next_port()
+        self.grouping = 1 # the device repeats every pixel this many times (segment grp), see set_grouping
 
     def start(self):
         WledDMX.set_send_interval(WledDMX.SEND_OUT_INTERVAL)
-        if self.sender is None:
-            self.sender = sacn.sACNsender(bind_port=self.bind_port)
         strips = self.wled.cfg["hw"]["led"]["ins"]
         # assert len(strips) == 1 # Assertion is no longer valid and needed
-        self.n_leds = sum(strip["len"] for strip in strips)
+        self.n_leds = ceil(sum(strip["len"] for strip in strips) / self.grouping)
         self.n_universes = ceil(self.n_leds / WledDMX.LEDS_PER_UNIVERSE)
-        for i in range(1, self.n_universes+1):
-            self.sender.activate_output(i)
-        for sender in self.get_senders():
-            sender.destination = self.wled.ip
-        self.sender.start()
+        if self.backend is None:
+            self.backend = make_output(self.backend_name, self)
+        self.backend.start()
+
+    @property
+    def running(self):
+        return self.backend is not None
+
+    @property
+    def sender(self):
+        """The sACNsender of the sacn backend (None for other backends or when stopped)"""
+        return getattr(self.backend, "sender", None)
 
     @classmethod
     def _get_next_port(cls):
@@ -64,16 +76,28 @@ class WledDMX:
     
     
     def get_senders(self):
-        return [self.sender[i] for i in self.sender.get_active_outputs()]
+        """sacn outputs of the running backend, empty for DDP, the batched path or a stopped strip"""
+        return self.backend.get_senders() if self.backend is not None else []
 
     def set_data(self, data):
         assert len(data) == 3 * self.n_leds
-        for i, sender in enumerate(self.get_senders()):
-            sender.dmx_data = data[i*3*WledDMX.LEDS_PER_UNIVERSE : (i+1)*3*WledDMX.LEDS_PER_UNIVERSE]
+        self.backend.set_data(data)
     
     def stop(self):
-        if self.sender is not None: self.sender.stop()
-        self.sender = None
+        if self.backend is not None: self.backend.stop()
+        self.backend = None
+
+    def set_grouping(self, grouping, configure_device=True):
+        """Stream n_leds / grouping pixels and let the device's main segment repeat each of them.
+        Needs "Use main segment only" for realtime data on the device. Restarts a running output."""
+        if grouping == self.grouping:
+            return
+        if configure_device:
+            self.wled.post_json_state({"seg": [{"id": 0, "grp": grouping}]})
+        self.grouping = grouping
+        if self.running:
+            self.stop()
+            self.start()
 
     def __del__(self):
         self.stop()
@@ -87,21 +111,31 @@ class WledDMX:
 class Wled:
     _tcp_state_post_timeout: float = 2. # seconds
     _tcp_fs_list_timeout: float = 2. # seconds
+    _tcp_get_timeout: float = 2. # seconds
 
 
     def __init__(self, ip):
         self.ip = ip
         self.udp_port = None
         self.name = None
+        self.mac = None
+        self.tags = set() # strip groups, e.g. "inside", "motion"
         self.current_json = None
         self.cfg = None
         self.presets = None
         self.dmx = WledDMX(self)
+        self._sync_packet = None
+        self._sync_key = None
+        self.breaker = CircuitBreaker()
     
     
     def __str__(self):
         return f"WLED '{self.name}' at {self.ip}"
 
+    def is_available(self):
+        """False while the circuit breaker is open (device known to be down)"""
+        return self.breaker.state != OPEN
+
     def __repr__(self) -> str:
         return self.__str__()
 
@@ -212,93 +246,23 @@ class Wled:
             nightlightActive=0, nightlightDelayMins=60,
             secondary_color=[0, 255, 0, 0], tertiary_color=[0, 0, 255, 0],
             follow_up=False, sync_groups={1}, timebase_shift=0):
-        udpOut = [0] * 37
-        callMode = 1 # CALL_MODE_DIRECT_CHANGE
-        bri = brightness
-        col += [0] * (4 - len(col))
-        effectCurrent = fx
-        effectSpeed = fx_speed
-        colSec = secondary_color + ([0] * (4 - len(secondary_color)))
-        effectIntensity = fx_intensity
-        transitionDelay = int(transition_delay) # in milliseconds
-        effectPalette = palette
-        tertiary_color += ([0] * (4 - len(tertiary_color)))
-        colTer = 0
-        colTer += (tertiary_color[0] & 0xFF) << 16
-        colTer += (tertiary_color[1] & 0xFF) << 8
-        colTer += (tertiary_color[2] & 0xFF) << 0
-        colTer += (tertiary_color[3] & 0xFF) << 24
-        followUp = follow_up
+        # The packet body is only repacked when the parameters change,
+        # otherwise just the time fields (t, unix, ms) are patched in place
         # timebase is the base for calculating all the times in the effects, in ms
         # see https://github.com/Aircoookie/WLED/blob/v0.13.0-b5/wled00/FX_fcn.cpp#L119
         # https://github.com/Aircoookie/WLED/blob/v0.13.0-b5/wled00/src/dependencies/toki/Toki.h#L31
-
-        current_time = time.time()
-        t = floor(current_time*1000 + timebase_shift) # just millis
-        unix = floor(current_time)
-        toki_getTimeSource = 160 
-        ms = floor((current_time % 1) * 1000)
-        syncGroups = 0
-        for g in sync_groups:
-            syncGroups += 1 << (int(g)-1)
-
-        # Copy below from
-        # C:\Users\okdim\YandexDisk\coding_leisure\Arduino\WLED\wled00\udp.cpp:L7
-        udpOut[0] = 0; # //0: wled notifier protocol 1: WARLS protocol
-        udpOut[1] = callMode;
-        udpOut[2] = bri;
-        udpOut[3] = col[0];
-        udpOut[4] = col[1];
-        udpOut[5] = col[2];
-        udpOut[6] = nightlightActive;
-        udpOut[7] = nightlightDelayMins;
-        udpOut[8] = effectCurrent;
-        udpOut[9] = effectSpeed;
-        udpOut[10] = col[3];
-        # //compatibilityVersionByte: 
-        # //0: old 1: supports white 2: supports secondary color
-        # //3: supports FX intensity, 24 byte packet 4: supports transitionDelay 5: sup palette
-        # //6: supports timebase syncing, 29 byte packet 7: supports tertiary color 8: supports sys time sync, 36 byte packet
-        # //9: supports sync groups, 37 byte packet
-        udpOut[11] = 9; 
-        udpOut[12] = colSec[0];
-        udpOut[13] = colSec[1];
-        udpOut[14] = colSec[2];
-        udpOut[15] = colSec[3];
-        udpOut[16] = effectIntensity;
-        udpOut[17] = (transitionDelay >> 0) & 0xFF;
-        udpOut[18] = (transitionDelay >> 8) & 0xFF;
-        udpOut[19] = effectPalette;
-        # uint32_t colTer = strip.getSegment(strip.getMainSegmentId()).colors[2];
-        udpOut[20] = (colTer >> 16) & 0xFF;
-        udpOut[21] = (colTer >>  8) & 0xFF;
-        udpOut[22] = (colTer >>  0) & 0xFF;
-        udpOut[23] = (colTer >> 24) & 0xFF;
-        
-        udpOut[24] = followUp;
-        # uint32_t t = millis() + strip.timebase_shift;
-        udpOut[25] = (t >> 24) & 0xFF;
-        udpOut[26] = (t >> 16) & 0xFF;
-        udpOut[27] = (t >>  8) & 0xFF;
-        udpOut[28] = (t >>  0) & 0xFF;
-
-        # //sync system time
-        # udpOut[29] = toki.getTimeSource();
-        udpOut[29] = toki_getTimeSource
-        # Toki::Time tm = toki.getTime();
-        # uint32_t unix = tm.sec;
-        udpOut[30] = (unix >> 24) & 0xFF;
-        udpOut[31] = (unix >> 16) & 0xFF;
-        udpOut[32] = (unix >>  8) & 0xFF;
-        udpOut[33] = (unix >>  0) & 0xFF;
-        # uint16_t ms = tm.ms;
-        udpOut[34] = (ms >> 8) & 0xFF;
-        udpOut[35] = (ms >> 0) & 0xFF;
-
-        # //sync groups
-        udpOut[36] = syncGroups;
-        udpOut = bytes(udpOut)
-        self._send_udp(udpOut)
+        params = dict(brightness=brightness, col=tuple(col), fx=fx, fx_speed=fx_speed, fx_intensity=fx_intensity,
+                transition_delay=transition_delay, palette=palette,
+                nightlightActive=nightlightActive, nightlightDelayMins=nightlightDelayMins,
+                secondary_color=tuple(secondary_color), tertiary_color=tuple(tertiary_color),
+                follow_up=follow_up, sync_groups=tuple(sorted(sync_groups)), timebase_shift=timebase_shift)
+        key = tuple(params.values())
+        if self._sync_packet is None:
+            self._sync_packet = SyncPacketV9(**params)
+        elif key != self._sync_key:
+            self._sync_packet.update(**params)
+        self._sync_key = key
+        self._send_udp(self._sync_packet.pack())
 
     def send_udp_sync(self, brightness=255, col=[255,0,0, 0], fx=0, fx_speed=10, fx_intensity=255, transition_delay=1000, palette=0, 
             nightlightActive=0, nightlightDelayMins=60,
@@ -312,141 +276,56 @@ class Wled:
 
     @classmethod
     def parse_udp_sync(cls, bts): # this hasa to be a classmethod, because the sync can come from any of the Wleds
-        udp_in = list(bts)
-        if udp_in[0] == 0:
-            version = udp_in[11]
+        if bts[0] == 0:
+            version = bts[11]
             if (version >= 9):
                 return cls.parse_udp_sync_v9(bts)
             else:
-                logger.exception(f"Recieved a WLED UDP notification with version {version} < 9: {udp_in}")
+                logger.exception(f"Recieved a WLED UDP notification with version {version} < 9: {list(bts)}")
                 return {}
-        elif udp_in[0] == 255:
+        elif bts[0] == 255:
             return cls.parse_udp_sys_info(bts)
         else:
-            logger.exception(f"Recieved a realtime protocol notification, skipping: {udp_in}")
+            logger.exception(f"Recieved a realtime protocol notification, skipping: {list(bts)}")
             return {}
 
     @classmethod
     def parse_udp_sync_v9(cls, bts): # this hasa to be a classmethod, because the sync can come from any of the Wleds
-        udp_in = list(bts)
-        if (len(udp_in) < 37):
-            logger.exception(f"Recieved a short WLED UDP notification ({len(udp_in)} < 37) : {udp_in}")
+        if (len(bts) < SYNC_V9_SIZE):
+            logger.exception(f"Recieved a short WLED UDP notification ({len(bts)} < {SYNC_V9_SIZE}) : {list(bts)}")
             return {}
-
-        # Prepare the variables
-        col = [0]*4
-        colSec = [0]*4
-        msg_type = "udp_sync"
-
-        # Copy below from
-        # C:\Users\okdim\YandexDisk\coding_leisure\Arduino\WLED\wled00\udp.cpp:L7
-        # then select, press Ctrl+H to Replace, then press the Find In Selection button
-        #
-        # udpOut\[(\d+)\] = (.*);
-        # $2 = udp_in[$1]
-        # 0 = udp_in[0] # //0: wled notifier protocol 1: WARLS protocol
-        # and then modify to taste
-        callMode = udp_in[1]
-        bri = udp_in[2]
-        col[0] = udp_in[3]
-        col[1] = udp_in[4]
-        col[2] = udp_in[5]
-        nightlightActive = udp_in[6]
-        nightlightDelayMins = udp_in[7]
-        effectCurrent = udp_in[8]
-        effectSpeed = udp_in[9]
-        col[3] = udp_in[10]
-        # //compatibilityVersionByte: 
-        # //0: old 1: supports white 2: supports secondary color
-        # //3: supports FX intensity, 24 byte packet 4: supports transitionDelay 5: sup palette
-        # //6: supports timebase_shift syncing, 29 byte packet 7: supports tertiary color 8: supports sys time sync, 36 byte packet
-        # //9: supports sync groups, 37 byte packet
-        version = udp_in[11] 
-        colSec[0] = udp_in[12]
-        colSec[1] = udp_in[13]
-        colSec[2] = udp_in[14]
-        colSec[3] = udp_in[15]
-        effectIntensity = udp_in[16]
-        transitionDelay = (udp_in[17] & 0xFF) << 0
-        transitionDelay += (udp_in[18] & 0xFF) << 8
-        effectPalette = udp_in[19]
-        # uint32_t colTer = strip.getSegment(strip.getMainSegmentId()).colors[2];
-        colTer  = (udp_in[20] & 0xFF) << 16
-        colTer += (udp_in[21] & 0xFF) << 8
-        colTer += (udp_in[22] & 0xFF) << 0
-        colTer += (udp_in[23] & 0xFF) << 24
-        
-        followUp = udp_in[24]
-        # uint32_t t = millis() + strip.timebase_shift;
-        t  = (udp_in[25] & 0xFF) << 24
-        t += (udp_in[26] & 0xFF) << 16
-        t += (udp_in[27] & 0xFF) << 8
-        t += (udp_in[28] & 0xFF) << 0
-
-        # //sync system time
-        # toki.getTimeSource() = udp_in[29]
-        toki_getTimeSource = udp_in[29]
-        # Toki::Time tm = toki.getTime();
-        # uint32_t unix = tm.sec;
-        unix  = (udp_in[30] & 0xFF) << 24
-        unix += (udp_in[31] & 0xFF) << 16
-        unix += (udp_in[32] & 0xFF) << 8
-        unix += (udp_in[33] & 0xFF) << 0
-        # uint16_t ms = tm.ms;
-        ms = (udp_in[34] & 0xFF) << 8
-        ms += (udp_in[35] & 0xFF) << 0
-
-        # //sync groups
-        syncGroups = udp_in[36]
-
-        # modify the needed
-        return locals()
+        # Field names follow wled00/udp.cpp, see wled/udp_codec.py for the layout
+        return decode_sync_v9(bts)
 
     @classmethod
     def parse_udp_sys_info(cls, bts): # this hasa to be a classmethod, because the sync can come from any of the Wleds
         # see https://github.com/Aircoookie/WLED/blob/7e1920dc4b871f442ea7de2889fd8ce8db63c088/wled00/udp.cpp#L481
-        udp_in = list(bts)
-        msg_type = "udp_sys_info"
-        if (len(udp_in) < 44):
-            logger.exception(f"Recieved a short udp_sys_info notification ({len(udp_in)} < 44) : {udp_in}")
+        if (len(bts) < SYS_INFO_SIZE):
+            logger.exception(f"Recieved a short udp_sys_info notification ({len(bts)} < {SYS_INFO_SIZE}) : {list(bts)}")
             return {}
-        if (udp_in[1] != 1):
-            logger.exception(f"Recieved a strange udp_sys_info, skipping: {udp_in}")
+        if (bts[1] != 1):
+            logger.exception(f"Recieved a strange udp_sys_info, skipping: {list(bts)}")
             return {}
-        ip = udp_in[2:6]
-        name = bts[6:6+32].decode("utf-8").rstrip('\x00')
-        #define NODE_TYPE_ID_UNDEFINED        0
-        #define NODE_TYPE_ID_ESP8266         82
-        #define NODE_TYPE_ID_ESP32           32
-        node_type = "undefined"
-        if udp_in[38] == 82:
-            node_type = "esp8266"
-        elif udp_in[38] == 32:
-            node_type = "esp32"
-
-        wled_id = udp_in[39]
-        build  = (udp_in[40] & 0xFF) << 0
-        build += (udp_in[41] & 0xFF) << 8
-        build += (udp_in[42] & 0xFF) << 16
-        build += (udp_in[43] & 0xFF) << 24
-
-        return locals()
+        return decode_sys_info(bytes(bts[:SYS_INFO_SIZE]))
 
 
 
 
     # Json state requests
     def get_json(self):
-        self.current_json = requests.get(self.json_endpoint()).json()
+        self.current_json = requests.get(self.json_endpoint(), timeout=self._tcp_get_timeout).json()
         return self.current_json
 
     def get_json_info(self):
-        return requests.get(self.json_info_endpoint()).json()
+        return requests.get(self.json_info_endpoint(), timeout=self._tcp_get_timeout).json()
 
     def get_json_state(self):
-        return requests.get(self.json_state_endpoint()).json()
+        return requests.get(self.json_state_endpoint(), timeout=self._tcp_get_timeout).json()
 
     def post_json_state(self, new_json={}):
+        # Fail fast instead of waiting _tcp_state_post_timeout on a device known to be down
+        if self.breaker.state == OPEN:
+            raise CircuitOpenError(f"{self} is down, circuit open")
         return requests.post(self.json_state_endpoint(), json=new_json, timeout=self._tcp_state_post_timeout)
 
     def post_json_info(self, new_json={}):
@@ -461,7 +340,7 @@ class Wled:
         return requests.get(self.edit_endpoint() + "?list", timeout=self._tcp_fs_list_timeout).json()
 
     def get_fs_file(self, filename):
-        return requests.get(self.edit_endpoint() + "?edit=" + filename)
+        return requests.get(self.edit_endpoint() + "?edit=" + filename, timeout=self._tcp_fs_list_timeout)
 
     def upload_fs_file(self, filename, contents):
         return requests.post(self.edit_endpoint(), files={filename:contents})
@@ -499,7 +378,7 @@ class Wled:
     
     # Higher level functions
     def get_nodes(self):
-       return requests.get(self.json_endpoint() + "/nodes").json()["nodes"]
+       return requests.get(self.json_endpoint() + "/nodes", timeout=self._tcp_get_timeout).json()["nodes"]
 
     def reset_timers_cfg(self):
         for t in self.cfg["timers"]["ins"]:
@@ -573,22 +452,27 @@ class Wled:
 
 
 class Wleds:
-    def __init__(self, wleds=[]):
-        self.wleds = wleds
+    def __init__(self, wleds=None):
+        self.wleds = wleds if wleds is not None else []
+        self.reindex()
     
     @classmethod
     def from_udp_multicast_table(cls, box):
         return cls(wleds = list(Wled.from_udp_multicast(row) for row in box.rows()))
 
     @classmethod
-    def from_one_node(cls, wled):
+    def from_one_node(cls, wled, timeout=10.):
         wleds = [wled]
-        for node in wled.get_nodes():
-            try:
-                w = Wled.from_one_ip(node["ip"], node["name"])
-                wleds.append(w)
-            except Exception as e:
-                logger.warning(f"Error while initializing {e}")
+        # Initialize all nodes in parallel, nodes that do not answer in time are left out
+        futures = {shared_executor().submit(Wled.from_one_ip, node["ip"], node["name"]): node for node in wled.get_nodes()}
+        done, not_done = wait(futures, timeout=timeout)
+        for future in done:
+            if future.exception() is None:
+                wleds.append(future.result())
+            else:
+                logger.warning(f"Error while initializing {futures[future]['ip']}: {future.exception()}")
+        for future in not_done:
+            logger.warning(f"Node {futures[future]['ip']} did not answer within {timeout}s, skipping")
         new_wleds = cls(wleds = wleds)
         new_wleds.sort()
         return new_wleds
@@ -597,7 +481,7 @@ class Wleds:
     def from_one_ip(cls, ip, cache_fs=True):
         w = Wled.from_one_ip(ip)      
         wleds =  Wleds.from_one_node(w)
-        if cache_fs: wleds.cache_fs()
+        if cache_fs: wleds.bulk("cache_fs", timeout=10.)
         return wleds
 
     # def cache_fs(self):
@@ -609,23 +493,87 @@ class Wleds:
     # def to_omegaconf(self):
     #     pass
 
-    def get_by_ip(self, ip) -> Optional[Type[Wled]]:
-        wleds = list(wled for wled in self if wled.ip == ip)
+    # Indexes: key -> list of Wleds, kept in sync by append/remove/sort/filter.
+    # Call reindex() after changing ip/name/mac of a device in place.
+    _INDEXED = ("ip", "name", "mac")
+
+    def reindex(self):
+        self._index = {attr: {} for attr in self._INDEXED}
+        self._by_tag: Dict[str, List[Wled]] = {}
+        for wled in self.wleds:
+            self._index_add(wled)
+        return self
+
+    def _index_add(self, wled):
+        for attr, index in self._index.items():
+            key = getattr(wled, attr, None)
+            if key is not None:
+                index.setdefault(key, []).append(wled)
+        for tag in getattr(wled, "tags", ()):
+            self._by_tag.setdefault(tag, []).append(wled)
+
+    def _index_remove(self, wled):
+        for attr, index in self._index.items():
+            bucket = index.get(getattr(wled, attr, None))
+            if bucket and wled in bucket:
+                bucket.remove(wled)
+                if not bucket:
+                    del index[getattr(wled, attr)]
+        for tag in getattr(wled, "tags", ()):
+            bucket = self._by_tag.get(tag)
+            if bucket and wled in bucket:
+                bucket.remove(wled)
+                if not bucket:
+                    del self._by_tag[tag]
+
+    def _get_one(self, attr, key, what) -> Optional[Type[Wled]]:
+        wleds = self._index[attr].get(key, ())
         if len(wleds) == 1:
             return wleds[0]
         elif len(wleds) == 0:
             return None
         else:
-            raise ValueError(f"More than one ({len(wleds)}) wled with IP {ip} found")
+            raise ValueError(f"More than one ({len(wleds)}) wled with {what} found")
+
+    def get_by_ip(self, ip) -> Optional[Type[Wled]]:
+        return self._get_one("ip", ip, f"IP {ip}")
 
     def get_by_name(self, name) -> Optional[Type[Wled]]:
-        wleds = list(wled for wled in self if wled.name == name)
-        if len(wleds) == 1:
-            return wleds[0]
-        elif len(wleds) == 0:
-            return None
-        else:
-            raise ValueError(f"More than one ({len(wleds)}) wled with name '{name}' found")
+        return self._get_one("name", name, f"name '{name}'")
+
+    def get_by_mac(self, mac) -> Optional[Type[Wled]]:
+        return self._get_one("mac", mac, f"MAC {mac}")
+
+    # Tags
+    def add_tag(self, tag, wleds: Iterable[Wled]):
+        for wled in wleds:
+            if tag not in wled.tags:
+                wled.tags.add(tag)
+                self._by_tag.setdefault(tag, []).append(wled)
+
+    def remove_tag(self, tag, wleds: Optional[Iterable[Wled]] = None):
+        for wled in list(wleds if wleds is not None else self._by_tag.get(tag, ())):
+            wled.tags.discard(tag)
+            bucket = self._by_tag.get(tag)
+            if bucket and wled in bucket:
+                bucket.remove(wled)
+        if not self._by_tag.get(tag, True):
+            del self._by_tag[tag]
+
+    def tagged(self, tag) -> List[Type[Wled]]:
+        """Devices with a tag, without building a new collection"""
+        return list(self._by_tag.get(tag, ()))
+
+    def select(self, *tags):
+        """New collection of the devices carrying any of the tags"""
+        seen = {}
+        for tag in tags:
+            for wled in self._by_tag.get(tag, ()):
+                seen[id(wled)] = wled
+        return self.__class__(list(seen.values()))
+
+    def get_tags(self):
+        return list(self._by_tag)
 
     def get_names(self):
         return list(wled.name for wled in self)
@@ -634,14 +582,17 @@ class Wleds:
         return list(wled.ip for wled in self)
 
     def remove(self, wled):
-        return self.wleds.remove(wled)
+        self.wleds.remove(wled)
+        self._index_remove(wled)
 
     def append(self, wled):
-        return self.wleds.append(wled)
+        self.wleds.append(wled)
+        self._index_add(wled)
 
     def sort(self):
         self.wleds = list(sorted(self.wleds, key=lambda w: w.name))
-        return self
+        # Keep the buckets in the same order as the list
+        return self.reindex()
     
     def filter(self, filter_lambda):
         wleds = list(filter(filter_lambda, self.wleds))
@@ -650,33 +601,40 @@ class Wleds:
     def __getitem__(self, item) -> Optional[Type[Wled]]:
         return self.get_by_name(item)
 
+    def __contains__(self, wled):
+        return wled in self._index["ip"].get(getattr(wled, "ip", None), ())
+
     def __iter__(self):
         return self.wleds.__iter__()
     
     def __len__(self):
         return self.wleds.__len__()
     
+    # Bulk operations
+    def bulk(self, method, *args, timeout=None, **kwargs) -> BulkResult:
+        """
+        Call a Wled method (name, or callable taking the Wled first) on every device.
+        Waits at most timeout seconds (default config.WLED_BULK_TIMEOUT) and returns
+        partial results; devices with an open circuit breaker are skipped instantly.
+        """
+        return shared_runner().run(self, method, args, kwargs, timeout)
+
+    def bulk_iter(self, method, *args, timeout=None, **kwargs):
+        """Like bulk(), but yields (wled, result, error) as each device answers"""
+        return shared_runner().iter(self, method, args, kwargs, timeout)
+
     def __getattr__(self, attr):
         if attr not in Wled.__dict__.keys():
             raise AttributeError(f"Neither '{self.__class__.__name__}' nor Wled object has no attribute '{attr}'")
-        orig_fun = getattr(Wled, attr)
         def new_fun(*args, **kwargs):
-            returns = []
-            with ThreadPoolExecutor() as ex:
-                for wled in self:
-                    returns.append(ex.submit(orig_fun, wled, *args, **kwargs))
-            return [r.result() for r in returns]
+            # No deadline: long calls (update_firmware, upload_cfg) finish, and a timeout= kwarg
+            # goes to the Wled method. Like a plain call, the first device error is raised;
+            # partial results are only returned by bulk()
+            result = shared_runner().run(self, attr, args, kwargs, NO_DEADLINE)
+            result.raise_first_error()
+            return result.values()
         return new_fun
 
-    def reconfig_from_omegaconf(self, keep_presets=True):
-        returns = []
-        with ThreadPoolExecutor() as ex:
-            for wled in self:
-                returns.append(ex.submit(Wled.reconfig_from_omegaconf, wled, keep_presets=keep_presets))
-        returns = [r.result() for r in returns]
-        self.wleds = returns
-        return self
-
     def __str__(self):
         return str(self.wleds)
 